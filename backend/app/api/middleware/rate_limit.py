@@ -1,19 +1,25 @@
-"""简单的内存限流中间件。"""
+"""限流中间件（Redis 固定窗口计数，Redis 不可用时退化为进程内计数）。"""
 
 from __future__ import annotations
 
 import time
 from collections import defaultdict
-from typing import Callable
+from typing import Callable, Optional
 
-from fastapi import HTTPException, Request, Response, status
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from app.core.redis import redis_pool
+
+KEY_PREFIX = "ratelimit:"
+
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    """基于内存的简单限流中间件。
+    """按客户端 IP 限流。
     
-    生产环境建议使用 Redis 实现分布式限流。
+    计数保存在共享 Redis 连接池中，多个 worker 共用同一额度；
+    Redis 不可用时使用进程内的滑动窗口。
     """
 
     def __init__(self, app, calls: int = 100, period: int = 60):
@@ -35,6 +41,33 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             return await call_next(request)
 
         client_ip = request.client.host if request.client else "unknown"
+        count = await self._redis_count(client_ip)
+        if count is None:
+            count = self._local_count(client_ip)
+
+        # 检查是否超过限流（中间件中抛出的 HTTPException 不会被异常处理器转换，直接返回响应）
+        if count > self.calls:
+            return JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": f"请求过于频繁，请在 {self.period} 秒后重试"},
+            )
+
+        return await call_next(request)
+
+    async def _redis_count(self, client_ip: str) -> Optional[int]:
+        """当前窗口内（含本次）的请求数，Redis 不可用时返回 None。"""
+        key = f"{KEY_PREFIX}{client_ip}:{int(time.time() // self.period)}"
+
+        async def count(client) -> int:
+            pipe = client.pipeline()
+            pipe.incr(key)
+            pipe.expire(key, self.period + 1)
+            value, _ = await pipe.execute()
+            return value
+
+        return await redis_pool.execute(count)
+
+    def _local_count(self, client_ip: str) -> int:
         now = time.time()
 
         # 清理过期的请求记录
@@ -42,14 +75,10 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             timestamp for timestamp in self.clients[client_ip] if now - timestamp < self.period
         ]
 
-        # 检查是否超过限流
+        # 被拒绝的请求不记录
         if len(self.clients[client_ip]) >= self.calls:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail=f"请求过于频繁，请在 {self.period} 秒后重试",
-            )
+            return len(self.clients[client_ip]) + 1
 
         # 记录本次请求
         self.clients[client_ip].append(now)
-
-        return await call_next(request)
+        return len(self.clients[client_ip])
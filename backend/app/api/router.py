@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
-from app.api.routes import admin, album, auth, chat, config, diary, github, memory, models, role_prompts, skills, users, web, ws
+from app.api.routes import admin, album, auth, chat, config, diary, github, memory, metrics, models, role_prompts, skills, users, web, ws
 
 api_router = APIRouter()
 api_router.include_router(auth.router)
@@ -18,6 +18,7 @@ api_router.include_router(skills.router)
 api_router.include_router(config.router)
 api_router.include_router(github.router)
 api_router.include_router(memory.router)
+api_router.include_router(metrics.router)
 api_router.include_router(diary.router, prefix="/diaries", tags=["diaries"])
 api_router.include_router(album.router, tags=["album"])
 api_router.include_router(ws.router)
@@ -2,25 +2,21 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, Request, Response
 
 from app.api.deps import get_current_user
-from app.db.session import get_session
 from app.models.user import User
 from app.schemas.message import ChatCompletionRequest, ChatCompletionResponse
-from app.services.chat_service import build_chat_request, fetch_chat_completion, stream_chat_completion
+from app.services import chat_service
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
 @router.post("/completions", response_model=ChatCompletionResponse)
-def create_chat_completion(
+async def create_chat_completion(
     payload: ChatCompletionRequest,
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
     user: User = Depends(get_current_user),
 ):
-    model, target_url, request_body, fallback_models = build_chat_request(session, payload, user)
-    if payload.stream:
-        return stream_chat_completion(model, target_url, request_body, fallback_models)
-    return fetch_chat_completion(model, target_url, request_body)
+    return await chat_service.create_chat_completion(payload, user, response, request)
@@ -19,6 +19,7 @@ DEFAULT_CONFIGS = [
     {"key": "AMAP_KEY", "description": "高德地图 API Key"},
     {"key": "OPENAI_API_KEY", "description": "OpenAI API Key"},
     {"key": "OPENAI_BASE_URL", "description": "OpenAI API 地址"},
+    {"key": "GITHUB_TOKEN", "description": "GitHub 访问令牌（可选，提高 API 请求额度）"},
 ]
 
 
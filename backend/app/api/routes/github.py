@@ -4,11 +4,12 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime
+from typing import Literal
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 from pydantic import BaseModel
 
-from app.services.github_service import TrendingProject, get_trending_python_projects
+from app.services.github_service import FETCH_LIMIT, TrendingProject, get_trending_projects
 
 logger = logging.getLogger(__name__)
 
@@ -23,23 +24,38 @@ class TrendingResponse(BaseModel):
 
 
 @router.get("/trending", response_model=TrendingResponse)
-async def get_trending_projects():
-    """获取热门 Python 项目列表
+async def get_trending(
+    limit: int = Query(30, ge=1, le=FETCH_LIMIT, description="返回项目数量"),
+    language: str = Query("python", max_length=30, pattern=r"^[A-Za-z0-9+#.\- ]+$", description="编程语言"),
+    window: Literal["day", "week", "month"] = Query("month", description="时间窗口：最近一天、一周或当月创建"),
+    min_stars: int = Query(0, ge=0, description="最低星标数"),
+    sort: Literal["stars", "stars_1d", "stars_7d", "stars_30d"] = Query(
+        "stars", description="排序：总星标，或最近 1 / 7 / 30 天的星标增量"
+    ),
+):
+    """获取热门项目列表
+    
+    各参数组合都从同一语言与时间窗口的缓存超集中过滤得到，不额外请求 GitHub；
+    按增量排序使用本地的每日星标快照。
     
     Returns:
         TrendingResponse: 包含项目列表、缓存状态和更新时间
         
     Raises:
-        HTTPException: 获取数据失败时返回 500 或 503 错误
+        HTTPException: 语言不在允许列表中时返回 400，获取数据失败时返回 500 或 503 错误
     """
     try:
-        projects, cached = await get_trending_python_projects(limit=30)
+        projects, cached = await get_trending_projects(
+            limit=limit, language=language, window=window, min_stars=min_stars, sort=sort
+        )
         
         return TrendingResponse(
             projects=projects,
             cached=cached,
             updated_at=datetime.now().isoformat()
         )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         error_msg = str(e)
         logger.error(f"获取热门项目失败: {error_msg}")
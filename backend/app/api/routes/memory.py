@@ -2,16 +2,25 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import json
+from typing import Iterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.api.deps import get_current_user
+from app.core.config import settings
 from app.models.user import User
 from app.services.memory_service import (
     add_memory,
-    get_all_memories,
+    get_memory_page,
     clear_user_memories,
+    delete_memory,
+    get_memory_state,
     is_memory_enabled,
+    MEMORY_INITIALIZING,
 )
 
 router = APIRouter(prefix="/memory", tags=["memory"])
@@ -26,9 +35,33 @@ class MemoryResponse(BaseModel):
     message: str
 
 
+class MemoryItem(BaseModel):
+    id: str
+    memory: str
+    metadata: dict
+
+
 class MemoriesListResponse(BaseModel):
     enabled: bool
-    memories: list[str]
+    memories: list[MemoryItem]
+    next_cursor: Optional[str] = None
+
+
+def _encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded))["o"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    return offset
 
 
 @router.get("/status")
@@ -36,18 +69,56 @@ def get_memory_status(user: User = Depends(get_current_user)) -> dict:
     """获取记忆服务状态。"""
     return {
         "enabled": is_memory_enabled(),
+        "state": get_memory_state(),
         "user_id": user.id,
     }
 
 
+def _unavailable_detail() -> str:
+    if get_memory_state() == MEMORY_INITIALIZING:
+        return "记忆服务初始化中，请稍后重试"
+    return "记忆服务未启用"
+
+
 @router.get("/list", response_model=MemoriesListResponse)
-def list_memories(user: User = Depends(get_current_user)) -> MemoriesListResponse:
-    """获取当前用户的所有记忆。"""
+def list_memories(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=200),
+    stream: bool = False,
+    user: User = Depends(get_current_user),
+):
+    """分页获取当前用户的记忆。
+
+    返回 next_cursor 时用它请求下一页；stream=true 时以 NDJSON 逐条输出全部记忆，
+    服务端按页读取，内存占用与记忆总数无关。
+    """
+    offset = _decode_cursor(cursor)
+    limit = limit or settings.memory_list_page_size
+    if stream:
+        return StreamingResponse(_stream_memories(str(user.id), offset), media_type="application/x-ndjson")
+
     if not is_memory_enabled():
         return MemoriesListResponse(enabled=False, memories=[])
     
-    memories = get_all_memories(str(user.id))
-    return MemoriesListResponse(enabled=True, memories=memories)
+    # 游标按后端的原始位置前进，过滤掉的空记忆不影响翻页
+    items, has_more = get_memory_page(str(user.id), limit=limit, offset=offset)
+    next_cursor = _encode_cursor(offset + limit) if has_more else None
+    return MemoriesListResponse(
+        enabled=True,
+        memories=[MemoryItem(**item) for item in items],
+        next_cursor=next_cursor,
+    )
+
+
+def _stream_memories(user_id: str, offset: int) -> Iterator[str]:
+    page_size = settings.memory_list_page_size
+    while is_memory_enabled():
+        items, has_more = get_memory_page(user_id, limit=page_size, offset=offset)
+        for item in items:
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+        if not has_more:
+            break
+        offset += page_size
 
 
 @router.post("/add", response_model=MemoryResponse)
@@ -57,7 +128,7 @@ def add_user_memory(
 ) -> MemoryResponse:
     """手动添加记忆。"""
     if not is_memory_enabled():
-        raise HTTPException(status_code=503, detail="记忆服务未启用")
+        raise HTTPException(status_code=503, detail=_unavailable_detail())
     
     if not request.content.strip():
         raise HTTPException(status_code=400, detail="记忆内容不能为空")
@@ -73,10 +144,21 @@ def add_user_memory(
 def clear_memories(user: User = Depends(get_current_user)) -> MemoryResponse:
     """清空当前用户的所有记忆。"""
     if not is_memory_enabled():
-        raise HTTPException(status_code=503, detail="记忆服务未启用")
+        raise HTTPException(status_code=503, detail=_unavailable_detail())
     
     success = clear_user_memories(str(user.id))
     if success:
         return MemoryResponse(success=True, message="记忆已清空")
     else:
         raise HTTPException(status_code=500, detail="清空记忆失败")
+
+
+@router.delete("/{memory_id}", response_model=MemoryResponse)
+def delete_user_memory(memory_id: str, user: User = Depends(get_current_user)) -> MemoryResponse:
+    """删除当前用户的一条记忆。"""
+    if not is_memory_enabled():
+        raise HTTPException(status_code=503, detail=_unavailable_detail())
+    
+    if not delete_memory(memory_id, str(user.id)):
+        raise HTTPException(status_code=404, detail="记忆不存在")
+    return MemoryResponse(success=True, message="记忆已删除")
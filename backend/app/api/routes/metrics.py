@@ -0,0 +1,77 @@
+"""运行指标路由。"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, status
+
+from app.api.deps import require_admin
+from app.core.http_client import http_pool
+from app.core.metrics import metrics
+from app.core.redis import redis_pool
+from app.models.user import User
+from app.services.embedding_cache import get_embedding_cache
+from app.services.github_snapshots import get_snapshot_store
+from app.services.memory_writer import memory_writer
+from app.services.model_registry import model_registry
+from app.services.model_router import model_router
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("")
+def get_metrics(_: User = Depends(require_admin)) -> dict:
+    """获取进程内运行指标（仅管理员）。"""
+    return metrics.snapshot()
+
+
+@router.get("/http-pool")
+def get_http_pool_stats(_: User = Depends(require_admin)) -> dict:
+    """获取上游 HTTP 连接池状态（仅管理员）。"""
+    return http_pool.stats()
+
+
+@router.get("/redis")
+def get_redis_stats(_: User = Depends(require_admin)) -> dict:
+    """获取共享 Redis 连接池与健康状态（仅管理员）。"""
+    return redis_pool.stats()
+
+
+@router.get("/model-registry")
+def get_model_registry_stats(_: User = Depends(require_admin)) -> dict:
+    """获取模型注册表缓存状态（仅管理员）。"""
+    return model_registry.stats()
+
+
+@router.get("/memory-writer")
+def get_memory_writer_stats(_: User = Depends(require_admin)) -> dict:
+    """获取对话记忆后台写入队列状态（仅管理员）。"""
+    return memory_writer.stats()
+
+
+@router.get("/embedding-cache")
+def get_embedding_cache_stats(_: User = Depends(require_admin)) -> dict:
+    """获取记忆嵌入缓存命中率与节省的嵌入调用（仅管理员）。"""
+    cache = get_embedding_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+@router.get("/github-snapshots")
+def get_github_snapshot_stats(_: User = Depends(require_admin)) -> dict:
+    """获取 GitHub 星标快照存储的规模（仅管理员）。"""
+    store = get_snapshot_store()
+    return store.stats() if store is not None else {"enabled": False}
+
+
+@router.get("/model-router")
+def get_model_router_state(_: User = Depends(require_admin)) -> list[dict]:
+    """获取各模型的延迟、错误率与熔断状态（仅管理员）。"""
+    return model_router.snapshot()
+
+
+@router.delete("/model-router", status_code=status.HTTP_204_NO_CONTENT)
+def reset_model_router(model_id: Optional[int] = None, _: User = Depends(require_admin)):
+    """重置模型路由统计，可指定单个模型（仅管理员）。"""
+    model_router.reset(model_id)
+    return None
@@ -9,6 +9,7 @@ from app.api.deps import get_current_user, require_admin
 from app.db.session import get_session
 from app.models.user import ModelConfig, User
 from app.schemas.user import ModelConfigCreate, ModelConfigPublic, ModelConfigUpdate
+from app.services.model_registry import model_registry
 
 router = APIRouter(prefix="/models", tags=["models"])
 
@@ -42,6 +43,7 @@ def create_model(
     session.add(model)
     session.commit()
     session.refresh(model)
+    model_registry.invalidate()
     return model
 
 
@@ -64,6 +66,7 @@ def update_model(
     session.add(model)
     session.commit()
     session.refresh(model)
+    model_registry.invalidate()
     return model
 
 
@@ -76,4 +79,5 @@ def delete_model(
     model = _get_model_or_404(session, model_id)
     session.delete(model)
     session.commit()
+    model_registry.invalidate()
     return None
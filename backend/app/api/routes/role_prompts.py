@@ -9,6 +9,7 @@ from app.api.deps import get_current_user, require_admin
 from app.db.session import get_session
 from app.models.user import RolePrompt, User
 from app.schemas.user import RolePromptCreate, RolePromptPublic, RolePromptUpdate
+from app.services.model_registry import model_registry
 
 router = APIRouter(prefix="/role-prompts", tags=["role-prompts"])
 
@@ -41,6 +42,7 @@ def create_role_prompt(
     session.add(prompt)
     session.commit()
     session.refresh(prompt)
+    model_registry.invalidate()
     return prompt
 
 
@@ -72,6 +74,7 @@ def update_role_prompt(
     session.add(prompt)
     session.commit()
     session.refresh(prompt)
+    model_registry.invalidate()
     return prompt
 
 
@@ -88,4 +91,5 @@ def delete_role_prompt(
 
     session.delete(prompt)
     session.commit()
+    model_registry.invalidate()
     return None
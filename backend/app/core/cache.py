@@ -1,11 +1,11 @@
 """
 缓存管理器模块
-提供统一的Redis缓存操作接口
+提供统一的Redis缓存操作接口，底层使用 app.core.redis 中共享的连接池
 """
 from typing import Optional
 import json
 import redis.asyncio as redis
-from app.core.config import settings
+from app.core.redis import redis_pool
 
 
 class CacheManager:
@@ -30,18 +30,14 @@ class CacheManager:
         Returns:
             缓存值，如果不存在返回None
         """
-        try:
-            value = await self.redis.get(key)
-            if value is None:
-                return None
-            # 如果已经是字符串（decode_responses=True），直接返回
-            if isinstance(value, str):
-                return value
-            # 否则解码
-            return value.decode('utf-8')
-        except Exception as e:
-            print(f"Cache get error: {e}")
+        value = await redis_pool.execute(lambda r: r.get(key), client=self.redis)
+        if value is None:
             return None
+        # 如果已经是字符串（decode_responses=True），直接返回
+        if isinstance(value, str):
+            return value
+        # 否则解码
+        return value.decode('utf-8')
     
     async def set(self, key: str, value: str, ttl: int = 300):
         """
@@ -52,11 +48,8 @@ class CacheManager:
             value: 缓存值
             ttl: 过期时间（秒），默认300秒（5分钟）
         """
-        try:
-            await self.redis.setex(key, ttl, value)
-        except Exception as e:
-            # 缓存失败不应该影响主流程
-            print(f"Cache set error: {e}")
+        # 缓存失败不应该影响主流程
+        await redis_pool.execute(lambda r: r.setex(key, ttl, value), client=self.redis)
     
     async def delete(self, key: str):
         """
@@ -65,10 +58,7 @@ class CacheManager:
         Args:
             key: 缓存键
         """
-        try:
-            await self.redis.delete(key)
-        except Exception as e:
-            print(f"Cache delete error: {e}")
+        await redis_pool.execute(lambda r: r.delete(key), client=self.redis)
     
     def generate_cache_key(self, prefix: str, **kwargs) -> str:
         """
@@ -85,3 +75,14 @@ class CacheManager:
         for key in sorted(kwargs.keys()):
             parts.append(f"{key}:{kwargs[key]}")
         return ":".join(parts)
+
+
+_cache_manager: Optional[CacheManager] = None
+
+
+def get_cache_manager() -> CacheManager:
+    """获取进程共享的异步缓存管理器（使用共享连接池的客户端）。"""
+    global _cache_manager
+    if _cache_manager is None:
+        _cache_manager = CacheManager(redis_pool.client)
+    return _cache_manager
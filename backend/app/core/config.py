@@ -18,6 +18,89 @@ class Settings:
     redis_host: str = os.getenv("REDIS_HOST", "localhost")
     redis_port: int = int(os.getenv("REDIS_PORT", "6379"))
     redis_password: str | None = os.getenv("REDIS_PASSWORD")
+    # 共享 Redis 连接池：最大连接数、等待空闲连接/建连/读写超时（秒）、空闲连接健康检查间隔（秒）
+    redis_max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    redis_pool_timeout: float = float(os.getenv("REDIS_POOL_TIMEOUT", "2"))
+    redis_connect_timeout: float = float(os.getenv("REDIS_CONNECT_TIMEOUT", "1"))
+    redis_socket_timeout: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1"))
+    redis_health_check_interval: int = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+    # Redis 出错后暂停访问的时间（秒），期间直接走降级路径
+    redis_retry_after: float = float(os.getenv("REDIS_RETRY_AFTER", "10"))
+    # 上游 HTTP 连接池（按 origin 复用连接）
+    http_max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    http_max_keepalive_connections: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    http_keepalive_expiry: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    http_connect_timeout: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+    http_read_timeout: float = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+    http_http2: bool = os.getenv("HTTP_HTTP2", "false").lower() in ("1", "true", "yes")
+    # 聊天并发控制
+    chat_max_concurrency: int = int(os.getenv("CHAT_MAX_CONCURRENCY", "100"))
+    chat_queue_timeout: float = float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))
+    # 相同的流式请求只能在上游产生前 N 个数据块时加入共享流（晚到者需回放这些数据块）
+    chat_stream_replay_chunks: int = int(os.getenv("CHAT_STREAM_REPLAY_CHUNKS", "32"))
+    # 模型路由与熔断
+    router_ewma_alpha: float = float(os.getenv("ROUTER_EWMA_ALPHA", "0.3"))
+    router_failure_threshold: int = int(os.getenv("ROUTER_FAILURE_THRESHOLD", "3"))
+    router_open_seconds: float = float(os.getenv("ROUTER_OPEN_SECONDS", "30"))
+    # 对冲请求：首选模型迟迟没有首字时，向下一个健康模型再发一次
+    chat_hedge_enabled: bool = os.getenv("CHAT_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+    chat_hedge_percentile: float = float(os.getenv("CHAT_HEDGE_PERCENTILE", "90"))
+    chat_hedge_default_delay: float = float(os.getenv("CHAT_HEDGE_DEFAULT_DELAY", "3"))
+    chat_hedge_budget: float = float(os.getenv("CHAT_HEDGE_BUDGET", "0.1"))
+    # 非流式聊天响应缓存（Redis）
+    chat_cache_enabled: bool = os.getenv("CHAT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    chat_cache_max_temperature: float = float(os.getenv("CHAT_CACHE_MAX_TEMPERATURE", "0.2"))
+    chat_cache_ttl: int = int(os.getenv("CHAT_CACHE_TTL", "3600"))
+    chat_cache_max_entries: int = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "10000"))
+    chat_cache_max_entry_bytes: int = int(os.getenv("CHAT_CACHE_MAX_ENTRY_BYTES", "65536"))
+    # 聊天前记忆检索的时间预算（秒）与专用线程数
+    memory_search_budget: float = float(os.getenv("MEMORY_SEARCH_BUDGET", "0.3"))
+    memory_search_workers: int = int(os.getenv("MEMORY_SEARCH_WORKERS", "4"))
+    # 记忆存储后端：powermem（默认）或 local（进程内 NumPy 向量索引）
+    memory_backend: str = os.getenv("MEMORY_BACKEND", "powermem")
+    memory_index_dir: str = os.getenv("MEMORY_INDEX_DIR", "./memory_index")
+    # 对话记忆后台写入队列
+    memory_queue_size: int = int(os.getenv("MEMORY_QUEUE_SIZE", "1000"))
+    memory_batch_size: int = int(os.getenv("MEMORY_BATCH_SIZE", "20"))
+    memory_flush_interval: float = float(os.getenv("MEMORY_FLUSH_INTERVAL", "2"))
+    memory_drain_timeout: float = float(os.getenv("MEMORY_DRAIN_TIMEOUT", "10"))
+    # 本地词法记忆（BM25）：向量记忆不可用时降级使用，可选与向量结果融合
+    memory_lexical_enabled: bool = os.getenv("MEMORY_LEXICAL_ENABLED", "true").lower() in ("1", "true", "yes")
+    memory_lexical_path: str = os.getenv("MEMORY_LEXICAL_PATH", "./memory_lexical.db")
+    memory_lexical_blend: bool = os.getenv("MEMORY_LEXICAL_BLEND", "false").lower() in ("1", "true", "yes")
+    # 记忆检索结果缓存（按用户代数失效）
+    memory_search_cache_enabled: bool = os.getenv("MEMORY_SEARCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    memory_search_cache_ttl: float = float(os.getenv("MEMORY_SEARCH_CACHE_TTL", "60"))
+    memory_search_cache_max_entries: int = int(os.getenv("MEMORY_SEARCH_CACHE_MAX_ENTRIES", "2000"))
+    # /memory/list 默认每页条数（流式输出时每次读取的条数）
+    memory_list_page_size: int = int(os.getenv("MEMORY_LIST_PAGE_SIZE", "50"))
+    # 近似重复记忆压缩（定时任务，0 表示不定时执行）
+    memory_compaction_interval_hours: float = float(os.getenv("MEMORY_COMPACTION_INTERVAL_HOURS", "24"))
+    memory_compaction_threshold: float = float(os.getenv("MEMORY_COMPACTION_THRESHOLD", "0.8"))
+    memory_compaction_max_items: int = int(os.getenv("MEMORY_COMPACTION_MAX_ITEMS", "5000"))
+    memory_compaction_measure_queries: int = int(os.getenv("MEMORY_COMPACTION_MEASURE_QUERIES", "3"))
+    # 记忆嵌入向量缓存（SQLite，按字节预算 LRU 淘汰）
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    embedding_cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.db")
+    embedding_cache_max_bytes: int = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+    # GitHub API 地址（可指向本地桩服务 scripts/github_stub_server.py）
+    github_api_url: str = os.getenv("GITHUB_API_URL", "https://api.github.com")
+    # GitHub 项目描述翻译：并发批次数、整体截止时间（秒）、翻译未完成时多久后重新刷新（秒）
+    github_translate_concurrency: int = int(os.getenv("GITHUB_TRANSLATE_CONCURRENCY", "3"))
+    github_translate_deadline: float = float(os.getenv("GITHUB_TRANSLATE_DEADLINE", "45"))
+    github_translate_retry_interval: float = float(os.getenv("GITHUB_TRANSLATE_RETRY_INTERVAL", "600"))
+    # GitHub 仓库每日星标快照文件（用于按星标增速排序，留空则不记录）
+    github_snapshot_path: str = os.getenv("GITHUB_SNAPSHOT_PATH", "./github_snapshots.bin")
+    # GitHub 热门项目允许查询的语言（逗号分隔）：每种语言的首次请求都要搜索 GitHub 并翻译整个超集
+    github_trending_languages: tuple[str, ...] = tuple(
+        language.strip() for language in os.getenv(
+            "GITHUB_TRENDING_LANGUAGES",
+            "python,javascript,typescript,java,go,rust,c++,c,c#,php,ruby,swift,kotlin,shell,jupyter notebook",
+        ).split(",") if language.strip()
+    )
+    # GitHub 热门项目缓存预热间隔（分钟，0 表示不预热）
+    github_prewarm_interval_minutes: float = float(os.getenv("GITHUB_PREWARM_INTERVAL_MINUTES", "60"))
 
 
 settings = Settings()
@@ -0,0 +1,119 @@
+"""上游 HTTP 客户端连接池。
+
+按上游 origin（scheme://host:port）维护进程级共享的 httpx.AsyncClient，
+复用 TCP/TLS 连接，避免每次请求重新握手。
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HttpClientPool:
+    """按 origin 划分的异步 HTTP 客户端池。"""
+
+    def __init__(self) -> None:
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._requests: dict[str, int] = {}
+        self._http2 = False
+
+    @staticmethod
+    def origin_of(url: str) -> str:
+        """提取 URL 的 origin。"""
+        parsed = httpx.URL(url)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        return f"{parsed.scheme}://{parsed.host}:{port}"
+
+    def open(self) -> None:
+        """应用启动时调用，确定连接池参数。"""
+        self._http2 = settings.http_http2
+        if self._http2 and not _http2_available():
+            logger.warning("未安装 h2，HTTP/2 已禁用。请运行: pip install h2")
+            self._http2 = False
+        logger.info(
+            "上游 HTTP 连接池已就绪: max_connections=%s, keepalive=%s, http2=%s",
+            settings.http_max_connections,
+            settings.http_max_keepalive_connections,
+            self._http2,
+        )
+
+    def client(self, url: str) -> httpx.AsyncClient:
+        """获取 url 所属 origin 的共享客户端，不存在时创建。"""
+        origin = self.origin_of(url)
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            client = self._create_client(origin)
+            self._clients[origin] = client
+        return client
+
+    def _create_client(self, origin: str) -> httpx.AsyncClient:
+        async def count_request(request: httpx.Request) -> None:
+            self._requests[origin] = self._requests.get(origin, 0) + 1
+
+        return httpx.AsyncClient(
+            http2=self._http2,
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                settings.http_read_timeout,
+                connect=settings.http_connect_timeout,
+            ),
+            event_hooks={"request": [count_request]},
+        )
+
+    async def aclose(self) -> None:
+        """应用关闭时调用，关闭所有客户端连接。"""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f"关闭 HTTP 客户端失败: {e}")
+        logger.info(f"已关闭 {len(clients)} 个上游 HTTP 客户端")
+
+    def stats(self) -> dict:
+        """返回各 origin 的请求数与连接状态。"""
+        origins = {}
+        for origin, client in self._clients.items():
+            connections = self._pool_connections(client)
+            idle = sum(1 for conn in connections if conn.is_idle())
+            origins[origin] = {
+                "requests": self._requests.get(origin, 0),
+                "connections": len(connections),
+                "idle_connections": idle,
+                "active_connections": len(connections) - idle,
+            }
+        return {
+            "http2": self._http2,
+            "max_connections": settings.http_max_connections,
+            "max_keepalive_connections": settings.http_max_keepalive_connections,
+            "origins": origins,
+        }
+
+    @staticmethod
+    def _pool_connections(client: httpx.AsyncClient) -> list:
+        # httpx 未公开连接池状态，这里读取 httpcore 连接池的连接列表
+        pool: Optional[object] = getattr(getattr(client, "_transport", None), "_pool", None)
+        return list(getattr(pool, "connections", []) or [])
+
+
+http_pool = HttpClientPool()
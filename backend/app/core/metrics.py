@@ -0,0 +1,79 @@
+"""进程内运行指标。
+
+提供线程安全的计数器与耗时统计，供服务层记录关键路径指标，
+并通过 /metrics 接口对管理员公开。
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+
+
+@dataclass
+class _Summary:
+    """单个观测指标的汇总值。"""
+    count: int = 0
+    total: float = 0.0
+    min: float = 0.0
+    max: float = 0.0
+
+    def add(self, value: float) -> None:
+        if self.count == 0:
+            self.min = self.max = value
+        else:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        self.count += 1
+        self.total += value
+
+    def to_dict(self) -> dict:
+        avg = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "total": round(self.total, 6),
+            "avg": round(avg, 6),
+            "min": round(self.min, 6),
+            "max": round(self.max, 6),
+        }
+
+
+class Metrics:
+    """计数器与观测值注册表。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = {}
+        self._summaries: dict[str, _Summary] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """累加计数器。"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        """记录一次观测值（如耗时、字节数）。"""
+        with self._lock:
+            self._summaries.setdefault(name, _Summary()).add(value)
+
+    def get(self, name: str) -> float:
+        """读取计数器当前值。"""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        """返回所有指标的快照。"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "summaries": {name: s.to_dict() for name, s in self._summaries.items()},
+            }
+
+    def reset(self) -> None:
+        """清空所有指标。"""
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+metrics = Metrics()
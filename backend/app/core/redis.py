@@ -0,0 +1,223 @@
+"""进程共享的异步 Redis 连接池。
+
+应用启动时 open() 创建连接池，关闭时 aclose() 释放；令牌与在线统计、GitHub 缓存、
+聊天与记忆检索缓存、模型注册表通知、限流等都通过它访问 Redis，请求路径上不再建连。
+
+- 连接池有上限，取不到空闲连接时最多等待 REDIS_POOL_TIMEOUT 秒；
+- 建连与读写都有超时，空闲超过 REDIS_HEALTH_CHECK_INTERVAL 的连接使用前先 PING，
+  连接错误按指数退避重试两次；
+- 出错后 REDIS_RETRY_AFTER 秒内不再访问 Redis，调用方直接走各自的降级路径，
+  不会每个请求都等一次超时；之后的第一次调用即探测是否恢复；
+- 工作线程里的同步代码通过 run_sync() / submit() 把命令交给事件循环执行；
+  不能丢失的命令（如失效通知）用 submit(attempts=N)，不受暂停期限制并按指数退避重试。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import redis.asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import RedisError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Command = Callable[[redis.Redis], Awaitable[T]]
+
+# 释放 SET NX 获取的锁：只有值仍是自己的令牌时才删除，不会误删其他进程在过期后重新获取的锁
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisPool:
+    """生命周期由应用管理的异步 Redis 客户端。"""
+
+    def __init__(self) -> None:
+        self._client: Optional[redis.Redis] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._down_until = 0.0
+        self._last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        # 持有后台任务的引用，避免被垃圾回收
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def client(self) -> redis.Redis:
+        """共享客户端，未调用 open() 时（如命令行脚本）按需创建。"""
+        with self._lock:
+            if self._client is None:
+                self._client = self._create()
+            return self._client
+
+    def _create(self) -> redis.Redis:
+        pool = redis.BlockingConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            password=settings.redis_password,
+            decode_responses=True,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            socket_connect_timeout=settings.redis_connect_timeout,
+            socket_timeout=settings.redis_socket_timeout,
+            health_check_interval=settings.redis_health_check_interval,
+            retry=Retry(ExponentialBackoff(cap=0.5, base=0.05), 2),
+            retry_on_error=[RedisConnectionError, RedisTimeoutError],
+        )
+        return redis.Redis(connection_pool=pool)
+
+    async def open(self) -> None:
+        """应用启动时调用：创建连接池、记录事件循环并探测一次连通性。"""
+        self._loop = asyncio.get_running_loop()
+        client = self.client
+        started = time.perf_counter()
+        try:
+            await client.ping()
+        except (RedisError, OSError) as e:
+            self.failed(e)
+            return
+        logger.info(
+            f"Redis 连接池已就绪: {settings.redis_host}:{settings.redis_port}，"
+            f"max_connections={settings.redis_max_connections}，PING {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+    async def aclose(self) -> None:
+        """应用关闭时调用，断开所有连接。"""
+        with self._lock:
+            client, self._client = self._client, None
+        self._loop = None
+        if client is None:
+            return
+        try:
+            await client.aclose()
+            await client.connection_pool.disconnect()
+        except Exception as e:  # noqa: BLE001
+            logger.warning(f"关闭 Redis 连接池失败: {e}")
+        logger.info("Redis 连接池已关闭")
+
+    def available(self) -> bool:
+        """不在出错后的暂停期内。"""
+        return time.monotonic() >= self._down_until
+
+    def failed(self, error: Exception) -> None:
+        """记录一次 Redis 错误，暂停访问 REDIS_RETRY_AFTER 秒。"""
+        metrics.incr("redis.errors")
+        was_available = self.available()
+        self._down_until = time.monotonic() + settings.redis_retry_after
+        self._last_error = f"{type(error).__name__}: {error}"
+        if was_available:
+            logger.warning(f"Redis 不可用，{settings.redis_retry_after:.0f} 秒内使用降级逻辑: {error}")
+
+    async def execute(self, command: Command[T], default: T = None, client: Optional[redis.Redis] = None) -> T:
+        """执行命令；Redis 暂停访问或出错时返回 default。"""
+        if not self.available():
+            metrics.incr("redis.skipped")
+            return default
+        started = time.perf_counter()
+        try:
+            result = await command(client or self.client)
+        except (RedisError, OSError) as e:
+            self.failed(e)
+            return default
+        metrics.observe("redis.command_seconds", time.perf_counter() - started)
+        return result
+
+    async def execute_with_retry(self, command: Command[T], attempts: int, default: T = None) -> T:
+        """不受暂停期限制地执行命令，失败后按 1、2、4… 秒退避重试，全部失败时返回 default。"""
+        for attempt in range(attempts):
+            if attempt:
+                await asyncio.sleep(2 ** (attempt - 1))
+            try:
+                return await command(self.client)
+            except (RedisError, OSError) as e:
+                self.failed(e)
+                metrics.incr("redis.retries")
+        logger.warning(f"Redis 命令重试 {attempts} 次后仍失败: {self._last_error}")
+        return default
+
+    def _command(self, command: Command[Any], attempts: int) -> Awaitable[Any]:
+        return self.execute(command) if attempts <= 1 else self.execute_with_retry(command, attempts)
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _spawn(self, command: Command[Any], attempts: int = 1) -> None:
+        task = self._loop.create_task(self._command(command, attempts))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def submit(self, command: Command[Any], attempts: int = 1) -> None:
+        """在任意线程提交命令，不等待结果（适合计数、在线状态等写操作）。
+
+        attempts 大于 1 时即使处于暂停期也会执行，失败后退避重试。
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        if self._on_loop_thread():
+            self._spawn(command, attempts)
+        else:
+            asyncio.run_coroutine_threadsafe(self._command(command, attempts), loop)
+
+    def run_sync(self, command: Command[T], default: T = None) -> T:
+        """在工作线程中同步执行命令并等待结果。
+
+        事件循环线程上不能阻塞等待：此时命令改为后台执行并直接返回 default；
+        尚未调用 open()（没有事件循环，如命令行脚本）时也返回 default。
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return default
+        if self._on_loop_thread():
+            self._spawn(command)
+            return default
+        future = asyncio.run_coroutine_threadsafe(self.execute(command, default), loop)
+        try:
+            return future.result(timeout=settings.redis_pool_timeout + settings.redis_socket_timeout * 3)
+        except concurrent.futures.TimeoutError as e:
+            future.cancel()
+            metrics.incr("redis.sync_timeouts")
+            self.failed(e)
+            return default
+
+    def stats(self) -> dict:
+        """连接池与健康状态。"""
+        client = self._client
+        pool = client.connection_pool if client is not None else None
+        in_use = len(getattr(pool, "_in_use_connections", ())) if pool is not None else 0
+        idle = len(getattr(pool, "_available_connections", ())) if pool is not None else 0
+        return {
+            "open": client is not None,
+            "available": self.available(),
+            "retry_in": round(max(0.0, self._down_until - time.monotonic()), 1),
+            "last_error": self._last_error,
+            "max_connections": settings.redis_max_connections,
+            "connections": in_use + idle,
+            "in_use_connections": in_use,
+            "idle_connections": idle,
+            "errors": metrics.get("redis.errors"),
+            "skipped": metrics.get("redis.skipped"),
+            "retries": metrics.get("redis.retries"),
+            "sync_timeouts": metrics.get("redis.sync_timeouts"),
+        }
+
+
+redis_pool = RedisPool()
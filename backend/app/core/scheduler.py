@@ -0,0 +1,34 @@
+"""应用内定时任务调度器（APScheduler）。
+
+各模块通过 scheduler.add_job(...) 注册任务，随应用启动与关闭。
+多 worker 部署时每个进程都会运行同样的任务，任务自身需要保证可重入
+（例如用 Redis 锁保证同一时刻只有一个 worker 执行）。
+"""
+
+from __future__ import annotations
+
+import logging
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+logger = logging.getLogger(__name__)
+
+scheduler = AsyncIOScheduler(
+    job_defaults={
+        # 错过的执行合并为一次，且同一任务不并发
+        "coalesce": True,
+        "max_instances": 1,
+        "misfire_grace_time": 300,
+    }
+)
+
+
+def start_scheduler() -> None:
+    if not scheduler.running:
+        scheduler.start()
+        logger.info(f"定时任务已启动: {[job.id for job in scheduler.get_jobs()]}")
+
+
+def shutdown_scheduler() -> None:
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
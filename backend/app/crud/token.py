@@ -1,40 +1,25 @@
-"""Token 与在线统计。"""
+"""Token 与在线统计。
+
+在线与注册统计使用共享的异步 Redis 连接池（app.core.redis）。这些函数由同步路由
+在工作线程中调用：写操作提交到事件循环后立即返回，读操作同步等待结果，
+Redis 不可用时降级为数据库统计。
+"""
 
 from __future__ import annotations
 
-import logging
+import time
 from datetime import datetime
-from typing import Optional
 
-import redis
 from sqlalchemy import func
 from sqlmodel import Session, select
 
-from app.core.config import settings
+from app.core.redis import redis_pool
 from app.models.token import AuthToken
 from app.models.user import User
 
-
-def init_redis() -> Optional["redis.Redis"]:
-    try:
-        client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            password=settings.redis_password,
-            decode_responses=True,
-        )
-        client.ping()
-        return client
-    except Exception as exc:  # noqa: BLE001
-        logging.warning("Redis 连接失败，将使用数据库统计：%s", exc)
-        return None
-
-
-redis_client = init_redis()
-if redis_client:
-    logging.info("Redis 连接成功")
-else:
-    logging.info("Redis 不可用，使用数据库统计在线与注册数量")
+# 在线统计：10 分钟内有活跃请求的用户
+ACTIVITY_KEY = "user_activity"
+ACTIVITY_WINDOW = 600
 
 
 def create_token(session: Session, token: str, user_id: int, expires_at: datetime | None) -> AuthToken:
@@ -66,33 +51,31 @@ def purge_expired_tokens(session: Session) -> int:
 
 
 def increment_register_count() -> None:
-    if redis_client:
-        redis_client.incr("register_count")
+    redis_pool.submit(lambda r: r.incr("register_count"))
 
 
 def register_user_online(token: str) -> None:
-    if redis_client:
-        redis_client.sadd("online_tokens", token)
+    redis_pool.submit(lambda r: r.sadd("online_tokens", token))
 
 
 def logout_user_online(token: str) -> None:
-    if redis_client:
-        redis_client.srem("online_tokens", token)
+    redis_pool.submit(lambda r: r.srem("online_tokens", token))
+
+
+async def _count_active_users(client) -> int:
+    # 使用 Redis ZSET 存储用户活跃时间，清理过期记录后统计窗口内的活跃用户数
+    pipe = client.pipeline()
+    pipe.zremrangebyscore(ACTIVITY_KEY, 0, time.time() - ACTIVITY_WINDOW)
+    pipe.zcard(ACTIVITY_KEY)
+    _, count = await pipe.execute()
+    return count
 
 
 def get_online_count(session: Session) -> int:
     """获取在线人数（10分钟内有活跃请求的用户数）"""
-    if redis_client:
-        try:
-            # 使用 Redis ZSET 存储用户活跃时间，获取10分钟内活跃的用户数
-            import time
-            cutoff_time = time.time() - 600  # 10分钟前
-            # 清理过期的活跃记录
-            redis_client.zremrangebyscore("user_activity", 0, cutoff_time)
-            # 获取活跃用户数
-            return redis_client.zcard("user_activity")
-        except Exception:
-            pass
+    count = redis_pool.run_sync(_count_active_users)
+    if count is not None:
+        return count
     
     # 降级：返回有效 token 数量
     purge_expired_tokens(session)
@@ -100,13 +83,9 @@ def get_online_count(session: Session) -> int:
 
 
 def update_user_activity(user_id: int) -> None:
-    """更新用户活跃时间"""
-    if redis_client:
-        try:
-            import time
-            redis_client.zadd("user_activity", {str(user_id): time.time()})
-        except Exception:
-            pass
+    """更新用户活跃时间（不等待 Redis 返回）"""
+    now = time.time()
+    redis_pool.submit(lambda r: r.zadd(ACTIVITY_KEY, {str(user_id): now}))
 
 
 def get_register_count(session: Session) -> int:
@@ -114,7 +93,6 @@ def get_register_count(session: Session) -> int:
     count = session.exec(select(func.count()).select_from(User)).one()
     
     # 如果Redis可用，同步更新Redis中的值
-    if redis_client:
-        redis_client.set("register_count", count)
+    redis_pool.submit(lambda r: r.set("register_count", count))
     
     return count
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import inspect
+import logging
 import os
+import time
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -9,7 +12,10 @@ from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
 
 from app.core.config import settings
+from app.core.http_client import http_pool
 from app.core.logging import setup_logging
+from app.core.redis import redis_pool
+from app.core.scheduler import shutdown_scheduler, start_scheduler
 from app.db.init_db import create_db_and_tables
 from app.core.exceptions import (
     AppException,
@@ -23,7 +29,11 @@ setup_logging()
 
 from app.api.router import api_router  # noqa: E402
 from app.services.ws_manager import ws_manager  # noqa: E402
-from app.services.memory_service import init_memory  # noqa: E402
+from app.services.memory_service import start_memory_init  # noqa: E402
+from app.services.memory_writer import memory_writer  # noqa: E402
+from app.services.memory_compaction import schedule_memory_compaction  # noqa: E402
+from app.services.github_service import schedule_trending_prewarm  # noqa: E402
+from app.services.model_registry import model_registry  # noqa: E402
 
 app = FastAPI(title=settings.app_title, version=settings.app_version)
 app.add_middleware(
@@ -142,16 +152,43 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
 
 
+logger = logging.getLogger(__name__)
+
+
 @app.on_event("startup")
-def on_startup() -> None:
-    create_db_and_tables()
-    init_memory()  # 初始化AI记忆服务
+async def on_startup() -> None:
+    started = time.perf_counter()
+    timings = []
+
+    async def step(name: str, fn) -> None:
+        step_started = time.perf_counter()
+        result = fn()
+        if inspect.isawaitable(result):
+            await result
+        timings.append(f"{name} {time.perf_counter() - step_started:.2f}s")
+
+    await step("数据库", create_db_and_tables)
+    await step("Redis连接池", redis_pool.open)  # 创建共享的异步 Redis 连接池
+    await step("HTTP连接池", http_pool.open)  # 初始化上游 HTTP 连接池
+    await step("模型注册表", model_registry.load)  # 预加载模型与角色提示词
+    model_registry.start_listener()
+    start_memory_init()  # AI记忆服务在后台初始化，不阻塞启动
+    memory_writer.start()  # 启动对话记忆后台写入队列
+    schedule_memory_compaction()
+    schedule_trending_prewarm()
+    start_scheduler()  # 启动定时任务
+    logger.info(f"应用启动完成，耗时 {time.perf_counter() - started:.2f} 秒（{', '.join(timings)}）")
 
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
-    """优雅关闭所有WebSocket连接。"""
+    """优雅关闭所有WebSocket连接与上游 HTTP 连接，并写完排队中的对话记忆。"""
+    shutdown_scheduler()
     await ws_manager.disconnect_all()
+    await memory_writer.stop()
+    await http_pool.aclose()
+    model_registry.stop_listener()
+    await redis_pool.aclose()  # 最后关闭，前面的步骤可能仍需写 Redis
 
 
 app.include_router(api_router)
@@ -34,6 +34,8 @@ class ChatCompletionRequest(SQLModel):
     stream: bool = False
     role_prompt: Optional[str] = None
     role_id: Optional[int] = None
+    # 响应缓存：None 按温度自动判断，True 强制启用，False 跳过
+    cache: Optional[bool] = None
 
 
 UsageValue = Union[int, Dict[str, int]]
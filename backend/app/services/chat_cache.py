@@ -0,0 +1,99 @@
+"""非流式聊天响应的精确匹配缓存。
+
+以最终请求体（合并后的消息、max_tokens、temperature）与请求可能到达的上游
+（首选模型与备用模型的 ID、地址、所有者，见 model_scope）的规范化哈希为键，
+把上游响应存入 Redis。只对低温度（结果基本确定）或调用方显式要求的请求生效。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from typing import Optional, Sequence
+
+from app.core.cache import get_cache_manager
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import redis_pool
+from app.models.user import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "chat:cache:"
+# 记录缓存键写入时间的有序集合，用于按条数淘汰最旧的缓存
+CACHE_INDEX_KEY = "chat:cache:index"
+
+
+def model_scope(model: ModelConfig, fallback_models: Sequence[ModelConfig] = ()) -> list:
+    """请求可能到达的上游：首选模型与按顺序排列的备用模型。
+    
+    只用 model_name 区分会让不同地址、不同用户的私有模型（model_name 可以相同）
+    以及用户无权使用的备用模型共享结果，因此按模型 ID、地址与所有者区分。
+    """
+    return [[m.id, m.base_url, m.model_name, m.owner_id] for m in (model, *fallback_models)]
+
+
+def canonical_request_hash(request_body: dict, scope: list) -> str:
+    """请求体与上游范围（model_scope）的规范化哈希，相同语义的请求得到相同的值。"""
+    canonical = {
+        "scope": scope,
+        "model": request_body.get("model"),
+        "messages": request_body.get("messages"),
+        "max_tokens": request_body.get("max_tokens"),
+        "temperature": request_body.get("temperature"),
+        "stream": bool(request_body.get("stream")),
+    }
+    raw = json.dumps(canonical, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(request_body: dict, opt_in: Optional[bool]) -> bool:
+    """判断请求是否走缓存：显式指定优先，否则只缓存低温度请求。"""
+    if not settings.chat_cache_enabled or request_body.get("stream") or opt_in is False:
+        return False
+    if opt_in:
+        return True
+    temperature = request_body.get("temperature")
+    return temperature is not None and temperature <= settings.chat_cache_max_temperature
+
+
+async def get_cached_response(request_body: dict, scope: list) -> Optional[dict]:
+    """读取缓存的响应（仅限相同的上游范围），未命中返回 None。"""
+    key = CACHE_PREFIX + canonical_request_hash(request_body, scope)
+    cached = await get_cache_manager().get(key)
+    if cached is None:
+        metrics.incr("chat.cache.miss")
+        return None
+    metrics.incr("chat.cache.hit")
+    return json.loads(cached)
+
+
+async def cache_response(request_body: dict, scope: list, data: dict) -> None:
+    """写入响应缓存，超过单条大小上限的响应不缓存，超过条数上限时淘汰最旧的。"""
+    value = json.dumps(data, ensure_ascii=False)
+    if len(value.encode("utf-8")) > settings.chat_cache_max_entry_bytes:
+        metrics.incr("chat.cache.too_large")
+        return
+
+    digest = canonical_request_hash(request_body, scope)
+    await get_cache_manager().set(CACHE_PREFIX + digest, value, ttl=settings.chat_cache_ttl)
+
+    async def maintain_index(client) -> None:
+        now = time.time()
+        pipe = client.pipeline()
+        pipe.zadd(CACHE_INDEX_KEY, {digest: now})
+        # 已过期的键也从索引中移除
+        pipe.zremrangebyscore(CACHE_INDEX_KEY, 0, now - settings.chat_cache_ttl)
+        pipe.zcard(CACHE_INDEX_KEY)
+        _, _, size = await pipe.execute()
+        overflow = size - settings.chat_cache_max_entries
+        if overflow > 0:
+            evicted = await client.zpopmin(CACHE_INDEX_KEY, overflow)
+            if evicted:
+                await client.delete(*[CACHE_PREFIX + member for member, _ in evicted])
+                metrics.incr("chat.cache.evicted", len(evicted))
+
+    await redis_pool.execute(maintain_index)
+    metrics.incr("chat.cache.store")
@@ -2,78 +2,141 @@
 
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
 import logging
 import secrets
-from typing import Optional, List
+import time
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, TypeVar
 
+import anyio
 import httpx
-from fastapi import HTTPException
+from fastapi import HTTPException, Request, Response
 from fastapi.responses import StreamingResponse
-from sqlmodel import Session, select
 
-from app.models.user import ModelConfig, Role, RolePrompt, User
+from app.core.config import settings
+from app.core.http_client import http_pool
+from app.core.metrics import metrics
+from app.models.user import ModelConfig, Role, User
 from app.schemas.message import ChatCompletionRequest
-from app.services.memory_service import (
-    search_memories,
-    extract_and_save_memory,
-    is_memory_enabled,
+from app.services.chat_cache import (
+    cache_response,
+    canonical_request_hash,
+    get_cached_response,
+    is_cacheable,
+    model_scope,
 )
+from app.services.memory_service import asearch_memories, is_memory_enabled
+from app.services.memory_writer import memory_writer
+from app.services.model_registry import model_registry
+from app.services.model_router import model_router
+from app.services.singleflight import SingleFlight, StreamSingleFlight
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
 
-def _get_all_models(session: Session) -> List[ModelConfig]:
-    """获取所有可用模型"""
-    return list(session.exec(select(ModelConfig)).all())
+# 等待上游首块期间检查客户端是否断开的间隔（秒）
+DISCONNECT_POLL_INTERVAL = 0.5
 
+# 聊天并发名额：限制同时进行的上游聊天请求数
+_chat_slots = asyncio.Semaphore(settings.chat_max_concurrency)
 
-def _select_model(session: Session, payload: ChatCompletionRequest) -> ModelConfig:
+# 相同请求合并：非流式共享结果，流式共享上游流
+_completion_flights: SingleFlight[dict] = SingleFlight("chat.singleflight")
+_stream_flights = StreamSingleFlight("chat.singleflight.stream", settings.chat_stream_replay_chunks)
+
+
+def _chat_target_url(base_url: str) -> str:
+    """如果 base_url 已包含 /chat/completions 则直接使用，否则拼接"""
+    if 'chat/completions' in base_url:
+        return base_url
+    return f"{base_url.rstrip('/')}/chat/completions"
+
+
+def _select_model(payload: ChatCompletionRequest) -> ModelConfig:
     model: Optional[ModelConfig] = None
     if payload.model_id:
-        model = session.get(ModelConfig, payload.model_id)
+        model = model_registry.get_model(payload.model_id)
     if not model:
-        model = session.exec(select(ModelConfig)).first()
+        models = model_registry.models()
+        model = models[0] if models else None
     if not model:
         raise HTTPException(status_code=404, detail="尚未配置可用模型")
     return model
 
 
-def _role_prompt(session: Session, payload: ChatCompletionRequest) -> Optional[str]:
+def _role_prompt(payload: ChatCompletionRequest) -> Optional[str]:
     role_prompt_text = payload.role_prompt
     if payload.role_id:
-        prompt_record = session.get(RolePrompt, payload.role_id)
-        if not prompt_record:
+        role_prompt_text = model_registry.role_prompt(payload.role_id)
+        if role_prompt_text is None:
             raise HTTPException(status_code=404, detail="提示词不存在")
-        role_prompt_text = prompt_record.prompt
     if not role_prompt_text:
-        fallback_prompt = session.exec(select(RolePrompt).order_by(RolePrompt.id)).first()
-        if fallback_prompt:
-            role_prompt_text = fallback_prompt.prompt
+        role_prompt_text = model_registry.default_role_prompt()
     return role_prompt_text
 
 
-def build_chat_request(
-    session: Session,
+def _resolve_chat_config(
     payload: ChatCompletionRequest,
     user: User,
-) -> tuple[ModelConfig, str, dict, List[ModelConfig]]:
-    model = _select_model(session, payload)
+) -> tuple[ModelConfig, List[ModelConfig], Optional[str]]:
+    """从模型注册表解析本次聊天使用的模型、备用模型与角色提示词。"""
+    model = _select_model(payload)
     if model.owner_id and user.role != Role.admin.value and user.id != model.owner_id:
         raise HTTPException(status_code=403, detail="无权使用该模型")
 
     # 获取备用模型（排除当前模型和用户无权使用的模型）
-    all_models = _get_all_models(session)
     fallback_models = [
-        m for m in all_models 
+        m for m in model_registry.models()
         if m.id != model.id and (not m.owner_id or user.role == Role.admin.value or user.id == m.owner_id)
     ]
+    return model, fallback_models, _role_prompt(payload)
 
-    # 如果 base_url 已包含 /chat/completions 则直接使用，否则拼接
-    if 'chat/completions' in model.base_url:
-        target_url = model.base_url
-    else:
-        target_url = f"{model.base_url.rstrip('/')}/chat/completions"
+
+def _last_user_message(payload: ChatCompletionRequest) -> Optional[str]:
+    return next((msg.content for msg in reversed(payload.messages) if msg.role == "user"), None)
+
+
+async def _search_user_memories(payload: ChatCompletionRequest, user: User) -> list[str]:
+    """在时间预算内检索与最后一条用户消息相关的记忆，超时则返回空列表。"""
+    if not is_memory_enabled() or not payload.messages:
+        return []
+    query = _last_user_message(payload)
+    if not query:
+        return []
+
+    started_at = time.perf_counter()
+    try:
+        return await asyncio.wait_for(
+            asearch_memories(query, str(user.id), limit=3),
+            timeout=settings.memory_search_budget,
+        )
+    except asyncio.TimeoutError:
+        metrics.incr("chat.memory.timeout")
+        logger.info(f"用户 {user.id} 记忆检索超过 {settings.memory_search_budget} 秒预算，本次不使用记忆")
+        return []
+    finally:
+        elapsed = time.perf_counter() - started_at
+        metrics.observe("chat.memory.search_seconds", elapsed)
+        logger.debug(f"用户 {user.id} 记忆检索耗时 {elapsed:.3f} 秒")
+
+
+async def build_chat_request(
+    payload: ChatCompletionRequest,
+    user: User,
+) -> tuple[ModelConfig, str, dict, List[ModelConfig]]:
+    # 记忆检索与模型、提示词解析并发进行
+    memory_task = asyncio.ensure_future(_search_user_memories(payload, user))
+    try:
+        # 模型与提示词来自内存注册表，仅在失效后重新加载时访问数据库
+        await model_registry.refresh_if_stale()
+        model, fallback_models, role_prompt_text = _resolve_chat_config(payload, user)
+    except BaseException:
+        memory_task.cancel()
+        raise
+
+    target_url = _chat_target_url(model.base_url)
     system_prompts = [
         {
             "role": "system",
@@ -81,24 +144,15 @@ def build_chat_request(
         }
     ]
 
-    # 获取用户相关记忆
-    if is_memory_enabled() and payload.messages:
-        last_user_msg = None
-        for msg in reversed(payload.messages):
-            if msg.role == "user":
-                last_user_msg = msg.content
-                break
-        
-        if last_user_msg:
-            memories = search_memories(last_user_msg, str(user.id), limit=3)
-            if memories:
-                memory_context = "用户相关记忆：\n" + "\n".join(f"- {m}" for m in memories)
-                system_prompts.append({
-                    "role": "system",
-                    "content": memory_context,
-                })
-
-    role_prompt_text = _role_prompt(session, payload)
+    # 获取用户相关记忆（超出时间预算时为空）
+    memories = await memory_task
+    if memories:
+        memory_context = "用户相关记忆：\n" + "\n".join(f"- {m}" for m in memories)
+        system_prompts.append({
+            "role": "system",
+            "content": memory_context,
+        })
+
     if role_prompt_text:
         system_prompts.append({"role": "system", "content": role_prompt_text})
 
@@ -115,106 +169,455 @@ def build_chat_request(
     return model, target_url, request_body, fallback_models
 
 
-def stream_chat_completion(model: ModelConfig, target_url: str, request_body: dict, fallback_models: List[ModelConfig] = None) -> StreamingResponse:
-    """流式聊天，支持模型故障转移"""
-    
-    def try_model(m: ModelConfig, url: str, body: dict):
-        """尝试单个模型"""
-        body_copy = body.copy()
-        body_copy["model"] = m.model_name
-        
-        with httpx.Client(timeout=30.0) as client:
-            with client.stream(
-                "POST",
-                url,
-                headers={"Authorization": f"Bearer {m.api_key}"},
-                json=body_copy,
-            ) as upstream_response:
-                if upstream_response.status_code >= 400:
-                    error_bytes = upstream_response.read()
-                    error_text = error_bytes.decode("utf-8", errors="replace")
-                    try:
-                        error_body = upstream_response.json()
-                        error_text = error_body.get("error", {}).get("message", error_text)
-                    except ValueError:
-                        pass
-                    return upstream_response.status_code, error_text, None
-                
-                # 成功，返回响应迭代器
-                chunks = list(upstream_response.iter_text())
-                return 200, None, chunks
-        
-    def stream_response():
-        # 尝试主模型
-        models_to_try = [model] + (fallback_models or [])
-        last_error = None
-        last_status = 500
-        
-        for i, m in enumerate(models_to_try):
+class ChatStreamingResponse(StreamingResponse):
+    """流式聊天响应。
+
+    无论正常结束、出错还是客户端断开，响应结束后都会执行已注册的清理回调，
+    保证上游连接与并发名额被释放。
+    """
+
+    def __init__(self, content: AsyncIterator[str]) -> None:
+        super().__init__(content, media_type="text/event-stream")
+        self._close_callbacks: list[Callable[[], Awaitable[None]]] = []
+
+    def add_close_callback(self, callback: Callable[[], Awaitable[None]]) -> None:
+        self._close_callbacks.append(callback)
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                for callback in self._close_callbacks:
+                    await callback()
+
+
+async def _open_upstream_stream(m: ModelConfig, body: dict) -> tuple[int, Optional[str], Optional[tuple[httpx.Response, AsyncIterator[str], str]]]:
+    """打开单个模型的上游流并读取首个数据块。
+
+    成功时返回 (200, None, (上游响应, 剩余数据迭代器, 首个数据块))，
+    上游响应由调用方在流结束后关闭；失败时返回 (状态码, 错误信息, None)。
+    """
+    body_copy = body.copy()
+    body_copy["model"] = m.model_name
+
+    url = _chat_target_url(m.base_url)
+    client = http_pool.client(url)
+    request = client.build_request(
+        "POST",
+        url,
+        headers={"Authorization": f"Bearer {m.api_key}"},
+        json=body_copy,
+    )
+    started_at = time.perf_counter()
+    try:
+        upstream_response = await client.send(request, stream=True)
+    except httpx.RequestError:
+        model_router.record_failure(m, 502)
+        raise
+    try:
+        if upstream_response.status_code >= 400:
+            error_bytes = await upstream_response.aread()
+            error_text = error_bytes.decode("utf-8", errors="replace")
             try:
-                # 如果 base_url 已包含 /chat/completions 则直接使用，否则拼接
-                if 'chat/completions' in m.base_url:
-                    url = m.base_url
-                else:
-                    url = f"{m.base_url.rstrip('/')}/chat/completions"
-                status, error, chunks = try_model(m, url, request_body)
-                
-                if status == 200 and chunks:
-                    if i > 0:
-                        logger.info(f"模型 {model.name} 失败，已切换到备用模型 {m.name}")
-                    for chunk in chunks:
-                        if chunk:
-                            yield chunk
-                    return
-                
-                # 记录错误
-                last_status = status
-                last_error = error
-                
-                # 429/502/503 错误尝试下一个模型
-                if status in (429, 502, 503) and i < len(models_to_try) - 1:
-                    logger.warning(f"模型 {m.name} 返回 {status}，尝试下一个模型")
-                    continue
-                    
-            except httpx.RequestError as exc:
-                last_error = str(exc)
-                last_status = 502
-                if i < len(models_to_try) - 1:
-                    logger.warning(f"模型 {m.name} 请求失败: {exc}，尝试下一个模型")
-                    continue
-        
+                error_body = upstream_response.json()
+                error_text = error_body.get("error", {}).get("message", error_text)
+            except ValueError:
+                pass
+            await upstream_response.aclose()
+            model_router.record_failure(m, upstream_response.status_code, upstream_response.headers)
+            return upstream_response.status_code, error_text, None
+
+        chunks = upstream_response.aiter_text()
+        async for chunk in chunks:
+            if chunk:
+                model_router.record_success(
+                    m, time.perf_counter() - started_at, upstream_response.headers, stream=True
+                )
+                return 200, None, (upstream_response, chunks, chunk)
+        await upstream_response.aclose()
+        model_router.record_failure(m, 502)
+        return 502, "上游返回空响应", None
+    except httpx.RequestError:
+        await upstream_response.aclose()
+        model_router.record_failure(m, 502)
+        raise
+    except BaseException:
+        await upstream_response.aclose()
+        model_router.record_cancelled(m)
+        raise
+
+
+async def _try_open_stream(m: ModelConfig, body: dict) -> tuple[int, Optional[str], Optional[tuple[httpx.Response, AsyncIterator[str], str]]]:
+    """同 _open_upstream_stream，但网络错误以 502 返回而不是抛出。"""
+    try:
+        return await _open_upstream_stream(m, body)
+    except httpx.RequestError as exc:
+        return 502, str(exc), None
+
+
+class _HedgeBudget:
+    """对冲预算：每个流式请求积累 ratio 个令牌，每次对冲消耗 1 个，
+    从而把额外的上游请求控制在 ratio 比例以内。"""
+
+    def __init__(self, ratio: float, capacity: float = 10.0) -> None:
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = 0.0
+
+    def on_request(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+_hedge_budget = _HedgeBudget(settings.chat_hedge_budget)
+
+
+async def _discard_stream_task(task: asyncio.Task, model: ModelConfig) -> None:
+    """取消落败的对冲请求；如果它已经拿到首块，关闭其上游响应。"""
+    if not task.done():
+        task.cancel()
+    try:
+        _, _, opened = await task
+    except asyncio.CancelledError:
+        # 任务可能在开始执行前就被取消，_open_upstream_stream 没有机会释放半开探测名额
+        model_router.record_cancelled(model)
+        return
+    except Exception:
+        return
+    if opened:
+        await opened[0].aclose()
+
+
+async def _open_stream_hedged(
+    primary: ModelConfig,
+    backup: ModelConfig,
+    body: dict,
+) -> tuple[ModelConfig, int, Optional[str], Optional[tuple[httpx.Response, AsyncIterator[str], str]], int]:
+    """带对冲的打开上游流。
+
+    首选模型在其近期首字节延迟的 CHAT_HEDGE_PERCENTILE 分位内没有返回首块时，
+    在预算允许的情况下向备用模型发出对冲请求，先拿到首块者胜出，另一个被取消。
+    返回 (实际模型, 状态码, 错误信息, 打开的流, 已尝试的模型数)。
+    """
+    _hedge_budget.on_request()
+    primary_task = asyncio.create_task(_try_open_stream(primary, body))
+    tasks = {primary_task: primary}
+    winner: Optional[asyncio.Task] = None
+    # 调用方在任何一步被取消（客户端断开、最后一个订阅者离开）时，
+    # 未被返回的请求都要在 finally 中取消并关闭其上游响应
+    try:
+        delay = model_router.ttfb_percentile(primary, settings.chat_hedge_percentile) or settings.chat_hedge_default_delay
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        # 备用模型半开时对冲请求就是它唯一的探测请求，先占用名额，预算不足再释放
+        hedge = not done and model_router.try_acquire(backup)
+        if hedge and not _hedge_budget.try_spend():
+            model_router.record_cancelled(backup)
+            hedge = False
+        if not hedge:
+            if not done:
+                metrics.incr("chat.hedge.skipped")
+            status, error, opened = await primary_task
+            winner = primary_task
+            return primary, status, error, opened, 1
+
+        metrics.incr("chat.hedge.fired")
+        logger.info(f"模型 {primary.name} {delay:.2f} 秒内未返回首字，向 {backup.name} 发出对冲请求")
+        backup_task = asyncio.create_task(_try_open_stream(backup, body))
+        tasks[backup_task] = backup
+        pending = set(tasks)
+        last_model, last_status, last_error = primary, 502, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                status, error, opened = task.result()
+                if opened:
+                    winner = task
+                    metrics.incr("chat.hedge.won" if task is backup_task else "chat.hedge.lost")
+                    return tasks[task], status, error, opened, 2
+                last_model, last_status, last_error = tasks[task], status, error
+        return last_model, last_status, last_error, None, 2
+    finally:
+        for task in tasks:
+            if task is not winner:
+                await _discard_stream_task(task, tasks[task])
+
+
+def _upstream_error(status: int, error: Optional[str]) -> HTTPException:
+    """所有候选模型都失败时返回给客户端的错误（流式与非流式一致）。"""
+    if "moderation" in (error or "").lower():
+        error = "内容被安全审核拦截，请修改消息内容后重试"
+    return HTTPException(status_code=status, detail=f"上游错误：{error}")
+
+
+async def _open_stream_with_failover(
+    model: ModelConfig,
+    fallback_models: List[ModelConfig],
+    request_body: dict,
+) -> tuple[str, AsyncIterator[str], Callable[[], Awaitable[None]]]:
+    """按 model_router 给出的顺序打开上游流，返回 (首个数据块, 剩余数据迭代器, 关闭回调)。
+
+    故障转移规则与非流式相同：任何失败（网络错误、空响应、任意 4xx/5xx）都尝试下一个模型。
+    """
+    models_to_try = model_router.order(model, fallback_models, stream=True)
+    last_error = None
+    last_status = 500
+    opened = None
+
+    i = 0
+    if settings.chat_hedge_enabled and len(models_to_try) > 1:
+        m, last_status, last_error, opened, i = await _open_stream_hedged(
+            models_to_try[0], models_to_try[1], request_body
+        )
+
+    while not opened and i < len(models_to_try):
+        m = models_to_try[i]
+        i += 1
+        status, error, opened = await _try_open_stream(m, request_body)
+        if opened:
+            break
+
+        # 记录错误
+        last_status = status
+        last_error = error
+        if i < len(models_to_try):
+            logger.warning(f"模型 {m.name} 返回 {status}，尝试下一个模型")
+
+    if not opened:
         # 所有模型都失败
-        if "Moderation" in (last_error or "") or "moderation" in (last_error or "").lower():
-            last_error = "内容被安全审核拦截，请修改消息内容后重试"
-        raise HTTPException(status_code=last_status, detail=f"上游错误：{last_error}")
+        metrics.incr("chat.stream.failed")
+        raise _upstream_error(last_status, last_error)
 
-    return StreamingResponse(stream_response(), media_type="text/event-stream")
+    if m.id != models_to_try[0].id:
+        logger.info(f"模型 {models_to_try[0].name} 失败，已切换到备用模型 {m.name}")
+    upstream_response, chunks, first_chunk = opened
+    return first_chunk, chunks, upstream_response.aclose
 
 
-def fetch_chat_completion(model: ModelConfig, target_url: str, request_body: dict) -> dict:
+async def stream_chat_completion(
+    model: ModelConfig,
+    target_url: str,
+    request_body: dict,
+    fallback_models: List[ModelConfig] = None,
+    on_complete: Optional[Callable[[], None]] = None,
+) -> ChatStreamingResponse:
+    """流式聊天，支持模型故障转移
+
+    在返回响应前先拿到上游首个数据块：首块之前的失败会切换到备用模型，
+    之后的数据块收到即转发，不在内存中缓冲整个回复。
+    尝试顺序由 model_router 按熔断状态与首字节延迟决定。
+    相同的并发请求共享同一个上游流（singleflight），只缓冲前
+    CHAT_STREAM_REPLAY_CHUNKS 个数据块供晚到者回放。
+    流完整结束时调用 on_complete。
+    """
+    started_at = time.perf_counter()
+    # 只合并上游范围（首选与备用模型）完全相同的请求，不同用户的私有模型互不共享
+    subscription = await _stream_flights.subscribe(
+        canonical_request_hash(request_body, model_scope(model, fallback_models or [])),
+        lambda: _open_stream_with_failover(model, fallback_models or [], request_body),
+    )
+    metrics.observe("chat.stream.ttfb_seconds", time.perf_counter() - started_at)
+
+    async def stream_response():
+        bytes_streamed = 0
+        try:
+            async for chunk in subscription:
+                yield chunk
+                bytes_streamed += len(chunk.encode("utf-8"))
+            if subscription.error is not None:
+                metrics.incr("chat.stream.interrupted")
+            elif on_complete is not None:
+                on_complete()
+        finally:
+            metrics.incr("chat.stream.completed")
+            metrics.incr("chat.stream.bytes_total", bytes_streamed)
+            metrics.observe("chat.stream.bytes", bytes_streamed)
+            metrics.observe("chat.stream.duration_seconds", time.perf_counter() - started_at)
+
+    async def close_subscription() -> None:
+        if await subscription.close():
+            # 客户端在上游结束前断开，且没有其他订阅者：上游请求已中止
+            streamed_tokens = max(0, subscription.sse_events)
+            tokens_saved = max(0, request_body.get("max_tokens", 0) - streamed_tokens)
+            metrics.incr("chat.stream.cancelled")
+            metrics.incr("chat.stream.tokens_saved_estimate", tokens_saved)
+            logger.info(f"客户端已断开，中止上游流式请求（已输出约 {streamed_tokens} 个 token）")
+
+    response = ChatStreamingResponse(stream_response())
+    response.add_close_callback(close_subscription)
+    return response
+
+
+async def _fetch_from_model(m: ModelConfig, request_body: dict) -> tuple[int, Optional[str], Optional[dict]]:
+    """请求单个模型的非流式回复，返回 (状态码, 错误信息, 响应数据)。
+
+    与 _open_upstream_stream 以相同的方式反馈 model_router：网络错误与无法解析的响应
+    记为 502，上游错误按状态码记录，被取消时只释放半开探测名额。
+    """
+    url = _chat_target_url(m.base_url)
+    body_copy = request_body.copy()
+    body_copy["model"] = m.model_name
+    started_at = time.perf_counter()
     try:
-        with httpx.Client(timeout=30.0) as client:
-            upstream_response = client.post(
-                target_url,
-                headers={"Authorization": f"Bearer {model.api_key}"},
-                json=request_body,
-            )
+        upstream_response = await http_pool.client(url).post(
+            url,
+            headers={"Authorization": f"Bearer {m.api_key}"},
+            json=body_copy,
+        )
     except httpx.RequestError as exc:
-        raise HTTPException(status_code=502, detail=f"请求上游模型失败：{exc}") from exc
+        model_router.record_failure(m, 502)
+        return 502, str(exc), None
+    except BaseException:
+        model_router.record_cancelled(m)
+        raise
 
     if upstream_response.status_code >= 400:
+        model_router.record_failure(m, upstream_response.status_code, upstream_response.headers)
         try:
             error_body = upstream_response.json()
             error_message = error_body.get("error", {}).get("message", upstream_response.text)
         except ValueError:
             error_message = upstream_response.text
-        raise HTTPException(status_code=upstream_response.status_code, detail=f"上游错误：{error_message}")
+        return upstream_response.status_code, error_message, None
+
+    try:
+        data = upstream_response.json()
+    except ValueError:
+        model_router.record_failure(m, 502)
+        return 502, "上游返回的响应无法解析", None
+    model_router.record_success(m, time.perf_counter() - started_at, upstream_response.headers)
+    return 200, None, data
+
+
+async def fetch_chat_completion(
+    model: ModelConfig,
+    target_url: str,
+    request_body: dict,
+    fallback_models: List[ModelConfig] = None,
+) -> dict:
+    """非流式聊天，按 model_router 给出的顺序故障转移。
+
+    与流式相同：任何失败都尝试下一个模型。单个上游的 4xx（密钥失效、模型名不存在、
+    上下文超长、该服务商的审核）并不说明其他模型也会拒绝。
+    """
+    models_to_try = model_router.order(model, fallback_models or [], stream=False)
+    last_status, last_error = 502, None
+    for i, m in enumerate(models_to_try):
+        status, error, data = await _fetch_from_model(m, request_body)
+        if data is not None:
+            if i > 0:
+                logger.info(f"模型 {models_to_try[0].name} 失败，已切换到备用模型 {m.name}")
+            break
+        last_status, last_error = status, error
+        if i < len(models_to_try) - 1:
+            logger.warning(f"模型 {m.name} 返回 {status}，尝试下一个模型")
+    else:
+        raise _upstream_error(last_status, last_error)
 
-    data = upstream_response.json()
     now_ts = int(dt.datetime.now().timestamp())
     data.setdefault("id", f"chatcmpl-{secrets.token_hex(6)}")
     data.setdefault("object", "chat.completion")
     data.setdefault("created", now_ts)
-    data.setdefault("model", model.model_name)
+    data.setdefault("model", m.model_name)
     data.setdefault("usage", {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0})
     return data
+
+
+async def _acquire_chat_slot() -> None:
+    """获取聊天并发名额，排队超时返回 503。"""
+    try:
+        await asyncio.wait_for(_chat_slots.acquire(), timeout=settings.chat_queue_timeout)
+    except asyncio.TimeoutError:
+        metrics.incr("chat.rejected")
+        raise HTTPException(status_code=503, detail="当前聊天请求过多，请稍后重试")
+    metrics.incr("chat.inflight")
+
+
+async def _release_chat_slot() -> None:
+    _chat_slots.release()
+    metrics.incr("chat.inflight", -1)
+
+
+async def _until_disconnect(request: Optional[Request], awaitable: Awaitable[T]) -> T:
+    """等待 awaitable 完成，期间客户端断开则取消它。
+
+    响应开始后由 Starlette 监听断开；这里覆盖响应开始前（等待上游首块）的阶段。
+    """
+    task = asyncio.ensure_future(awaitable)
+    if request is None:
+        return await task
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                metrics.incr("chat.stream.cancelled_before_first_chunk")
+                logger.info("客户端在首块返回前断开，已放弃上游请求")
+                raise HTTPException(status_code=499, detail="客户端已断开")
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+async def create_chat_completion(
+    payload: ChatCompletionRequest,
+    user: User,
+    response: Optional[Response] = None,
+    request: Optional[Request] = None,
+) -> dict | ChatStreamingResponse:
+    """处理一次聊天请求。
+
+    并发受 CHAT_MAX_CONCURRENCY 限制；流式请求的名额在响应结束后释放。
+    回复完成后把本轮对话提交到后台记忆写入队列。
+    可缓存的非流式请求先查响应缓存，并通过 X-Chat-Cache 响应头告知命中情况。
+    流式请求在等待首块期间如果客户端断开，立即放弃上游请求。
+    """
+    user_message = _last_user_message(payload)
+
+    def remember() -> None:
+        # 对话记忆（用户消息）交给后台队列批量写入，不占用请求时间
+        if user_message:
+            memory_writer.submit(user_message, str(user.id))
+
+    await _acquire_chat_slot()
+    try:
+        model, target_url, request_body, fallback_models = await build_chat_request(payload, user)
+        if payload.stream:
+            stream_response = await _until_disconnect(
+                request, stream_chat_completion(model, target_url, request_body, fallback_models, remember)
+            )
+            stream_response.add_close_callback(_release_chat_slot)
+            return stream_response
+
+        # 响应缓存与请求合并使用同一上游范围：不同用户的私有模型、不同的备用模型互不共享结果
+        scope = model_scope(model, fallback_models)
+        cacheable = is_cacheable(request_body, payload.cache)
+        result = await get_cached_response(request_body, scope) if cacheable else None
+        cache_status = "HIT" if result is not None else ("MISS" if cacheable else "BYPASS")
+        if result is None:
+            async def fetch_and_cache() -> dict:
+                data = await fetch_chat_completion(model, target_url, request_body, fallback_models)
+                if cacheable:
+                    await cache_response(request_body, scope, data)
+                return data
+
+            # 相同的并发请求（含相同的首选与备用模型）只向上游发出一次
+            result = await _completion_flights.do(canonical_request_hash(request_body, scope), fetch_and_cache)
+        if response is not None:
+            response.headers["X-Chat-Cache"] = cache_status
+        remember()
+    except BaseException:
+        await _release_chat_slot()
+        raise
+    await _release_chat_slot()
+    return result
@@ -0,0 +1,187 @@
+"""记忆嵌入向量的持久化缓存。
+
+以 嵌入模型 + 文本 SHA-256 为键，把向量以 float32 字节存入 SQLite，
+按最近使用时间在字节预算内做 LRU 淘汰。wrap() 替换嵌入器实例上的
+embed / embed_batch，对 powermem 与本地向量索引的嵌入器都适用。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _to_blob(vector: list[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _from_blob(blob: bytes) -> list[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+def embedder_model(embedder: Any) -> str:
+    """嵌入器使用的模型名，作为缓存键的一部分。"""
+    model = getattr(embedder, "model", None) or getattr(getattr(embedder, "config", None), "model", None)
+    return str(model or embedder.__class__.__name__)
+
+
+class EmbeddingCache:
+    """SQLite 嵌入缓存，按字节预算做 LRU 淘汰。"""
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, texts: list[str]) -> list[Optional[list[float]]]:
+        keys = [_cache_key(model, text) for text in texts]
+        with self._lock:
+            placeholders = ",".join("?" * len(keys))
+            rows = dict(
+                self._conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys).fetchall()
+            )
+            if rows:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in rows])
+                self._conn.commit()
+        hits = len(rows)
+        metrics.incr("memory.embedding_cache.hit", hits)
+        metrics.incr("memory.embedding_cache.miss", len(keys) - hits)
+        return [_from_blob(rows[k]) if k in rows else None for k in keys]
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]) -> None:
+        now = time.time()
+        records = []
+        for text, vector in zip(texts, vectors):
+            blob = _to_blob(vector)
+            records.append((_cache_key(model, text), blob, len(blob), now))
+        with self._lock:
+            keys = [r[0] for r in records]
+            placeholders = ",".join("?" * len(keys))
+            replaced = self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchone()[0]
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", records)
+            self._bytes += sum(r[2] for r in records) - replaced
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """淘汰最久未使用的条目，直到降到预算的 90%。"""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        while self._bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_used LIMIT 500"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._bytes <= target:
+                    break
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._bytes -= size
+                evicted += 1
+        metrics.incr("memory.embedding_cache.evicted", evicted)
+
+    def wrap(self, embedder: Any) -> Any:
+        """替换嵌入器实例的 embed / embed_batch，先查缓存，只对未命中的文本调用远端。"""
+        model = embedder_model(embedder)
+        original_embed = embedder.embed
+        original_embed_batch = getattr(embedder, "embed_batch", None)
+
+        def embed(text, memory_action=None):
+            cached = self.get_many(model, [text])[0]
+            if cached is not None:
+                return cached
+            metrics.incr("memory.embedding_cache.remote_calls")
+            vector = original_embed(text, memory_action)
+            self.put_many(model, [text], [vector])
+            return vector
+
+        def embed_batch(texts, memory_action=None):
+            texts = list(texts)
+            if not texts:
+                return []
+            results = self.get_many(model, texts)
+            missing = list(dict.fromkeys(t for t, v in zip(texts, results) if v is None))
+            if missing:
+                metrics.incr("memory.embedding_cache.remote_calls")
+                if original_embed_batch is not None:
+                    vectors = original_embed_batch(missing, memory_action)
+                else:
+                    vectors = [original_embed(text, memory_action) for text in missing]
+                self.put_many(model, missing, vectors)
+                computed = dict(zip(missing, vectors))
+                results = [v if v is not None else computed[t] for t, v in zip(texts, results)]
+            return results
+
+        embedder.embed = embed
+        embedder.embed_batch = embed_batch
+        logger.info(f"嵌入缓存已启用: {self.path}（模型 {model}，上限 {self.max_bytes // (1024 * 1024)} MB）")
+        return embedder
+
+    def stats(self) -> dict:
+        hits = metrics.get("memory.embedding_cache.hit")
+        misses = metrics.get("memory.embedding_cache.miss")
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            # 命中的每条文本都省去了一次远端嵌入
+            "embeddings_saved": hits,
+            "remote_calls": metrics.get("memory.embedding_cache.remote_calls"),
+            "evicted": metrics.get("memory.embedding_cache.evicted"),
+        }
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """已启用的嵌入缓存；EMBEDDING_CACHE_ENABLED=false 时返回 None。"""
+    global _embedding_cache
+    if _embedding_cache is None and settings.embedding_cache_enabled:
+        _embedding_cache = EmbeddingCache(settings.embedding_cache_path, settings.embedding_cache_max_bytes)
+    return _embedding_cache
@@ -1,33 +1,105 @@
-"""GitHub 热点项目服务 - 获取热门 Python 项目"""
+"""GitHub 热点项目服务 - 获取各语言的热门项目
+
+每个 (语言, 时间窗口) 定期从 GitHub 抓取一个按星标排序的项目超集，
+保存在进程内存与 Redis 中；limit、min_stars 等参数只对超集做过滤与截取，
+不同参数组合的请求不会产生额外的 GitHub 调用。
+每次抓取到的星标数同时写入每日快照（github_snapshots），按星标增速排序
+只读取本地快照，同样不需要请求 GitHub。
+"""
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import logging
+import math
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 
 import httpx
-import redis
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlmodel import Session, select
 
+from app.core.cache import get_cache_manager
 from app.core.config import settings
+from app.core.http_client import http_pool
+from app.core.metrics import metrics
+from app.core.redis import RELEASE_LOCK_SCRIPT, redis_pool
+from app.core.scheduler import scheduler
 from app.db.session import engine
-from app.models.user import ModelConfig
+from app.models.user import ModelConfig, SystemConfig
+from app.services.chat_service import _chat_target_url
+from app.services.github_snapshots import VELOCITY_WINDOWS, get_snapshot_store
+from app.services.model_registry import model_registry
+from app.services.model_router import model_router
+from app.services.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
-# Redis 缓存配置
-CACHE_KEY = "github:trending:python"
-CACHE_TTL = 86400  # 1 天（24小时）
+# Redis 缓存配置（stale-while-revalidate），键为 github:trending:{语言}:{窗口}
+CACHE_KEY_PREFIX = "github:trending"
+CACHE_TTL = 86400  # 新鲜期 1 天（24小时），过后返回旧数据并在后台刷新
+CACHE_STALE_TTL = 7 * 86400  # Redis 键的实际过期时间，超过后才需要同步等待
+PREWARM_MARGIN = 2 * 3600  # 新鲜期结束前 2 小时由定时任务预热
+# 每个超集从 GitHub 获取并缓存的项目数（搜索接口单页上限）。代价是冷刷新时需要翻译的描述
+# 约为 30 个时的 3.3 倍（每批 TRANSLATE_BATCH_SIZE 条，最多 20 批）；翻译按描述哈希缓存，
+# 之后的刷新只翻译新进榜项目的描述，语言又限定在 GITHUB_TRENDING_LANGUAGES 内，总量有界
+FETCH_LIMIT = 100
+# 时间窗口 → 只统计多少天内创建的项目；month 为当月（自然月）
+TRENDING_WINDOWS = {"day": 1, "week": 7, "month": None}
+DEFAULT_LANGUAGE = "python"
+DEFAULT_WINDOW = "month"
+# 排序方式：总星标，或 1 / 7 / 30 天内的星标增量
+TRENDING_SORTS = ("stars",) + tuple(f"stars_{days}d" for days in VELOCITY_WINDOWS)
+# 最近多久被请求过的超集会由定时任务预热，每轮最多预热最近请求的几个（不含默认超集）
+PREWARM_TRACK_SECONDS = 7 * 86400
+PREWARM_MAX_SPECS = 8
+# 进程内最多保留多少个超集副本（按最近使用淘汰）
+LOCAL_CACHE_MAX_SPECS = 32
+
+# 翻译缓存：每条翻译一个键 github:translation:{原始描述的哈希}，各自 30 天过期
+TRANSLATION_CACHE_PREFIX = "github:translation:"
+TRANSLATION_CACHE_TTL = 30 * 86400
+TRANSLATE_BATCH_SIZE = 5
+
+# 刷新锁（每个超集一把）：同一时刻只有一个 worker 请求 GitHub 与翻译
+REFRESH_LOCK_TTL = 300
+# 冷启动时等待其他 worker 刷新完成的最长时间（秒）
+COLD_WAIT_SECONDS = 30
 
 # GitHub API 配置
-GITHUB_API_URL = "https://api.github.com/search/repositories"
+GITHUB_SEARCH_PATH = "/search/repositories"
+# SystemConfig 中可选的访问令牌（匿名搜索只有每分钟 10 次额度）
+GITHUB_TOKEN_CONFIG_KEY = "GITHUB_TOKEN"
+# 最近一次响应中的额度状态，多 worker 共享，额度重置时过期
+RATE_LIMIT_KEY = "github:ratelimit:search"
+
+
+class GitHubRateLimitError(Exception):
+    """GitHub API 额度已用尽，在 reset_at 之前不再请求。"""
+
+    def __init__(self, reset_at: float) -> None:
+        self.reset_at = reset_at
+        wait = max(0, math.ceil(reset_at - time.time()))
+        super().__init__(f"GitHub API 请求频率超限，{wait} 秒后重置")
+
+
+@dataclass
+class SearchResult:
+    """一次搜索请求的结果；items 为 None 表示 304（数据未变化）。"""
+    items: Optional[list[dict]]
+    etag: Optional[str]
 
 
 class TrendingProject(BaseModel):
     """热门项目数据模型"""
+    id: Optional[int] = None  # GitHub 仓库 ID，快照以此为键
     name: str
     full_name: str
     description: Optional[str] = None
@@ -39,53 +111,166 @@ class TrendingProject(BaseModel):
     language: str
     created_at: str
     updated_at: str
+    # 星标增量，来自本地快照，历史不足时为空
+    stars_1d: Optional[int] = None
+    stars_7d: Optional[int] = None
+    stars_30d: Optional[int] = None
 
 
-def _get_redis_client() -> Optional[redis.Redis]:
-    """获取 Redis 客户端"""
-    try:
-        client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            password=settings.redis_password,
-            decode_responses=True
-        )
-        client.ping()
-        return client
-    except Exception as e:
-        logger.warning(f"Redis 连接失败，将直接请求 GitHub API: {e}")
-        return None
+def _normalize_language(language: str) -> str:
+    """GitHub 语言限定符不区分大小写，空格写作连字符（如 jupyter-notebook）。"""
+    return "-".join(language.strip().lower().split())
+
+
+# 允许查询的语言：每个新语言都会产生一次冷刷新（GitHub 搜索 + 整个超集的翻译）
+TRENDING_LANGUAGES = frozenset(
+    {_normalize_language(language) for language in settings.github_trending_languages} | {DEFAULT_LANGUAGE}
+)
+
+
+@dataclass(frozen=True)
+class TrendingSpec:
+    """一个缓存超集：语言 + 时间窗口。"""
+    language: str = DEFAULT_LANGUAGE
+    window: str = DEFAULT_WINDOW
+
+    @classmethod
+    def of(cls, language: str, window: str) -> "TrendingSpec":
+        if window not in TRENDING_WINDOWS:
+            raise ValueError(f"不支持的时间窗口: {window}")
+        language = _normalize_language(language)
+        if language not in TRENDING_LANGUAGES:
+            raise ValueError(f"不支持的语言: {language}")
+        return cls(language, window)
 
+    @property
+    def cache_key(self) -> str:
+        return f"{CACHE_KEY_PREFIX}:{self.language}:{self.window}"
 
-def _build_search_query() -> str:
+    @property
+    def lock_key(self) -> str:
+        return f"{self.cache_key}:lock"
+
+
+DEFAULT_SPEC = TrendingSpec()
+
+
+def _build_search_query(spec: TrendingSpec) -> str:
     """构建 GitHub 搜索查询字符串
     
-    搜索当月创建的热门 Python 项目
+    搜索时间窗口内创建的指定语言项目
     """
-    # 获取当月第一天
     today = datetime.now()
-    first_day_of_month = today.replace(day=1)
-    date_str = first_day_of_month.strftime("%Y-%m-%d")
+    days = TRENDING_WINDOWS[spec.window]
+    if days is None:
+        # 获取当月第一天
+        since = today.replace(day=1)
+    else:
+        since = today - timedelta(days=days)
+    date_str = since.strftime("%Y-%m-%d")
     
-    # 构建查询：Python 语言，当月创建，按星标排序
-    query = f"language:python created:>={date_str}"
+    # 构建查询：指定语言，窗口内创建，按星标排序
+    query = f"language:{spec.language} created:>={date_str}"
     return query
 
 
-async def _fetch_from_github(query: str, limit: int) -> list[dict]:
+def _search_url() -> str:
+    return f"{settings.github_api_url.rstrip('/')}{GITHUB_SEARCH_PATH}"
+
+
+def _github_token() -> Optional[str]:
+    """读取 SystemConfig 中的 GitHub 令牌，未配置时返回 None。"""
+    with Session(engine) as session:
+        config = session.exec(select(SystemConfig).where(SystemConfig.key == GITHUB_TOKEN_CONFIG_KEY)).first()
+    return config.value.strip() if config and config.value and config.value.strip() else None
+
+
+_rate_limit_reset_at = 0.0
+
+
+async def _rate_limited_until() -> Optional[float]:
+    """额度已用尽时返回重置时间戳，否则返回 None。"""
+    global _rate_limit_reset_at
+    now = time.time()
+    if _rate_limit_reset_at > now:
+        return _rate_limit_reset_at
+    cached = await get_cache_manager().get(RATE_LIMIT_KEY)
+    if not cached:
+        return None
+    state = json.loads(cached)
+    if state.get("remaining", 1) <= 0 and state.get("reset", 0) > now:
+        _rate_limit_reset_at = state["reset"]
+        return _rate_limit_reset_at
+    return None
+
+
+async def _record_rate_limit(response: httpx.Response) -> None:
+    """记录响应头中的额度；用尽时暂停请求直到重置，并安排重置后刷新。"""
+    global _rate_limit_reset_at
+    headers = response.headers
+    try:
+        remaining = int(headers["X-RateLimit-Remaining"]) if "X-RateLimit-Remaining" in headers else None
+        reset_at = float(headers["X-RateLimit-Reset"]) if "X-RateLimit-Reset" in headers else None
+        retry_after = float(headers["Retry-After"]) if "Retry-After" in headers else None
+    except ValueError:
+        return
+    if response.status_code in (403, 429) and retry_after is not None:
+        # 次级限流只给出 Retry-After
+        remaining, reset_at = 0, time.time() + retry_after
+    if remaining is None or reset_at is None:
+        return
+
+    metrics.incr("github.ratelimit.responses")
+    logger.debug(f"GitHub API 剩余额度 {remaining}，{reset_at - time.time():.0f} 秒后重置")
+    if remaining <= 0:
+        _rate_limit_reset_at = reset_at
+        metrics.incr("github.ratelimit.exhausted")
+        logger.warning(f"GitHub API 额度已用尽，{reset_at - time.time():.0f} 秒内不再请求")
+        _schedule_refresh_at(reset_at)
+    await get_cache_manager().set(
+        RATE_LIMIT_KEY,
+        json.dumps({"remaining": remaining, "reset": reset_at}),
+        ttl=max(1, math.ceil(reset_at - time.time())),
+    )
+
+
+def _schedule_refresh_at(reset_at: float) -> None:
+    """额度重置后立即检查一次缓存是否需要刷新。"""
+    if not scheduler.running:
+        return
+    scheduler.add_job(
+        prewarm_trending_cache,
+        "date",
+        run_date=datetime.fromtimestamp(reset_at + 1),
+        id="github-trending-after-ratelimit",
+        replace_existing=True,
+    )
+
+
+async def _fetch_from_github(query: str, limit: int, etag: Optional[str] = None) -> SearchResult:
     """从 GitHub API 获取数据
     
+    带上次响应的 ETag 发起条件请求，数据未变化时 GitHub 返回 304，
+    不需要重新解析与翻译。额度用尽期间不发请求。
+    
     Args:
         query: 搜索查询字符串
         limit: 返回项目数量
+        etag: 上次响应的 ETag
         
     Returns:
-        GitHub API 返回的仓库列表
+        SearchResult，304 时 items 为 None
         
     Raises:
+        GitHubRateLimitError: 额度已用尽
         httpx.HTTPStatusError: API 请求失败
         httpx.TimeoutException: 请求超时
     """
+    reset_at = await _rate_limited_until()
+    if reset_at is not None:
+        metrics.incr("github.ratelimit.skipped")
+        raise GitHubRateLimitError(reset_at)
+
     params = {
         "q": query,
         "sort": "stars",
@@ -97,17 +282,29 @@ async def _fetch_from_github(query: str, limit: int) -> list[dict]:
         "Accept": "application/vnd.github.v3+json",
         "User-Agent": "GitHub-Trending-App"
     }
+    token = await run_in_threadpool(_github_token)
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    if etag:
+        headers["If-None-Match"] = etag
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            GITHUB_API_URL,
-            params=params,
-            headers=headers,
-            timeout=10.0
-        )
-        response.raise_for_status()
-        data = response.json()
-        return data.get("items", [])
+    url = _search_url()
+    response = await http_pool.client(url).get(
+        url,
+        params=params,
+        headers=headers,
+        timeout=10.0
+    )
+    await _record_rate_limit(response)
+    if response.status_code == 304:
+        metrics.incr("github.fetch.not_modified")
+        return SearchResult(None, etag)
+    if response.status_code in (403, 429) and _rate_limit_reset_at > time.time():
+        raise GitHubRateLimitError(_rate_limit_reset_at)
+    response.raise_for_status()
+    metrics.incr("github.fetch.full")
+    data = response.json()
+    return SearchResult(data.get("items", []), response.headers.get("ETag"))
 
 
 def _transform_to_trending_project(repo: dict) -> TrendingProject:
@@ -120,6 +317,7 @@ def _transform_to_trending_project(repo: dict) -> TrendingProject:
         TrendingProject 对象
     """
     return TrendingProject(
+        id=repo.get("id"),
         name=repo.get("name", ""),
         full_name=repo.get("full_name", ""),
         description=repo.get("description"),
@@ -127,66 +325,201 @@ def _transform_to_trending_project(repo: dict) -> TrendingProject:
         forks=repo.get("forks_count", 0),
         url=repo.get("html_url", ""),
         author=repo.get("owner", {}).get("login", ""),
-        language=repo.get("language", "Python"),
+        language=repo.get("language") or "",
         created_at=repo.get("created_at", ""),
         updated_at=repo.get("updated_at", "")
     )
 
 
-def _get_cached_projects(redis_client: redis.Redis) -> Optional[list[TrendingProject]]:
-    """从 Redis 获取缓存数据
-    
-    Args:
-        redis_client: Redis 客户端
-        
-    Returns:
-        缓存的项目列表，如果缓存不存在或过期则返回 None
-    """
-    try:
-        cached_data = redis_client.get(CACHE_KEY)
-        if cached_data:
-            projects_data = json.loads(cached_data)
-            return [TrendingProject(**p) for p in projects_data]
-    except Exception as e:
-        logger.warning(f"读取 Redis 缓存失败: {e}")
-    return None
+@dataclass
+class CachedTrending:
+    """缓存中的热门项目及其抓取时间。"""
+    fetched_at: float
+    projects: list[TrendingProject]
+    # 所有描述都已翻译；未完成时新鲜期缩短，下次刷新补齐
+    complete: bool = True
+    # 条件请求使用：ETag 只对同一个查询有效
+    etag: Optional[str] = None
+    query: Optional[str] = None
 
+    @property
+    def fresh_for(self) -> float:
+        """新鲜期长度（秒）。"""
+        return CACHE_TTL if self.complete else settings.github_translate_retry_interval
 
-def _cache_projects(redis_client: redis.Redis, projects: list[TrendingProject]) -> None:
-    """将项目数据缓存到 Redis
-    
-    Args:
-        redis_client: Redis 客户端
-        projects: 项目列表
-    """
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+def _translations_complete(projects: list[TrendingProject]) -> bool:
+    return all(p.description_cn or not p.description for p in projects)
+
+
+# 进程内的超集副本：新鲜时不访问 Redis，Redis 不可用时作为兜底（按最近使用淘汰）
+_local_cache: OrderedDict[TrendingSpec, CachedTrending] = OrderedDict()
+
+
+def _keep_local(spec: TrendingSpec, cached: CachedTrending) -> None:
+    _local_cache[spec] = cached
+    _local_cache.move_to_end(spec)
+    while len(_local_cache) > LOCAL_CACHE_MAX_SPECS:
+        _local_cache.popitem(last=False)
+
+
+async def _read_cache(spec: TrendingSpec) -> Optional[CachedTrending]:
+    """从 Redis 读取超集（同时更新进程内副本），不存在时返回进程内副本或 None。"""
+    cached_data = await get_cache_manager().get(spec.cache_key)
+    if not cached_data:
+        return _local_cache.get(spec)
     try:
-        projects_data = [p.model_dump() for p in projects]
-        redis_client.setex(
-            CACHE_KEY,
-            CACHE_TTL,
-            json.dumps(projects_data, ensure_ascii=False)
+        data = json.loads(cached_data)
+        cached = CachedTrending(
+            data["fetched_at"],
+            [TrendingProject(**p) for p in data["projects"]],
+            data.get("complete", True),
+            data.get("etag"),
+            data.get("query"),
         )
-        logger.info(f"已缓存 {len(projects)} 个热门项目到 Redis")
     except Exception as e:
-        logger.warning(f"写入 Redis 缓存失败: {e}")
+        logger.warning(f"解析热门项目缓存失败: {e}")
+        return _local_cache.get(spec)
+    _keep_local(spec, cached)
+    return cached
+
+
+async def _cached_superset(spec: TrendingSpec) -> Optional[CachedTrending]:
+    """进程内副本仍新鲜时直接使用，否则读取 Redis（可能已被其他 worker 刷新）。"""
+    local = _local_cache.get(spec)
+    if local is not None and local.age < local.fresh_for:
+        _local_cache.move_to_end(spec)
+        return local
+    return await _read_cache(spec)
+
+
+async def _write_cache(
+    spec: TrendingSpec,
+    projects: list[TrendingProject],
+    etag: Optional[str] = None,
+    query: Optional[str] = None,
+) -> None:
+    """写入缓存并记录抓取时间。"""
+    cached = CachedTrending(time.time(), projects, _translations_complete(projects), etag, query)
+    _keep_local(spec, cached)
+    payload = {
+        "fetched_at": cached.fetched_at,
+        "complete": cached.complete,
+        "etag": etag,
+        "query": query,
+        "projects": [p.model_dump() for p in projects],
+    }
+    await get_cache_manager().set(spec.cache_key, json.dumps(payload, ensure_ascii=False), ttl=CACHE_STALE_TTL)
+    logger.info(f"已缓存 {len(projects)} 个热门项目到 Redis（{spec.language}/{spec.window}）")
+
+
+async def _acquire_refresh_lock(spec: TrendingSpec) -> Optional[str]:
+    """获取刷新锁，成功返回锁令牌；Redis 不可用时视为获取成功。"""
+    token = secrets.token_hex(8)
+    acquired = await redis_pool.execute(
+        lambda r: r.set(spec.lock_key, token, nx=True, ex=REFRESH_LOCK_TTL),
+        default=True,
+    )
+    return token if acquired else None
+
+
+async def _release_refresh_lock(spec: TrendingSpec, token: str) -> None:
+    await redis_pool.execute(lambda r: r.eval(RELEASE_LOCK_SCRIPT, 1, spec.lock_key, token))
+
+
+def _apply_translations(projects: list[TrendingProject], batch: list[tuple[int, str]], content: str) -> None:
+    """解析 "序号. 翻译" 格式的模型输出并写回项目。"""
+    for line in content.strip().split("\n"):
+        line = line.strip()
+        if not line or ". " not in line:
+            continue
+        try:
+            num_str, translation = line.split(". ", 1)
+            num = int(num_str.strip()) - 1
+            if 0 <= num < len(batch):
+                projects[batch[num][0]].description_cn = translation.strip()
+        except (ValueError, IndexError):
+            continue
+
+
+async def _translate_batch(
+    projects: list[TrendingProject],
+    batch: list[tuple[int, str]],
+    models: list[ModelConfig],
+    deadline: float,
+) -> bool:
+    """依次尝试 models 翻译一个批次，不超过整体截止时间。"""
+    # 构建翻译提示
+    texts = "\n".join([f"{i+1}. {desc[:200]}" for i, (_, desc) in enumerate(batch)])  # 限制每个描述长度
+    prompt = f"""将以下GitHub项目描述翻译成中文，每行一个，格式"序号. 翻译"：
+
+{texts}"""
+    loop = asyncio.get_running_loop()
+    for model in models:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return False
+        target_url = _chat_target_url(model.base_url)
+        request_body = {
+            "model": model.model_name,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 1000,
+            "temperature": 0.3,
+        }
+        started = time.perf_counter()
+        try:
+            response = await http_pool.client(target_url).post(
+                target_url,
+                headers={"Authorization": f"Bearer {model.api_key}"},
+                json=request_body,
+                timeout=min(60.0, remaining),
+            )
+        except httpx.TimeoutException:
+            model_router.record_failure(model, 504)
+            logger.warning(f"模型 {model.name} 翻译超时，尝试下一个模型")
+            continue
+        except httpx.HTTPError as e:
+            model_router.record_failure(model, 502)
+            logger.warning(f"模型 {model.name} 翻译请求出错: {e}，尝试下一个模型")
+            continue
+
+        if response.status_code != 200:
+            model_router.record_failure(model, response.status_code, response.headers)
+            logger.warning(f"模型 {model.name} 返回 {response.status_code}，响应: {response.text[:200]}")
+            continue
+        try:
+            data = response.json()
+        except ValueError:
+            model_router.record_failure(model, 502)
+            logger.warning(f"模型 {model.name} 返回非 JSON 响应: {response.text[:200]}")
+            continue
+        model_router.record_success(model, time.perf_counter() - started, response.headers)
+        content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
+        _apply_translations(projects, batch, content or "")
+        return True
+    return False
 
 
 async def _translate_descriptions(projects: list[TrendingProject]) -> list[TrendingProject]:
     """使用配置的大模型翻译项目描述
     
+    已翻译过的描述直接从 Redis 翻译缓存读取，其余描述分批交给模型：
+    各批次在信号量限制下并发执行，按批次轮流分配到健康的模型上，
+    失败时依次换用其他模型。超过整体截止时间仍未完成的批次被放弃，
+    这些描述保持未翻译，由下一次刷新补齐。
+    
     Args:
         projects: 项目列表
         
     Returns:
         带有中文描述的项目列表
     """
-    # 获取所有可用模型
-    with Session(engine) as session:
-        all_models = list(session.exec(select(ModelConfig)).all())
-        if not all_models:
-            logger.warning("未配置大模型，跳过翻译")
-            return projects
-    
     # 收集需要翻译的描述
     descriptions_to_translate = []
     for i, p in enumerate(projects):
@@ -196,133 +529,136 @@ async def _translate_descriptions(projects: list[TrendingProject]) -> list[Trend
     if not descriptions_to_translate:
         return projects
     
+    # 先查翻译缓存，只把未命中的描述交给模型
+    total = len(descriptions_to_translate)
+    cached = await _load_cached_translations([desc for _, desc in descriptions_to_translate])
+    for i, desc in descriptions_to_translate:
+        projects[i].description_cn = cached.get(_description_hash(desc))
+    descriptions_to_translate = [(i, desc) for i, desc in descriptions_to_translate if not projects[i].description_cn]
+    hits = total - len(descriptions_to_translate)
+    calls_saved = math.ceil(total / TRANSLATE_BATCH_SIZE) - math.ceil(len(descriptions_to_translate) / TRANSLATE_BATCH_SIZE)
+    metrics.incr("github.translate.cache_hit", hits)
+    metrics.incr("github.translate.cache_miss", len(descriptions_to_translate))
+    logger.info(f"翻译缓存命中 {hits}/{total}（{hits / total:.0%}），节省 {calls_saved} 次模型调用")
+    if not descriptions_to_translate:
+        return projects
+    
+    # 获取所有可用模型
+    await model_registry.refresh_if_stale()
+    all_models = model_registry.models()
+    if not all_models:
+        logger.warning("未配置大模型，跳过翻译")
+        return projects
+    
     # 批量翻译（每次5个，避免请求过大）
-    batch_size = 5
-    for batch_start in range(0, len(descriptions_to_translate), batch_size):
-        batch = descriptions_to_translate[batch_start:batch_start + batch_size]
-        
-        # 构建翻译提示
-        texts = "\n".join([f"{i+1}. {desc[:200]}" for i, (_, desc) in enumerate(batch)])  # 限制每个描述长度
-        prompt = f"""将以下GitHub项目描述翻译成中文，每行一个，格式"序号. 翻译"：
+    batches = [
+        descriptions_to_translate[start:start + TRANSLATE_BATCH_SIZE]
+        for start in range(0, len(descriptions_to_translate), TRANSLATE_BATCH_SIZE)
+    ]
+    healthy_models = [m for m in all_models if model_router.is_healthy(m)] or all_models
+    semaphore = asyncio.Semaphore(settings.github_translate_concurrency)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.github_translate_deadline
 
-{texts}"""
-        
-        # 尝试所有模型
-        success = False
-        for model in all_models:
-            if success:
-                break
-                
-            # 重试机制
-            for retry in range(2):
-                try:
-                    # 如果 base_url 已包含 /chat/completions 则直接使用，否则拼接
-                    if 'chat/completions' in model.base_url:
-                        target_url = model.base_url
-                    else:
-                        target_url = f"{model.base_url.rstrip('/')}/chat/completions"
-                    request_body = {
-                        "model": model.model_name,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ],
-                        "max_tokens": 1000,
-                        "temperature": 0.3,
-                    }
-                    
-                    async with httpx.AsyncClient(timeout=60.0) as client:
-                        response = await client.post(
-                            target_url,
-                            headers={"Authorization": f"Bearer {model.api_key}"},
-                            json=request_body,
-                        )
-                        
-                        if response.status_code == 200:
-                            try:
-                                data = response.json()
-                            except Exception as json_err:
-                                logger.warning(f"模型 {model.name} 返回非 JSON 响应: {response.text[:200]}")
-                                break  # 尝试下一个模型
-                            content = data.get("choices", [{}])[0].get("message", {}).get("content", "")
-                            
-                            # 解析翻译结果
-                            lines = content.strip().split("\n")
-                            for line in lines:
-                                line = line.strip()
-                                if not line:
-                                    continue
-                                # 尝试解析 "1. 翻译内容" 格式
-                                if ". " in line:
-                                    try:
-                                        num_str, translation = line.split(". ", 1)
-                                        num = int(num_str.strip()) - 1
-                                        if 0 <= num < len(batch):
-                                            original_idx = batch[num][0]
-                                            projects[original_idx].description_cn = translation.strip()
-                                    except (ValueError, IndexError):
-                                        continue
-                            success = True
-                            break  # 成功则跳出重试循环
-                        elif response.status_code in (429, 502, 503, 404):
-                            logger.warning(f"模型 {model.name} 返回 {response.status_code}，响应: {response.text[:200]}")
-                            break  # 跳出重试，尝试下一个模型
-                        else:
-                            logger.warning(f"翻译请求失败: {response.status_code}, 重试 {retry + 1}/2")
-                            
-                except Exception as e:
-                    logger.warning(f"翻译过程出错: {e}, 重试 {retry + 1}/2")
-                    continue
-        
-        if not success:
-            logger.warning("所有模型翻译失败，跳过此批次")
-    
+    async def run(index: int, batch: list[tuple[int, str]]) -> bool:
+        async with semaphore:
+            # 轮换起始模型，把批次分散到不同模型；只有一个模型时允许重试一次
+            shift = index % len(healthy_models)
+            models = healthy_models[shift:] + healthy_models[:shift]
+            if len(models) == 1:
+                models = models * 2
+            return await _translate_batch(projects, batch, models, deadline)
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(run(i, batch)) for i, batch in enumerate(batches)]
+    done, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - loop.time()))
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    failed = sum(1 for task in done if task.exception() is not None or not task.result())
+    missing = sum(1 for i, _ in descriptions_to_translate if not projects[i].description_cn)
+    await _store_translations({
+        _description_hash(desc): projects[i].description_cn
+        for i, desc in descriptions_to_translate
+        if projects[i].description_cn
+    })
+    metrics.observe("github.translate.seconds", time.perf_counter() - started)
+    if pending or failed:
+        logger.warning(
+            f"翻译未全部完成: {len(pending)} 个批次超过截止时间，{failed} 个批次失败，"
+            f"{missing} 条描述将在下次刷新时补齐"
+        )
+    else:
+        logger.info(f"翻译完成: {len(batches)} 个批次，耗时 {time.perf_counter() - started:.1f} 秒")
     return projects
 
 
-async def get_trending_python_projects(limit: int = 30) -> tuple[list[TrendingProject], bool]:
-    """获取热门 Python 项目
+def _description_hash(description: str) -> str:
+    return hashlib.sha1(description.encode("utf-8")).hexdigest()
+
+
+async def _load_cached_translations(descriptions: list[str]) -> dict[str, str]:
+    """批量读取翻译缓存，返回 描述哈希 → 翻译。"""
+    hashes = list({_description_hash(d) for d in descriptions})
+    keys = [TRANSLATION_CACHE_PREFIX + h for h in hashes]
+    values = await redis_pool.execute(lambda r: r.mget(keys), default=[])
+    return {h: value for h, value in zip(hashes, values) if value}
+
+
+async def _store_translations(translations: dict[str, str]) -> None:
+    if not translations:
+        return
+
+    async def store(client) -> None:
+        # 每条翻译单独一个键、各自过期，不再进榜的描述到期后自然淘汰
+        pipe = client.pipeline(transaction=False)
+        for description_hash, translation in translations.items():
+            pipe.set(TRANSLATION_CACHE_PREFIX + description_hash, translation, ex=TRANSLATION_CACHE_TTL)
+        await pipe.execute()
+
+    await redis_pool.execute(store)
+
+
+async def _fetch_and_translate(
+    spec: TrendingSpec,
+    previous: Optional[CachedTrending] = None,
+) -> tuple[list[TrendingProject], SearchResult, str]:
+    """从 GitHub API 获取一个超集并翻译描述
     
-    优先从 Redis 缓存获取，缓存未命中则从 GitHub API 获取
+    有上次的缓存时发起条件请求；GitHub 返回 304 则沿用缓存中的项目，
+    只补齐尚未翻译的描述。
     
-    Args:
-        limit: 返回项目数量，默认30
-        
     Returns:
-        元组 (项目列表, 是否来自缓存)
-        
+        元组 (项目列表, 搜索结果, 查询字符串)
+    
     Raises:
+        GitHubRateLimitError: 额度已用尽
         Exception: 获取数据失败时抛出异常
     """
-    redis_client = _get_redis_client()
-    
-    # 尝试从缓存获取
-    if redis_client:
-        cached_projects = _get_cached_projects(redis_client)
-        if cached_projects:
-            logger.info(f"从 Redis 缓存返回 {len(cached_projects)} 个热门项目")
-            return cached_projects, True
-    
-    # 缓存未命中，从 GitHub API 获取
-    logger.info("缓存未命中，正在从 GitHub API 获取热门项目...")
-    
     try:
-        query = _build_search_query()
-        repos = await _fetch_from_github(query, limit)
+        query = _build_search_query(spec)
+        etag = previous.etag if previous and previous.query == query else None
+        result = await _fetch_from_github(query, FETCH_LIMIT, etag)
         
-        # 转换为 TrendingProject 对象
-        projects = [_transform_to_trending_project(repo) for repo in repos]
+        if result.items is None:
+            logger.info("GitHub 数据未变化（304），沿用缓存中的项目")
+            projects = previous.projects
+        else:
+            # 转换为 TrendingProject 对象
+            projects = [_transform_to_trending_project(repo) for repo in result.items]
         
         # 使用大模型翻译描述
         logger.info("正在翻译项目描述...")
         projects = await _translate_descriptions(projects)
         
-        # 缓存结果
-        if redis_client and projects:
-            _cache_projects(redis_client, projects)
-        
-        logger.info(f"从 GitHub API 获取了 {len(projects)} 个热门项目")
-        return projects, False
+        logger.info(f"从 GitHub API 获取了 {len(projects)} 个热门项目（{spec.language}/{spec.window}）")
+        return projects, result, query
         
+    except GitHubRateLimitError as e:
+        logger.error(str(e))
+        raise
     except httpx.TimeoutException:
         logger.error("GitHub API 请求超时")
         raise Exception("GitHub API 请求超时")
@@ -335,3 +671,205 @@ async def get_trending_python_projects(limit: int = 30) -> tuple[list[TrendingPr
     except Exception as e:
         logger.error(f"获取热门项目失败: {e}")
         raise Exception(f"获取 GitHub 数据失败: {str(e)}")
+
+
+async def _store_superset(
+    spec: TrendingSpec,
+    projects: list[TrendingProject],
+    result: SearchResult,
+    query: str,
+) -> None:
+    """写入超集缓存，并把本次的星标与分叉数记入今天的快照。"""
+    if not projects:
+        return
+    await _write_cache(spec, projects, result.etag, query)
+    snapshots = [(p.id, p.stars, p.forks) for p in projects if p.id is not None]
+    try:
+        # 首次访问会从磁盘加载快照文件，与追加写入一样放到线程池中
+        store = await run_in_threadpool(get_snapshot_store)
+        if store is not None:
+            await run_in_threadpool(store.record, snapshots)
+    except Exception as e:
+        logger.warning(f"记录星标快照失败: {e}")
+
+
+async def refresh_trending_cache(spec: TrendingSpec = DEFAULT_SPEC) -> Optional[list[TrendingProject]]:
+    """持有刷新锁时重新获取并写入缓存；其他 worker 正在刷新时返回 None。"""
+    token = await _acquire_refresh_lock(spec)
+    if token is None:
+        logger.info(f"其他 worker 正在刷新热门项目（{spec.language}/{spec.window}）")
+        return None
+    try:
+        started = time.perf_counter()
+        projects, result, query = await _fetch_and_translate(spec, await _read_cache(spec))
+        await _store_superset(spec, projects, result, query)
+        metrics.incr("github.trending.refresh")
+        metrics.observe("github.trending.refresh_seconds", time.perf_counter() - started)
+        return projects
+    finally:
+        await _release_refresh_lock(spec, token)
+
+
+_refresh_tasks: dict[TrendingSpec, asyncio.Task] = {}
+_cold_flight: SingleFlight[list[TrendingProject]] = SingleFlight("github.trending")
+# 各超集最近一次被请求的时间，决定定时任务预热哪些超集
+_last_requested: dict[TrendingSpec, float] = {}
+
+
+async def _background_refresh(spec: TrendingSpec) -> None:
+    try:
+        await refresh_trending_cache(spec)
+    except Exception as e:
+        logger.warning(f"后台刷新热门项目失败，继续使用旧数据: {e}")
+
+
+def _refresh_in_background(spec: TrendingSpec) -> None:
+    """启动后台刷新（本进程内每个超集同一时刻只有一个）。"""
+    task = _refresh_tasks.get(spec)
+    if task is None or task.done():
+        _refresh_tasks[spec] = asyncio.create_task(_background_refresh(spec))
+
+
+async def _load_cold(spec: TrendingSpec) -> list[TrendingProject]:
+    """缓存完全不存在时同步获取；其他 worker 正在刷新则等待其结果。"""
+    projects = await refresh_trending_cache(spec)
+    if projects is not None:
+        return projects
+    for _ in range(COLD_WAIT_SECONDS):
+        await asyncio.sleep(1)
+        cached = await _read_cache(spec)
+        if cached:
+            return cached.projects
+    projects, result, query = await _fetch_and_translate(spec)
+    await _store_superset(spec, projects, result, query)
+    return projects
+
+
+async def _with_velocity(projects: list[TrendingProject]) -> list[TrendingProject]:
+    """从本地快照填入星标增量（返回副本，不修改缓存中的对象）。
+    
+    首次加载快照文件与读取其他 worker 新追加的记录都是文件 I/O，在线程池中执行。
+    """
+    store = await run_in_threadpool(get_snapshot_store)
+    if store is None:
+        return projects
+    await run_in_threadpool(store.sync)
+    result = []
+    for p in projects:
+        if p.id is None:
+            result.append(p)
+            continue
+        velocity = dict(zip(TRENDING_SORTS[1:], store.velocity(p.id)))
+        result.append(p.model_copy(update=velocity))
+    return result
+
+
+async def _select(projects: list[TrendingProject], limit: int, min_stars: int, sort: str) -> list[TrendingProject]:
+    """过滤最低星标，按排序方式排列后截取前 limit 个。
+    
+    超集本身按星标降序排列；按增速排序时没有快照历史的项目排在最后。
+    """
+    projects = [p for p in await _with_velocity(projects) if p.stars >= min_stars]
+    if sort != "stars":
+        projects.sort(key=lambda p: (getattr(p, sort) is None, -(getattr(p, sort) or 0), -p.stars))
+    return projects[:limit]
+
+
+async def get_trending_projects(
+    limit: int = 30,
+    language: str = DEFAULT_LANGUAGE,
+    window: str = DEFAULT_WINDOW,
+    min_stars: int = 0,
+    sort: str = "stars",
+) -> tuple[list[TrendingProject], bool]:
+    """获取热门项目
+    
+    从 (语言, 时间窗口) 对应的超集中过滤、排序、截取，limit、min_stars 与 sort
+    的任意组合都不会产生额外的 GitHub 调用。超集新鲜时直接返回；超过新鲜期后仍立即
+    返回旧数据，同时在后台刷新；只有超集完全不存在时才等待 GitHub API 与翻译完成。
+    
+    Args:
+        limit: 返回项目数量，默认30，最多 FETCH_LIMIT
+        language: 编程语言，默认 python
+        window: 时间窗口 day / week / month，默认当月
+        min_stars: 最低星标数
+        sort: 排序方式 stars / stars_1d / stars_7d / stars_30d
+        
+    Returns:
+        元组 (项目列表, 是否来自缓存)
+        
+    Raises:
+        ValueError: 语言、时间窗口或排序方式不合法
+        Exception: 获取数据失败时抛出异常
+    """
+    if sort not in TRENDING_SORTS:
+        raise ValueError(f"不支持的排序方式: {sort}")
+    spec = TrendingSpec.of(language, window)
+    _last_requested[spec] = time.time()
+    cached = await _cached_superset(spec)
+    if cached:
+        if cached.age >= cached.fresh_for:
+            metrics.incr("github.trending.stale")
+            logger.info("热门项目缓存已过新鲜期（或翻译未完成），返回旧数据并在后台刷新")
+            _refresh_in_background(spec)
+        else:
+            metrics.incr("github.trending.hit")
+        return await _select(cached.projects, limit, min_stars, sort), True
+    
+    # 缓存不存在，从 GitHub API 获取
+    logger.info(f"缓存未命中，正在从 GitHub API 获取热门项目（{spec.language}/{spec.window}）...")
+    metrics.incr("github.trending.miss")
+    projects = await _cold_flight.do(spec.cache_key, lambda: _load_cold(spec))
+    return await _select(projects, limit, min_stars, sort), False
+
+
+async def _prewarm(spec: TrendingSpec) -> bool:
+    """超集接近新鲜期末尾或不存在时提前刷新；额度用尽时返回 False。"""
+    cached = await _read_cache(spec)
+    if cached and cached.age < cached.fresh_for - PREWARM_MARGIN:
+        return True
+    reset_at = await _rate_limited_until()
+    if reset_at is not None:
+        # 额度重置后会再次触发预热
+        logger.info(f"GitHub API 额度已用尽，{reset_at - time.time():.0f} 秒后再预热")
+        _schedule_refresh_at(reset_at)
+        return False
+    logger.info(f"热门项目缓存即将过期，开始预热（{spec.language}/{spec.window}）")
+    try:
+        await refresh_trending_cache(spec)
+    except GitHubRateLimitError:
+        return False
+    except Exception as e:
+        logger.warning(f"预热热门项目缓存失败: {e}")
+    return True
+
+
+async def prewarm_trending_cache() -> None:
+    """定时任务：预热默认超集与最近被请求过的几个超集，逐个执行以节省额度。"""
+    cutoff = time.time() - PREWARM_TRACK_SECONDS
+    for spec, requested_at in list(_last_requested.items()):
+        if requested_at < cutoff:
+            _last_requested.pop(spec, None)
+    recent = sorted(
+        (spec for spec in _last_requested if spec != DEFAULT_SPEC),
+        key=lambda spec: _last_requested[spec],
+        reverse=True,
+    )
+    specs = [DEFAULT_SPEC] + recent[:PREWARM_MAX_SPECS]
+    for spec in specs:
+        if not await _prewarm(spec):
+            break
+
+
+def schedule_trending_prewarm() -> None:
+    """注册缓存预热任务，启动后立即检查一次。"""
+    if settings.github_prewarm_interval_minutes <= 0:
+        return
+    scheduler.add_job(
+        prewarm_trending_cache,
+        "interval",
+        minutes=settings.github_prewarm_interval_minutes,
+        id="github-trending-prewarm",
+        replace_existing=True,
+        next_run_time=datetime.now(),
+    )
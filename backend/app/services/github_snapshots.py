@@ -0,0 +1,198 @@
+"""GitHub 仓库星标/分叉数的每日快照，用于计算星标增速。
+
+快照以定长结构化记录（仓库ID、日期、星标、分叉，共 20 字节）追加写入一个二进制文件，
+从不修改已写入的数据；同一仓库同一天的多条记录以最后一条为准。
+内存中每个仓库保存按日期排序的 NumPy 数组，并缓存 1 / 7 / 30 天的星标增量：
+追加快照时只重算涉及的仓库。多个 worker 共用同一个文件，
+sync() 只读取文件中新追加的部分，请求时开销仅为一次 stat。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，缺失时不计算增速
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# 计算星标增速的时间跨度（天）
+VELOCITY_WINDOWS = (1, 7, 30)
+# 基准快照最多比 N 天前再早几天：仓库不是每天都进榜，快照有空档，
+# 但基准过旧时增量反映的是更长时间的增长，不再计算
+VELOCITY_TOLERANCE = {1: 1, 7: 2, 30: 7}
+
+RECORD_DTYPE = (
+    np.dtype([("repo_id", "<i8"), ("day", "<i4"), ("stars", "<i4"), ("forks", "<i4")])
+    if np is not None else None
+)
+
+
+def _today() -> int:
+    """UTC 日期序号（自 1970-01-01 起的天数）。"""
+    return int(time.time() // 86400)
+
+
+class _RepoSeries:
+    """单个仓库按日期排序的快照序列。"""
+
+    __slots__ = ("days", "stars", "forks")
+
+    def __init__(self, days, stars, forks) -> None:
+        self.days = days
+        self.stars = stars
+        self.forks = forks
+
+    def append(self, day: int, stars: int, forks: int) -> None:
+        if len(self.days) and self.days[-1] == day:
+            self.stars[-1] = stars
+            self.forks[-1] = forks
+            return
+        if len(self.days) and self.days[-1] > day:
+            # 时钟回拨等异常情况：按日期插入
+            index = int(np.searchsorted(self.days, day))
+            if index < len(self.days) and self.days[index] == day:
+                self.stars[index] = stars
+                self.forks[index] = forks
+                return
+            self.days = np.insert(self.days, index, day)
+            self.stars = np.insert(self.stars, index, stars)
+            self.forks = np.insert(self.forks, index, forks)
+            return
+        self.days = np.append(self.days, np.int32(day))
+        self.stars = np.append(self.stars, np.int32(stars))
+        self.forks = np.append(self.forks, np.int32(forks))
+
+    def velocity(self) -> tuple[Optional[int], ...]:
+        """最新快照相对 N 天前快照的星标增量。
+
+        没有恰好 N 天前的快照时取更早最近的一次，并按实际间隔折算为 N 天的增量；
+        历史不足或基准早于 VELOCITY_TOLERANCE 允许的范围时为 None。
+        """
+        latest_day = int(self.days[-1])
+        result = []
+        for window in VELOCITY_WINDOWS:
+            index = int(np.searchsorted(self.days, latest_day - window, side="right")) - 1
+            if index < 0 or latest_day - window - int(self.days[index]) > VELOCITY_TOLERANCE[window]:
+                result.append(None)
+                continue
+            gain = int(self.stars[-1] - self.stars[index])
+            result.append(round(gain * window / (latest_day - int(self.days[index]))))
+        return tuple(result)
+
+
+class SnapshotStore:
+    """追加写入的快照文件 + 按仓库划分的内存数组。"""
+
+    def __init__(self, path: str) -> None:
+        if np is None:
+            raise ImportError("星标快照需要 numpy，请运行: pip install numpy")
+        self.path = path
+        self._lock = threading.Lock()
+        self._series: dict[int, _RepoSeries] = {}
+        self._velocity: dict[int, tuple[Optional[int], ...]] = {}
+        self._offset = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        started = time.perf_counter()
+        self.sync()
+        logger.info(
+            f"星标快照已加载: {len(self._series)} 个仓库，{self._offset // RECORD_DTYPE.itemsize} 条记录，"
+            f"耗时 {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+
+    def sync(self) -> None:
+        """读取其他 worker 新追加的记录。"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        # 只读取完整的记录，写到一半的记录留到下次
+        size -= size % RECORD_DTYPE.itemsize
+        if size <= self._offset:
+            return
+        with self._lock:
+            if size <= self._offset:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                records = np.frombuffer(f.read(size - self._offset), dtype=RECORD_DTYPE)
+            self._offset = size
+            self._apply(records)
+
+    def _apply(self, records) -> None:
+        """把一批记录并入内存数组，只重算涉及仓库的增速。"""
+        if not len(records):
+            return
+        # lexsort 稳定，同一仓库同一天的记录保持写入顺序，后写的覆盖先写的
+        order = np.lexsort((records["day"], records["repo_id"]))
+        records = records[order]
+        repo_ids, starts = np.unique(records["repo_id"], return_index=True)
+        bounds = list(starts[1:]) + [len(records)]
+        for repo_id, start, end in zip(repo_ids.tolist(), starts.tolist(), bounds):
+            chunk = records[start:end]
+            series = self._series.get(repo_id)
+            if series is None:
+                # 同一天保留最后一条
+                last = np.append(chunk["day"][1:] != chunk["day"][:-1], True)
+                chunk = chunk[last]
+                series = _RepoSeries(
+                    chunk["day"].astype(np.int32), chunk["stars"].astype(np.int32), chunk["forks"].astype(np.int32)
+                )
+                self._series[repo_id] = series
+            else:
+                for record in chunk:
+                    series.append(int(record["day"]), int(record["stars"]), int(record["forks"]))
+            self._velocity[repo_id] = series.velocity()
+
+    def record(self, snapshots: Iterable[tuple[int, int, int]], day: Optional[int] = None) -> int:
+        """追加 (仓库ID, 星标, 分叉) 快照，默认记为今天，返回写入的记录数。"""
+        day = _today() if day is None else day
+        rows = [(repo_id, day, stars, forks) for repo_id, stars, forks in snapshots]
+        if not rows:
+            return 0
+        records = np.array(rows, dtype=RECORD_DTYPE)
+        # 单次 write 追加整批定长记录，多进程同时追加也不会交错；
+        # 随后的 sync() 连同其他 worker 的新记录一起读入
+        with open(self.path, "ab") as f:
+            f.write(records.tobytes())
+        self.sync()
+        metrics.incr("github.snapshots.recorded", len(rows))
+        return len(rows)
+
+    def velocity(self, repo_id: int) -> tuple[Optional[int], ...]:
+        """(1 天, 7 天, 30 天) 星标增量，无数据时全为 None。"""
+        return self._velocity.get(repo_id, (None,) * len(VELOCITY_WINDOWS))
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "repos": len(self._series),
+            "records": self._offset // RECORD_DTYPE.itemsize,
+            "bytes": self._offset,
+        }
+
+
+_snapshot_store: Optional[SnapshotStore] = None
+_snapshot_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> Optional[SnapshotStore]:
+    """已启用的快照存储；GITHUB_SNAPSHOT_PATH 为空或缺少 numpy 时返回 None。
+
+    首次调用会读取整个快照文件，异步代码中应通过线程池调用。
+    """
+    global _snapshot_store
+    if _snapshot_store is None and settings.github_snapshot_path and np is not None:
+        with _snapshot_store_lock:
+            if _snapshot_store is None:
+                _snapshot_store = SnapshotStore(settings.github_snapshot_path)
+    return _snapshot_store
@@ -0,0 +1,257 @@
+"""记忆近似重复压缩。
+
+关键词规则会把用户的原话直接存为记忆，话多的用户会积累大量几乎相同的记忆，
+拖慢检索并稀释结果。这里按用户做 MinHash + LSH 找出候选近似重复对，
+再用字符 3-gram 的 Jaccard 相似度确认，同组只保留信息最多（最长）的一条。
+
+命令行执行（在 backend 目录下）:
+    python -m app.services.memory_compaction                 # 全部用户
+    python -m app.services.memory_compaction --user-id 1 --dry-run
+也会按 MEMORY_COMPACTION_INTERVAL_HOURS 作为定时任务运行。
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import random
+import re
+import secrets
+import time
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import RELEASE_LOCK_SCRIPT, redis_pool
+from app.core.scheduler import scheduler
+from app.db.session import engine
+from app.models.user import User
+from app.services import memory_service
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_SHINGLE_SIZE = 3
+_IGNORED_CHARS = re.compile(r"[\s\W_]+", re.UNICODE)
+# 多 worker 时保证同一时刻只有一个进程执行压缩
+LOCK_KEY = "memory:compaction:lock"
+# 锁的过期时间（秒）：压缩完成后立即释放，只有持锁进程异常退出时才需要等待过期
+LOCK_TTL = 3600
+
+
+def shingles(text: str) -> set[str]:
+    """去掉空白与标点后的字符 3-gram 集合。"""
+    text = _IGNORED_CHARS.sub("", text.lower())
+    if len(text) <= _SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + _SHINGLE_SIZE] for i in range(len(text) - _SHINGLE_SIZE + 1)}
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHashLSH:
+    """MinHash 签名 + 分段 LSH，找出 Jaccard 相似度可能较高的候选对。"""
+
+    def __init__(self, num_perm: int = 64, rows: int = 4, seed: int = 1) -> None:
+        rng = random.Random(seed)
+        self.rows = rows
+        self.bands = num_perm // rows
+        self._perms = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(self.bands * rows)
+        ]
+
+    def signature(self, items: set[str]) -> list[int]:
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in items]
+        if not hashes:
+            return [0] * len(self._perms)
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms]
+
+    def candidate_pairs(self, signatures: list[list[int]]) -> set[tuple[int, int]]:
+        pairs: set[tuple[int, int]] = set()
+        for band in range(self.bands):
+            buckets: dict[tuple[int, ...], list[int]] = {}
+            start = band * self.rows
+            for index, signature in enumerate(signatures):
+                buckets.setdefault(tuple(signature[start:start + self.rows]), []).append(index)
+            for members in buckets.values():
+                for i in range(len(members)):
+                    for j in range(i + 1, len(members)):
+                        pairs.add((members[i], members[j]))
+        return pairs
+
+
+def find_duplicate_groups(texts: list[str], threshold: float) -> list[list[int]]:
+    """返回近似重复的下标分组（只包含两条以上的组）。"""
+    shingle_sets = [shingles(text) for text in texts]
+    lsh = MinHashLSH()
+    signatures = [lsh.signature(s) for s in shingle_sets]
+
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in lsh.candidate_pairs(signatures):
+        if jaccard(shingle_sets[i], shingle_sets[j]) >= threshold:
+            parent[find(i)] = find(j)
+
+    groups: dict[int, list[int]] = {}
+    for i in range(len(texts)):
+        groups.setdefault(find(i), []).append(i)
+    return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def _measure_search(user_id: str, queries: list[str]) -> Optional[float]:
+    """绕过检索缓存，返回平均检索耗时（毫秒）。"""
+    if not queries:
+        return None
+    started = time.perf_counter()
+    for query in queries:
+        memory_service.search_memories(query, user_id, use_cache=False)
+    return (time.perf_counter() - started) / len(queries) * 1000
+
+
+def compact_user(
+    user_id: str,
+    threshold: float = None,
+    dry_run: bool = False,
+    measure_queries: int = None,
+) -> dict:
+    """压缩单个用户的近似重复记忆，返回统计报告。"""
+    threshold = settings.memory_compaction_threshold if threshold is None else threshold
+    measure_queries = settings.memory_compaction_measure_queries if measure_queries is None else measure_queries
+    items = memory_service.get_memory_items(user_id, limit=settings.memory_compaction_max_items)
+    groups = find_duplicate_groups([item["memory"] for item in items], threshold)
+
+    to_delete = []
+    for group in groups:
+        # 保留最长的一条（内容最完整），其余删除
+        keep = max(group, key=lambda i: len(items[i]["memory"]))
+        to_delete.extend(items[i] for i in group if i != keep)
+
+    queries = [items[group[0]]["memory"] for group in groups[:measure_queries]]
+    report = {
+        "user_id": str(user_id),
+        "before": len(items),
+        "duplicate_groups": len(groups),
+        "removed": 0,
+        "after": len(items),
+        "search_ms_before": _measure_search(user_id, queries) if to_delete else None,
+        "search_ms_after": None,
+    }
+    if dry_run or not to_delete:
+        # 试运行时报告预计结果
+        if dry_run:
+            report["removed"] = len(to_delete)
+            report["after"] = len(items) - len(to_delete)
+        return report
+
+    removed = sum(1 for item in to_delete if memory_service.delete_memory(item["id"], user_id))
+    report["removed"] = removed
+    report["after"] = len(items) - removed
+    report["search_ms_after"] = _measure_search(user_id, queries)
+    metrics.incr("memory.compaction.removed", removed)
+    logger.info(
+        f"用户 {user_id} 记忆压缩: {report['before']} → {report['after']} 条"
+        f"（{len(groups)} 组近似重复）"
+    )
+    return report
+
+
+def _all_user_ids() -> list[str]:
+    with Session(engine) as session:
+        return [str(user_id) for user_id in session.exec(select(User.id)).all()]
+
+
+def compact_all_users(threshold: float = None, dry_run: bool = False, measure_queries: int = None) -> list[dict]:
+    """压缩所有用户的记忆。"""
+    if not memory_service.is_memory_enabled():
+        logger.info("记忆服务未启用，跳过记忆压缩")
+        return []
+    started = time.perf_counter()
+    reports = [compact_user(user_id, threshold, dry_run, measure_queries) for user_id in _all_user_ids()]
+    metrics.incr("memory.compaction.runs")
+    removed = sum(r["removed"] for r in reports)
+    logger.info(f"记忆压缩完成: {len(reports)} 个用户，删除 {removed} 条，耗时 {time.perf_counter() - started:.1f} 秒")
+    return reports
+
+
+async def _acquire_lock() -> Optional[str]:
+    """获取跨 worker 锁，成功返回锁令牌；Redis 不可用时视为获取成功（直接执行）。"""
+    token = secrets.token_hex(8)
+    acquired = await redis_pool.execute(
+        lambda r: r.set(LOCK_KEY, token, nx=True, ex=LOCK_TTL),
+        default=True,
+    )
+    return token if acquired else None
+
+
+async def _release_lock(token: str) -> None:
+    await redis_pool.execute(lambda r: r.eval(RELEASE_LOCK_SCRIPT, 1, LOCK_KEY, token))
+
+
+async def run_scheduled_compaction() -> None:
+    token = await _acquire_lock()
+    if token is None:
+        logger.debug("其他 worker 正在执行记忆压缩，跳过")
+        return
+    try:
+        await run_in_threadpool(compact_all_users)
+    finally:
+        await _release_lock(token)
+
+
+def schedule_memory_compaction() -> None:
+    """注册定时压缩任务，MEMORY_COMPACTION_INTERVAL_HOURS=0 时不注册。"""
+    if settings.memory_compaction_interval_hours <= 0:
+        return
+    scheduler.add_job(
+        run_scheduled_compaction,
+        "interval",
+        hours=settings.memory_compaction_interval_hours,
+        id="memory-compaction",
+        replace_existing=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="压缩近似重复的 AI 记忆")
+    parser.add_argument("--user-id", help="只处理指定用户，默认处理全部用户")
+    parser.add_argument("--threshold", type=float, default=None, help="Jaccard 相似度阈值")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不删除")
+    parser.add_argument("--measure-queries", type=int, default=None, help="用于测量检索耗时的查询数")
+    args = parser.parse_args()
+
+    memory_service.init_memory()
+    if not memory_service.is_memory_enabled():
+        print("记忆服务未启用")
+        return
+    if args.user_id:
+        reports = [compact_user(args.user_id, args.threshold, args.dry_run, args.measure_queries)]
+    else:
+        reports = compact_all_users(args.threshold, args.dry_run, args.measure_queries)
+
+    for r in reports:
+        latency = ""
+        if r["search_ms_before"] is not None and r["search_ms_after"] is not None:
+            latency = f"，检索 {r['search_ms_before']:.1f} → {r['search_ms_after']:.1f} ms"
+        print(f"用户 {r['user_id']}: {r['before']} → {r['after']} 条，{r['duplicate_groups']} 组重复，删除 {r['removed']} 条{latency}")
+    before = sum(r["before"] for r in reports)
+    removed = sum(r["removed"] for r in reports)
+    print(f"合计: {before} 条记忆，{'可' if args.dry_run else '已'}删除 {removed} 条")
+
+
+if __name__ == "__main__":
+    main()
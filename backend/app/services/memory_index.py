@@ -0,0 +1,288 @@
+"""进程内 NumPy 向量索引记忆引擎（MEMORY_BACKEND=local）。
+
+每个用户一个目录：
+- vectors.f32：单位化后的 float32 向量矩阵，按行存放，通过 memmap 映射，容量不足时倍增扩展文件；
+- log.jsonl：追加写的操作日志（add / del），启动时重放得到 行号 → 记忆 的映射。
+
+检索为一次矩阵乘法加 argpartition 取 top-k；删除时把最后一行移到被删除的位置，
+重放日志时执行同样的移动，因此矩阵与日志始终对齐。
+
+对外提供与 powermem Memory 相同形状的 add / search / get_all / delete / delete_all，
+由 memory_service 作为可替换的后端使用。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from typing import Any, Optional
+
+import httpx
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅本地引擎需要
+    np = None
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+LOG_FILE = "log.jsonl"
+META_FILE = "meta.json"
+# 初始容量（行）
+MIN_CAPACITY = 1024
+
+
+class OpenAIEmbedder:
+    """调用 OpenAI 兼容的 /embeddings 接口，接口形式与 powermem 的嵌入器一致。"""
+
+    def __init__(self, api_key: str, base_url: str, model: str, timeout: float = 30.0) -> None:
+        self.model = model
+        self._url = base_url.rstrip("/") + "/embeddings"
+        self._client = httpx.Client(
+            timeout=timeout,
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
+
+    def embed(self, text: str, memory_action: Optional[str] = None) -> list[float]:
+        return self.embed_batch([text], memory_action)[0]
+
+    def embed_batch(self, texts: list[str], memory_action: Optional[str] = None) -> list[list[float]]:
+        if not texts:
+            return []
+        response = self._client.post(self._url, json={"model": self.model, "input": texts})
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
+
+
+class UserVectorIndex:
+    """单个用户的向量矩阵与记忆条目。"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.dim: Optional[int] = None
+        self.ids: list[str] = []
+        self.items: list[dict] = []
+        self._rows: dict[str, int] = {}
+        self._matrix = None
+        self._log_lines = 0
+        self._lock = threading.RLock()
+        self._load()
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self) -> None:
+        meta_path = self._file(META_FILE)
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+        self._open_matrix()
+        with open(self._file(LOG_FILE), encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                self._log_lines += 1
+                entry = json.loads(line)
+                if entry["op"] == "add":
+                    self._append_row(entry["id"], entry["item"])
+                elif entry["op"] == "del" and entry["id"] in self._rows:
+                    self._remove_row(entry["id"], move_vector=False)
+        # 删除较多时压缩日志
+        if self._log_lines > 2 * self.count + 100:
+            self._rewrite_log()
+
+    def _open_matrix(self) -> None:
+        size = os.path.getsize(self._file(VECTORS_FILE))
+        capacity = size // (4 * self.dim)
+        self._matrix = np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(MIN_CAPACITY, capacity * 2, rows)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(self._file(VECTORS_FILE), "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._open_matrix()
+
+    def _append_row(self, memory_id: str, item: dict) -> None:
+        self._rows[memory_id] = len(self.ids)
+        self.ids.append(memory_id)
+        self.items.append(item)
+
+    def _remove_row(self, memory_id: str, move_vector: bool = True) -> None:
+        row = self._rows.pop(memory_id)
+        last = len(self.ids) - 1
+        if row != last:
+            if move_vector:
+                self._matrix[row] = self._matrix[last]
+            self.ids[row] = self.ids[last]
+            self.items[row] = self.items[last]
+            self._rows[self.ids[row]] = row
+        self.ids.pop()
+        self.items.pop()
+
+    def _append_log(self, entries: list[dict]) -> None:
+        with open(self._file(LOG_FILE), "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._log_lines += len(entries)
+
+    def _rewrite_log(self) -> None:
+        tmp_path = self._file(LOG_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for memory_id, item in zip(self.ids, self.items):
+                f.write(json.dumps({"op": "add", "id": memory_id, "item": item}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self._file(LOG_FILE))
+        self._log_lines = self.count
+
+    def add(self, vectors: Any, items: list[dict]) -> list[str]:
+        """追加若干条记忆，vectors 为 (n, dim) 的嵌入向量。"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        with self._lock:
+            if self.dim is None:
+                os.makedirs(self.path, exist_ok=True)
+                self.dim = int(vectors.shape[1])
+                with open(self._file(META_FILE), "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"向量维度 {vectors.shape[1]} 与索引维度 {self.dim} 不一致")
+            start = self.count
+            self._ensure_capacity(start + len(vectors))
+            self._matrix[start:start + len(vectors)] = vectors
+            self._matrix.flush()
+            ids = []
+            entries = []
+            for item in items:
+                memory_id = uuid.uuid4().hex
+                self._append_row(memory_id, item)
+                ids.append(memory_id)
+                entries.append({"op": "add", "id": memory_id, "item": item})
+            self._append_log(entries)
+            return ids
+
+    def delete(self, memory_id: str) -> bool:
+        with self._lock:
+            if memory_id not in self._rows:
+                return False
+            self._remove_row(memory_id)
+            self._matrix.flush()
+            self._append_log([{"op": "del", "id": memory_id}])
+            return True
+
+    def search(self, vector: Any, limit: int) -> list[tuple[str, dict, float]]:
+        """余弦相似度 top-k，返回 [(id, 条目, 分数)]，按分数从高到低。"""
+        query = np.asarray(vector, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        with self._lock:
+            n = self.count
+            if n == 0 or limit <= 0:
+                return []
+            scores = self._matrix[:n] @ query
+            k = min(limit, n)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.ids[i], self.items[i], float(scores[i])) for i in top]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrix = None
+            self.ids, self.items, self._rows = [], [], {}
+            self.dim = None
+            self._log_lines = 0
+            shutil.rmtree(self.path, ignore_errors=True)
+
+
+class LocalMemoryIndex:
+    """按用户划分的本地向量记忆引擎，接口与 powermem Memory 保持一致。"""
+
+    def __init__(self, root: str, embedder: Any) -> None:
+        if np is None:
+            raise ImportError("本地记忆引擎需要 numpy，请运行: pip install numpy")
+        self.root = root
+        self.embedding = embedder
+        self._users: dict[str, UserVectorIndex] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _index(self, user_id: str) -> UserVectorIndex:
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None:
+                # 用户ID只用于目录名，过滤掉路径分隔符等字符
+                safe_id = "".join(ch for ch in str(user_id) if ch.isalnum() or ch in "-_") or "_"
+                index = self._users[user_id] = UserVectorIndex(os.path.join(self.root, safe_id))
+            return index
+
+    @staticmethod
+    def _contents(messages: Any) -> list[str]:
+        if isinstance(messages, str):
+            return [messages]
+        contents = []
+        for message in messages:
+            content = message.get("content") if isinstance(message, dict) else str(message)
+            if content and (not isinstance(message, dict) or message.get("role", "user") == "user"):
+                contents.append(content)
+        return contents
+
+    def add(self, messages: Any, user_id: str, metadata: Optional[dict] = None, **_: Any) -> dict:
+        """保存原文（不做 LLM 提取），支持单条字符串或消息列表。"""
+        contents = self._contents(messages)
+        if not contents:
+            return {"results": []}
+        vectors = self.embedding.embed_batch(contents, "add")
+        items = [{"memory": content, "metadata": metadata or {}} for content in contents]
+        ids = self._index(str(user_id)).add(vectors, items)
+        return {"results": [{"id": memory_id, "memory": content, "event": "ADD"} for memory_id, content in zip(ids, contents)]}
+
+    def search(self, query: str, user_id: str, limit: int = 5, **_: Any) -> dict:
+        index = self._index(str(user_id))
+        if index.count == 0:
+            return {"results": []}
+        vector = self.embedding.embed(query, "search")
+        return {
+            "results": [
+                {"id": memory_id, "memory": item["memory"], "metadata": item["metadata"], "score": score}
+                for memory_id, item, score in index.search(vector, limit)
+            ]
+        }
+
+    def get_all(self, user_id: str, limit: int = 100, offset: int = 0, **_: Any) -> dict:
+        index = self._index(str(user_id))
+        with index._lock:
+            # 只复制本页，不复制整个索引
+            pairs = list(zip(index.ids[offset:offset + limit], index.items[offset:offset + limit]))
+        return {"results": [{"id": memory_id, "memory": item["memory"], "metadata": item["metadata"]} for memory_id, item in pairs]}
+
+    def delete(self, memory_id: str, user_id: Optional[str] = None, **_: Any) -> bool:
+        return self._index(str(user_id)).delete(str(memory_id))
+
+    def delete_all(self, user_id: str, **_: Any) -> bool:
+        self._index(str(user_id)).clear()
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            users = list(self._users.values())
+        return {
+            "loaded_users": len(users),
+            "memories": sum(index.count for index in users),
+        }
@@ -0,0 +1,221 @@
+"""本地词法记忆引擎（BM25），不依赖任何网络服务。
+
+- 分词：中日韩文字按单字 + 相邻二字切分，字母数字按整词切分并转小写；
+- 记忆原文持久化在 SQLite，每个用户的倒排索引在首次访问时从库中重建并常驻内存；
+- 接口与 powermem Memory 保持一致（add / search / get_all / delete / delete_all），
+  另提供 upsert 供 memory_service 把向量后端的写入结果同步过来；
+- 作为向量后端的镜像时，已有记忆由 memory_service 按用户回填，
+  回填进度记录在 backfill 表中（ALL_USERS 表示全部完成）。
+
+向量记忆不可用（未配置 POWERMEM_LLM_API_KEY、嵌入服务故障）时由 memory_service 自动降级使用，
+也可以与向量检索结果按 RRF 融合。
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Optional
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_CJK_RANGES = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(f"[{_CJK_RANGES}]+|[a-z0-9]+")
+_CJK_RE = re.compile(f"[{_CJK_RANGES}]")
+# backfill 表中表示“所有用户均已回填”的标记
+ALL_USERS = "*"
+
+
+def tokenize(text: str) -> list[str]:
+    """中日韩文字切成单字与二字词，其他按字母数字整词切分。"""
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class _UserIndex:
+    """单个用户的内存倒排索引。"""
+
+    def __init__(self) -> None:
+        self.docs: dict[str, dict] = {}
+        self.lengths: dict[str, int] = {}
+        self.postings: dict[str, dict[str, int]] = {}
+        self.total_length = 0
+
+    def add(self, memory_id: str, memory: str, metadata: dict) -> None:
+        if memory_id in self.docs:
+            self.remove(memory_id)
+        counts = Counter(tokenize(memory))
+        self.docs[memory_id] = {"memory": memory, "metadata": metadata}
+        self.lengths[memory_id] = sum(counts.values())
+        self.total_length += self.lengths[memory_id]
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[memory_id] = tf
+
+    def remove(self, memory_id: str) -> bool:
+        doc = self.docs.pop(memory_id, None)
+        if doc is None:
+            return False
+        self.total_length -= self.lengths.pop(memory_id)
+        for term in set(tokenize(doc["memory"])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(memory_id, None)
+                if not postings:
+                    del self.postings[term]
+        return True
+
+    def search(self, query: str, limit: int) -> list[tuple[str, float]]:
+        n = len(self.docs)
+        if n == 0 or limit <= 0:
+            return []
+        avg_length = self.total_length / n or 1.0
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for memory_id, tf in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[memory_id] / avg_length)
+                scores[memory_id] = scores.get(memory_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+class LexicalMemoryIndex:
+    """按用户划分的 BM25 记忆引擎。"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self._users: dict[str, _UserIndex] = {}
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS memories (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                memory TEXT NOT NULL,
+                metadata TEXT NOT NULL DEFAULT '{}',
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_user ON memories(user_id, created_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS backfill (user_id TEXT PRIMARY KEY, completed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._backfilled = {row[0] for row in self._conn.execute("SELECT user_id FROM backfill").fetchall()}
+
+    def _index(self, user_id: str) -> _UserIndex:
+        index = self._users.get(user_id)
+        if index is None:
+            index = _UserIndex()
+            rows = self._conn.execute(
+                "SELECT id, memory, metadata FROM memories WHERE user_id = ? ORDER BY created_at", (user_id,)
+            ).fetchall()
+            for memory_id, memory, metadata in rows:
+                index.add(memory_id, memory, json.loads(metadata))
+            self._users[user_id] = index
+        return index
+
+    def upsert(self, memory_id: Any, memory: str, user_id: str, metadata: Optional[dict] = None) -> None:
+        """写入或替换一条记忆（保留原创建时间）。"""
+        memory_id, user_id, metadata = str(memory_id), str(user_id), metadata or {}
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO memories (id, user_id, memory, metadata, created_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET memory = excluded.memory, metadata = excluded.metadata
+                """,
+                (memory_id, user_id, memory, json.dumps(metadata, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+            self._index(user_id).add(memory_id, memory, metadata)
+
+    def add(self, messages: Any, user_id: str, metadata: Optional[dict] = None, **_: Any) -> dict:
+        """保存原文，支持单条字符串或消息列表（只保存用户消息）。"""
+        if isinstance(messages, str):
+            contents = [messages]
+        else:
+            contents = [
+                m.get("content") for m in messages
+                if isinstance(m, dict) and m.get("content") and m.get("role", "user") == "user"
+            ]
+        results = []
+        for content in contents:
+            memory_id = uuid.uuid4().hex
+            self.upsert(memory_id, content, user_id, metadata)
+            results.append({"id": memory_id, "memory": content, "event": "ADD"})
+        return {"results": results}
+
+    def search(self, query: str, user_id: str, limit: int = 5, **_: Any) -> dict:
+        with self._lock:
+            index = self._index(str(user_id))
+            hits = index.search(query, limit)
+            return {
+                "results": [
+                    {"id": memory_id, "score": score, **index.docs[memory_id]}
+                    for memory_id, score in hits
+                ]
+            }
+
+    def get_all(self, user_id: str, limit: int = 100, offset: int = 0, **_: Any) -> dict:
+        with self._lock:
+            # 只复制本页，不复制该用户的全部记忆
+            docs = list(itertools.islice(self._index(str(user_id)).docs.items(), offset, offset + limit))
+        return {"results": [{"id": memory_id, **doc} for memory_id, doc in docs]}
+
+    def delete(self, memory_id: Any, user_id: Optional[str] = None, **_: Any) -> bool:
+        memory_id = str(memory_id)
+        with self._lock:
+            row = self._conn.execute("SELECT user_id FROM memories WHERE id = ?", (memory_id,)).fetchone()
+            if row is None or (user_id is not None and row[0] != str(user_id)):
+                return False
+            self._conn.execute("DELETE FROM memories WHERE id = ?", (memory_id,))
+            self._conn.commit()
+            if row[0] in self._users:
+                self._users[row[0]].remove(memory_id)
+            return True
+
+    def is_backfilled(self, user_id: str) -> bool:
+        """该用户在向量后端中的已有记忆是否已复制过来。"""
+        return ALL_USERS in self._backfilled or str(user_id) in self._backfilled
+
+    def mark_backfilled(self, user_id: str) -> None:
+        user_id = str(user_id)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO backfill (user_id, completed_at) VALUES (?, ?)", (user_id, time.time())
+            )
+            self._conn.commit()
+            self._backfilled.add(user_id)
+
+    def delete_all(self, user_id: str, **_: Any) -> bool:
+        user_id = str(user_id)
+        with self._lock:
+            self._conn.execute("DELETE FROM memories WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+            self._users.pop(user_id, None)
+        return True
@@ -0,0 +1,109 @@
+"""记忆检索结果的短期缓存。
+
+键为 (用户ID, 代数, limit, 规范化查询)。每个用户有一个代数计数器，
+记忆发生变化（添加、删除、清空）时代数加一，旧代数下的缓存自然不再命中。
+代数保存在 Redis 中供多个 worker 共享；Redis 不可用时退化为进程内计数器，
+此时其他 worker 的修改最多在 TTL 内不可见。
+
+检索在工作线程中执行，Redis 命令经 redis_pool.run_sync 交给事件循环上的共享连接池。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import redis_pool
+
+logger = logging.getLogger(__name__)
+
+GENERATION_PREFIX = "memory:search:gen:"
+RESULT_PREFIX = "memory:search:result:"
+# 区分“Redis 不可用”与“键不存在”
+_UNAVAILABLE = object()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class MemorySearchCache:
+    """进程内 LRU + Redis 两级的记忆检索缓存。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+        self._generations: dict[str, int] = {}
+
+    def _generation(self, user_id: str) -> str:
+        generation = redis_pool.run_sync(lambda r: r.get(GENERATION_PREFIX + user_id), default=_UNAVAILABLE)
+        if generation is not _UNAVAILABLE:
+            return f"r{generation or 0}"
+        with self._lock:
+            return f"l{self._generations.get(user_id, 0)}"
+
+    @staticmethod
+    def _key(user_id: str, generation: str, query: str, limit: int) -> str:
+        digest = hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+        return f"{user_id}:{generation}:{limit}:{digest}"
+
+    def get(self, user_id: str, query: str, limit: int) -> tuple[str, Optional[list[str]]]:
+        """返回 (当前代数, 缓存结果或 None)；代数需在写入缓存时传回 put()。"""
+        user_id = str(user_id)
+        generation = self._generation(user_id)
+        key = self._key(user_id, generation, query, limit)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                metrics.incr("memory.search_cache.hit")
+                return generation, list(entry[1])
+
+        if generation.startswith("r"):
+            cached = redis_pool.run_sync(lambda r: r.get(RESULT_PREFIX + key))
+            if cached is not None:
+                results = json.loads(cached)
+                self._store_local(key, results)
+                metrics.incr("memory.search_cache.hit")
+                return generation, results
+
+        metrics.incr("memory.search_cache.miss")
+        return generation, None
+
+    def put(self, user_id: str, query: str, limit: int, generation: str, results: list[str]) -> None:
+        """以检索开始前取得的代数写入缓存，检索期间发生的修改会使其立即作废。"""
+        key = self._key(str(user_id), generation, query, limit)
+        self._store_local(key, results)
+        if generation.startswith("r"):
+            value = json.dumps(results, ensure_ascii=False)
+            ttl = max(1, int(settings.memory_search_cache_ttl))
+            redis_pool.submit(lambda r: r.set(RESULT_PREFIX + key, value, ex=ttl))
+
+    def _store_local(self, key: str, results: list[str]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + settings.memory_search_cache_ttl, list(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.memory_search_cache_max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        """用户记忆已变化：代数加一，并清掉本进程中该用户的缓存。"""
+        user_id = str(user_id)
+        metrics.incr("memory.search_cache.invalidate")
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            prefix = user_id + ":"
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+        redis_pool.run_sync(lambda r: r.incr(GENERATION_PREFIX + user_id))
+
+
+memory_search_cache = MemorySearchCache()
@@ -1,25 +1,191 @@
-"""AI记忆服务 - 基于powermem为每个用户提供独立记忆存储。"""
+"""AI记忆服务 - 基于powermem（或本地向量索引，MEMORY_BACKEND=local）为每个用户提供独立记忆存储。
+
+向量记忆不可用时自动降级为本地词法记忆（BM25），无需任何网络服务。
+"""
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.embedding_cache import get_embedding_cache
+from app.services.memory_search_cache import memory_search_cache
+
 logger = logging.getLogger(__name__)
 
+# 记忆服务状态
+MEMORY_INITIALIZING = "initializing"
+MEMORY_READY = "ready"
+MEMORY_DISABLED = "disabled"
+
+# 回填词法记忆时每次从向量后端读取的条数
+LEXICAL_BACKFILL_PAGE_SIZE = 200
+
 # 全局记忆实例
 _memory_instance = None
 _memory_enabled = False
+_memory_state = MEMORY_DISABLED
+# 本地词法记忆：向量记忆的同步副本与降级后端
+_lexical_index = None
+
+# 记忆检索专用线程池：powermem 调用是阻塞的，且在嵌入服务异常时可能长时间不返回，
+# 与 Starlette 的默认线程池隔离，避免拖慢其他同步接口
+_search_executor = ThreadPoolExecutor(
+    max_workers=settings.memory_search_workers,
+    thread_name_prefix="memory-search",
+)
+
+
+def _create_local_index(api_key: str, base_url: str, model: str):
+    """创建进程内向量索引引擎，嵌入仍调用 OpenAI 兼容接口。"""
+    from app.services.memory_index import LocalMemoryIndex, OpenAIEmbedder
+    
+    embedder = OpenAIEmbedder(
+        api_key=api_key,
+        base_url=base_url,
+        model=os.getenv('POWERMEM_EMBEDDING_MODEL', model),
+    )
+    return LocalMemoryIndex(settings.memory_index_dir, embedder)
+
+
+def _wrap_embedder(instance) -> None:
+    """为记忆实例的嵌入器套上持久化嵌入缓存，失败时不影响记忆功能。"""
+    embedder = getattr(instance, 'embedding', None)
+    if embedder is None:
+        return
+    try:
+        cache = get_embedding_cache()
+        if cache is not None:
+            cache.wrap(embedder)
+    except Exception as e:
+        logger.warning(f"嵌入缓存启用失败，将直接调用嵌入服务: {e}")
+
+
+def start_memory_init() -> threading.Thread:
+    """在后台线程中初始化记忆服务，不阻塞应用启动；完成前 is_memory_enabled() 为 False。"""
+    global _memory_state
+    _memory_state = MEMORY_INITIALIZING
+    thread = threading.Thread(target=_init_in_background, name="memory-init", daemon=True)
+    thread.start()
+    return thread
+
+
+def _init_in_background() -> None:
+    init_memory()
+    # 记忆服务可用后再回填词法记忆，不推迟就绪时间
+    _backfill_lexical()
+
+
+def get_memory_state() -> str:
+    """记忆服务状态：initializing / ready / disabled。"""
+    return _memory_state
 
 
 def init_memory():
-    """初始化记忆服务。"""
+    """初始化记忆服务并记录耗时。"""
+    global _memory_state
+    _memory_state = MEMORY_INITIALIZING
+    started = time.perf_counter()
+    try:
+        _init_memory_backends()
+    finally:
+        _memory_state = MEMORY_READY if is_memory_enabled() else MEMORY_DISABLED
+        logger.info(f"记忆服务初始化耗时 {time.perf_counter() - started:.2f} 秒，状态: {_memory_state}")
+
+
+def _init_memory_backends():
+    """初始化向量记忆；不可用时使用本地词法记忆。"""
+    global _memory_instance, _memory_enabled, _lexical_index
+    
+    if settings.memory_lexical_enabled:
+        try:
+            from app.services.memory_lexical import LexicalMemoryIndex
+            
+            _lexical_index = LexicalMemoryIndex(settings.memory_lexical_path)
+        except Exception as e:
+            logger.warning(f"本地词法记忆初始化失败: {e}")
+            _lexical_index = None
+    
+    _init_vector_memory()
+    
+    if not is_memory_enabled() and _lexical_index is not None:
+        _memory_instance = _lexical_index
+        _memory_enabled = True
+        logger.warning(f"向量记忆不可用，AI记忆使用本地词法检索（BM25）: {settings.memory_lexical_path}")
+
+
+def _lexical_mirror_ready(user_id: str) -> bool:
+    """词法记忆作为向量后端的镜像，且该用户的已有记忆已回填，可用于降级与融合。"""
+    return (
+        _lexical_index is not None
+        and _memory_instance is not _lexical_index
+        and _lexical_index.is_backfilled(user_id)
+    )
+
+
+def _all_user_ids() -> list[str]:
+    from sqlmodel import Session, select
+
+    from app.db.session import engine
+    from app.models.user import User
+
+    with Session(engine) as session:
+        return [str(user_id) for user_id in session.exec(select(User.id)).all()]
+
+
+def _backfill_lexical() -> None:
+    """把向量后端中已有的记忆逐个用户复制到词法记忆。
+    
+    之后的写入由 _mirror_to_lexical 同步，因此只需执行一次；每个用户完成后记录进度，
+    中断后重启会跳过已完成的用户。用户回填完成前，其降级检索与融合检索不使用词法记忆。
+    """
+    if _lexical_index is None or _memory_instance is None or _memory_instance is _lexical_index:
+        return
+    from app.services.memory_lexical import ALL_USERS
+
+    if _lexical_index.is_backfilled(ALL_USERS):
+        return
+    started = time.perf_counter()
+    copied = 0
+    try:
+        for user_id in _all_user_ids():
+            if _lexical_index.is_backfilled(user_id):
+                continue
+            offset = 0
+            while True:
+                items = _memory_instance.get_all(
+                    user_id=user_id, limit=LEXICAL_BACKFILL_PAGE_SIZE, offset=offset
+                ).get('results', [])
+                for item in items:
+                    if item.get('id') is not None and item.get('memory'):
+                        _lexical_index.upsert(item['id'], item['memory'], user_id, item.get('metadata') or {})
+                copied += len(items)
+                if len(items) < LEXICAL_BACKFILL_PAGE_SIZE:
+                    break
+                offset += LEXICAL_BACKFILL_PAGE_SIZE
+            _lexical_index.mark_backfilled(user_id)
+        # 此后新注册的用户没有历史记忆，所有写入都会同步
+        _lexical_index.mark_backfilled(ALL_USERS)
+    except Exception as e:
+        logger.warning(f"回填本地词法记忆失败，下次启动时继续: {e}")
+        return
+    finally:
+        metrics.incr("memory.lexical.backfilled", copied)
+    logger.info(f"本地词法记忆回填完成: {copied} 条，耗时 {time.perf_counter() - started:.1f} 秒")
+
+
+def _init_vector_memory():
+    """初始化向量记忆（powermem 或本地向量索引）。"""
     global _memory_instance, _memory_enabled
     
     try:
-        from powermem import Memory
-        
         # 从环境变量读取配置
         api_key = os.getenv('POWERMEM_LLM_API_KEY', '')
         base_url = os.getenv('POWERMEM_LLM_BASE_URL', '')
@@ -30,6 +196,15 @@ def init_memory():
             _memory_enabled = False
             return
         
+        if settings.memory_backend == 'local':
+            _memory_instance = _create_local_index(api_key, base_url, model)
+            _wrap_embedder(_memory_instance)
+            _memory_enabled = True
+            logger.info(f"AI记忆服务初始化成功（本地向量索引: {settings.memory_index_dir}）")
+            return
+        
+        from powermem import Memory
+        
         # 使用字典配置 - 修正参数名
         config = {
             'llm': {
@@ -58,10 +233,14 @@ def init_memory():
         }
         
         _memory_instance = Memory(config=config)
+        _wrap_embedder(_memory_instance)
         _memory_enabled = True
         logger.info("AI记忆服务初始化成功")
-    except ImportError:
-        logger.warning("powermem未安装，AI记忆功能已禁用。请运行: pip install powermem")
+    except ImportError as e:
+        if settings.memory_backend == 'local':
+            logger.warning(f"本地记忆引擎依赖缺失，AI记忆功能已禁用: {e}")
+        else:
+            logger.warning("powermem未安装，AI记忆功能已禁用。请运行: pip install powermem")
         _memory_enabled = False
     except Exception as e:
         logger.warning(f"AI记忆服务初始化失败: {e}")
@@ -89,7 +268,9 @@ def add_memory(content: str, user_id: str, metadata: Optional[dict] = None) -> b
         return False
     
     try:
-        _memory_instance.add(content, user_id=str(user_id), metadata=metadata or {})
+        result = _memory_instance.add(content, user_id=str(user_id), metadata=metadata or {})
+        _mirror_to_lexical(result, user_id, metadata)
+        memory_search_cache.invalidate(user_id)
         logger.debug(f"为用户 {user_id} 添加记忆: {content[:50]}...")
         return True
     except Exception as e:
@@ -97,7 +278,7 @@ def add_memory(content: str, user_id: str, metadata: Optional[dict] = None) -> b
         return False
 
 
-def search_memories(query: str, user_id: str, limit: int = 5) -> list[str]:
+def search_memories(query: str, user_id: str, limit: int = 5, use_cache: bool = True) -> list[str]:
     """
     搜索用户相关记忆。
     
@@ -105,6 +286,7 @@ def search_memories(query: str, user_id: str, limit: int = 5) -> list[str]:
         query: 搜索查询
         user_id: 用户ID
         limit: 返回结果数量限制
+        use_cache: 是否使用检索结果缓存
     
     Returns:
         相关记忆列表
@@ -112,20 +294,75 @@ def search_memories(query: str, user_id: str, limit: int = 5) -> list[str]:
     if not is_memory_enabled():
         return []
     
+    use_cache = use_cache and settings.memory_search_cache_enabled
+    if use_cache:
+        generation, cached = memory_search_cache.get(user_id, query, limit)
+        if cached is not None:
+            return cached
+    
     try:
         results = _memory_instance.search(query, user_id=str(user_id), limit=limit)
-        memories = []
-        for result in results.get('results', []):
-            memory_text = result.get('memory', '')
-            if memory_text:
-                memories.append(memory_text)
-        return memories
+        memories = _memory_texts(results)
     except Exception as e:
-        # embeddings API不可用时静默失败
+        # embeddings API不可用时降级为本地词法检索（降级结果不缓存）
         logger.debug(f"搜索记忆失败（可能是embeddings不支持）: {e}")
+        if not _lexical_mirror_ready(user_id):
+            return []
+        metrics.incr("memory.lexical.fallback")
+        return _lexical_search(query, user_id, limit)
+    
+    if settings.memory_lexical_blend and _lexical_mirror_ready(user_id):
+        memories = _rrf_merge([memories, _lexical_search(query, user_id, limit)], limit)
+    if use_cache:
+        memory_search_cache.put(user_id, query, limit, generation, memories)
+    return memories
+
+
+def _memory_texts(results) -> list[str]:
+    return [result.get('memory', '') for result in results.get('results', []) if result.get('memory')]
+
+
+def _lexical_search(query: str, user_id: str, limit: int) -> list[str]:
+    try:
+        return _memory_texts(_lexical_index.search(query, user_id=str(user_id), limit=limit))
+    except Exception as e:
+        logger.warning(f"本地词法检索失败: {e}")
         return []
 
 
+def _rrf_merge(rankings: list[list[str]], limit: int, k: int = 60) -> list[str]:
+    """按 Reciprocal Rank Fusion 融合多路检索结果。"""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, memory_text in enumerate(ranking):
+            scores[memory_text] = scores.get(memory_text, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+
+def _mirror_to_lexical(result, user_id: str, metadata: Optional[dict] = None) -> None:
+    """把向量后端的写入结果（ADD / UPDATE / DELETE）同步到本地词法记忆，保持相同的记忆ID。"""
+    if _lexical_index is None or _memory_instance is _lexical_index or not isinstance(result, dict):
+        return
+    try:
+        for item in result.get('results', []):
+            memory_id = item.get('id')
+            if memory_id is None:
+                continue
+            event = item.get('event')
+            if event in ('ADD', 'UPDATE') and item.get('memory'):
+                _lexical_index.upsert(memory_id, item['memory'], user_id, item.get('metadata') or metadata)
+            elif event == 'DELETE':
+                _lexical_index.delete(memory_id)
+    except Exception as e:
+        logger.warning(f"同步本地词法记忆失败: {e}")
+
+
+async def asearch_memories(query: str, user_id: str, limit: int = 5) -> list[str]:
+    """在记忆检索专用线程池中执行 search_memories。"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_search_executor, search_memories, query, user_id, limit)
+
+
 def get_all_memories(user_id: str) -> list[str]:
     """
     获取用户所有记忆。
@@ -152,6 +389,59 @@ def get_all_memories(user_id: str) -> list[str]:
         return []
 
 
+def get_memory_items(user_id: str, limit: int = 100, offset: int = 0) -> list[dict]:
+    """
+    分页获取用户记忆条目（含ID与元数据）。
+    
+    Args:
+        user_id: 用户ID
+        limit: 返回条数
+        offset: 跳过条数
+    
+    Returns:
+        记忆条目列表，每项包含 id、memory、metadata
+    """
+    if not is_memory_enabled():
+        return []
+    
+    try:
+        results = _memory_instance.get_all(user_id=str(user_id), limit=limit, offset=offset)
+        return [_memory_item(result) for result in results.get('results', []) if result.get('memory')]
+    except Exception as e:
+        logger.error(f"获取记忆失败: {e}")
+        return []
+
+
+def get_memory_page(user_id: str, limit: int, offset: int = 0) -> tuple[list[dict], bool]:
+    """
+    按后端的原始位置分页获取用户记忆条目。
+    
+    空记忆在后端分页之后才被过滤，本页返回的条目可能少于 limit，
+    因此是否还有下一页由后端原始条数判断（多读一条），下一页从 offset + limit 开始。
+    
+    Returns:
+        元组 (本页记忆条目, 是否还有下一页)
+    """
+    if not is_memory_enabled():
+        return [], False
+    
+    try:
+        results = _memory_instance.get_all(user_id=str(user_id), limit=limit + 1, offset=offset).get('results', [])
+    except Exception as e:
+        logger.error(f"获取记忆失败: {e}")
+        return [], False
+    items = [_memory_item(result) for result in results[:limit] if result.get('memory')]
+    return items, len(results) > limit
+
+
+def _memory_item(result: dict) -> dict:
+    return {
+        'id': str(result.get('id')),
+        'memory': result.get('memory', ''),
+        'metadata': result.get('metadata') or {},
+    }
+
+
 def delete_memory(memory_id: str, user_id: str) -> bool:
     """
     删除指定记忆。
@@ -167,7 +457,15 @@ def delete_memory(memory_id: str, user_id: str) -> bool:
         return False
     
     try:
-        _memory_instance.delete(memory_id, user_id=str(user_id))
+        # powermem 使用整数（雪花）ID，本地引擎使用字符串ID
+        native_id = int(memory_id) if str(memory_id).isdigit() else memory_id
+        deleted = _memory_instance.delete(native_id, user_id=str(user_id))
+        if deleted is False:
+            # 记忆不存在或不属于该用户
+            return False
+        if _lexical_index is not None and _memory_instance is not _lexical_index:
+            _lexical_index.delete(memory_id, user_id=str(user_id))
+        memory_search_cache.invalidate(user_id)
         return True
     except Exception as e:
         logger.error(f"删除记忆失败: {e}")
@@ -189,6 +487,9 @@ def clear_user_memories(user_id: str) -> bool:
     
     try:
         _memory_instance.delete_all(user_id=str(user_id))
+        if _lexical_index is not None and _memory_instance is not _lexical_index:
+            _lexical_index.delete_all(user_id=str(user_id))
+        memory_search_cache.invalidate(user_id)
         logger.info(f"已清空用户 {user_id} 的所有记忆")
         return True
     except Exception as e:
@@ -196,6 +497,45 @@ def clear_user_memories(user_id: str) -> bool:
         return False
 
 
+# 简单的记忆提取规则：包含这些关键词的用户消息会被保存为记忆
+MEMORY_KEYWORDS = [
+    '我喜欢', '我不喜欢', '我是', '我的', '我叫', '我住在',
+    '我工作', '我学习', '我经常', '我习惯', '我偏好',
+    '记住', '请记住', '别忘了', '提醒我'
+]
+
+
+def is_memorable(user_message: str) -> bool:
+    """用户消息是否值得保存为记忆。"""
+    return any(keyword in user_message for keyword in MEMORY_KEYWORDS)
+
+
+def add_memories(contents: list[str], user_id: str) -> bool:
+    """
+    为用户批量添加记忆，一次 powermem 调用处理多条内容以分摊 LLM 与嵌入开销。
+    
+    Args:
+        contents: 记忆内容列表
+        user_id: 用户ID
+    
+    Returns:
+        是否添加成功
+    """
+    if not is_memory_enabled() or not contents:
+        return False
+    
+    try:
+        messages = [{"role": "user", "content": content} for content in contents]
+        result = _memory_instance.add(messages, user_id=str(user_id))
+        _mirror_to_lexical(result, user_id)
+        memory_search_cache.invalidate(user_id)
+        logger.debug(f"为用户 {user_id} 批量添加 {len(contents)} 条记忆")
+        return True
+    except Exception as e:
+        logger.error(f"批量添加记忆失败: {e}")
+        return False
+
+
 def extract_and_save_memory(user_message: str, assistant_response: str, user_id: str) -> None:
     """
     从对话中提取并保存重要记忆。
@@ -208,15 +548,6 @@ def extract_and_save_memory(user_message: str, assistant_response: str, user_id:
     if not is_memory_enabled():
         return
     
-    # 简单的记忆提取规则
-    memory_keywords = [
-        '我喜欢', '我不喜欢', '我是', '我的', '我叫', '我住在',
-        '我工作', '我学习', '我经常', '我习惯', '我偏好',
-        '记住', '请记住', '别忘了', '提醒我'
-    ]
-    
-    for keyword in memory_keywords:
-        if keyword in user_message:
-            # 保存包含关键词的用户消息作为记忆
-            add_memory(user_message, user_id)
-            break
+    if is_memorable(user_message):
+        # 保存包含关键词的用户消息作为记忆
+        add_memory(user_message, user_id)
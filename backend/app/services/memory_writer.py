@@ -0,0 +1,134 @@
+"""对话记忆后台写入队列（write-behind）。
+
+聊天完成后把 (用户消息, 用户ID) 放入有界队列立即返回，
+后台任务按批取出、按用户去重后分组调用 powermem，分摊 LLM 与嵌入请求的开销。
+只记忆用户消息，因此流式回复不需要在内存中拼接完整文本。
+队列满时丢弃新条目并计数；应用关闭时在超时时间内尽量写完剩余条目。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.memory_service import add_memories, is_memorable, is_memory_enabled
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MemoryItem:
+    user_message: str
+    user_id: str
+
+
+class MemoryWriter:
+    """有界的后台记忆写入器。"""
+
+    def __init__(self) -> None:
+        self._queue: Optional[asyncio.Queue[MemoryItem]] = None
+        self._task: Optional[asyncio.Task] = None
+        # powermem 是阻塞调用，单线程顺序写入即可
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-writer")
+
+    def start(self) -> None:
+        """在事件循环中启动后台写入任务。"""
+        if self._task and not self._task.done():
+            return
+        self._queue = asyncio.Queue(maxsize=settings.memory_queue_size)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"记忆写入队列已启动: 容量 {settings.memory_queue_size}, 批大小 {settings.memory_batch_size}")
+
+    def submit(self, user_message: str, user_id: str) -> bool:
+        """提交一轮对话，不阻塞；返回是否入队。"""
+        if self._queue is None or not is_memory_enabled() or not is_memorable(user_message):
+            return False
+        try:
+            self._queue.put_nowait(MemoryItem(user_message, str(user_id)))
+        except asyncio.QueueFull:
+            metrics.incr("memory.writer.dropped")
+            logger.warning("记忆写入队列已满，丢弃本条对话记忆")
+            return False
+        metrics.incr("memory.writer.enqueued")
+        return True
+
+    async def _next_batch(self) -> list[MemoryItem]:
+        """等待第一条后，在 flush 间隔内继续收集，最多 batch_size 条。"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + settings.memory_flush_interval
+        while len(batch) < settings.memory_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: list[MemoryItem]) -> None:
+        # 按用户分组并去重（同一用户重复的消息只保存一次）
+        grouped: dict[str, list[str]] = {}
+        for item in batch:
+            contents = grouped.setdefault(item.user_id, [])
+            content = item.user_message.strip()
+            if content in contents:
+                metrics.incr("memory.writer.deduplicated")
+                continue
+            contents.append(content)
+
+        loop = asyncio.get_running_loop()
+        for user_id, contents in grouped.items():
+            ok = await loop.run_in_executor(self._executor, add_memories, contents, user_id)
+            metrics.incr("memory.writer.written" if ok else "memory.writer.failed", len(contents))
+        metrics.incr("memory.writer.batches")
+
+    async def stop(self) -> None:
+        """关闭时在 MEMORY_DRAIN_TIMEOUT 内写完队列中剩余的条目。"""
+        if self._task is None:
+            return
+        remaining = self._queue.qsize()
+        if remaining:
+            logger.info(f"正在写入剩余的 {remaining} 条对话记忆...")
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=settings.memory_drain_timeout)
+            except asyncio.TimeoutError:
+                metrics.incr("memory.writer.dropped", self._queue.qsize())
+                logger.warning(f"记忆写入超时，放弃剩余的 {self._queue.qsize()} 条")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "capacity": settings.memory_queue_size,
+            "enqueued": metrics.get("memory.writer.enqueued"),
+            "dropped": metrics.get("memory.writer.dropped"),
+            "deduplicated": metrics.get("memory.writer.deduplicated"),
+            "written": metrics.get("memory.writer.written"),
+            "failed": metrics.get("memory.writer.failed"),
+            "batches": metrics.get("memory.writer.batches"),
+        }
+
+
+memory_writer = MemoryWriter()
@@ -0,0 +1,162 @@
+"""模型与角色提示词的进程内缓存。
+
+ModelConfig 与 RolePrompt 很少变动，聊天请求每次查库代价不必要。
+这里一次性加载到内存并带版本号；写接口调用 invalidate() 使其失效，
+多 worker 部署时通过 Redis pub/sub 通知其他进程同步失效（使用共享连接池，
+订阅在事件循环上的后台任务中进行）。通知仍可能丢失（Redis 长时间不可用、
+订阅重连的间隙），因此快照最多使用 REGISTRY_MAX_AGE 秒，过后重新加载。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import secrets
+import threading
+import time
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session, select
+
+from app.core.redis import redis_pool
+from app.db.session import engine
+from app.models.user import ModelConfig, RolePrompt
+
+logger = logging.getLogger(__name__)
+
+# 失效通知频道
+INVALIDATE_CHANNEL = "config:registry:invalidate"
+# 发布失效通知的尝试次数（间隔 1、2、4、8 秒，覆盖 Redis 出错后的暂停期）
+PUBLISH_ATTEMPTS = 5
+# 快照的最长使用时间（秒），丢失失效通知时最迟在此之后生效
+REGISTRY_MAX_AGE = 300
+
+
+class ModelRegistry:
+    """带版本号的模型与角色提示词注册表。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._version = 0
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._models: list[ModelConfig] = []
+        self._models_by_id: dict[int, ModelConfig] = {}
+        self._prompts_by_id: dict[int, str] = {}
+        self._default_prompt: Optional[str] = None
+        self._instance_id = secrets.token_hex(8)
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def is_stale(self) -> bool:
+        """版本已变化，或快照超过 REGISTRY_MAX_AGE 秒。"""
+        return (
+            self._loaded_version != self._version
+            or time.monotonic() - self._loaded_at >= REGISTRY_MAX_AGE
+        )
+
+    def load(self) -> None:
+        """从数据库加载模型与提示词（未过期时直接返回）。"""
+        with self._lock:
+            if not self.is_stale:
+                return
+            version = self._version
+            with Session(engine) as session:
+                models = [ModelConfig(**m.model_dump()) for m in session.exec(select(ModelConfig)).all()]
+                prompts = session.exec(select(RolePrompt).order_by(RolePrompt.id)).all()
+                prompts_by_id = {p.id: p.prompt for p in prompts}
+                default_prompt = prompts[0].prompt if prompts else None
+            self._models = models
+            self._models_by_id = {m.id: m for m in models}
+            self._prompts_by_id = prompts_by_id
+            self._default_prompt = default_prompt
+            self._loaded_version = version
+            self._loaded_at = time.monotonic()
+        logger.info(f"模型注册表已加载: version={version}, 模型 {len(models)} 个, 提示词 {len(prompts_by_id)} 个")
+
+    async def refresh_if_stale(self) -> None:
+        """在线程池中加载过期的注册表，避免阻塞事件循环。"""
+        if self.is_stale:
+            await run_in_threadpool(self.load)
+
+    # 以下访问器只读取最近一次加载的快照，从不访问数据库；
+    # 异步调用方先 await refresh_if_stale()，在线程池中完成重新加载
+
+    def models(self) -> list[ModelConfig]:
+        """所有模型（按表顺序）。"""
+        return list(self._models)
+
+    def get_model(self, model_id: int) -> Optional[ModelConfig]:
+        return self._models_by_id.get(model_id)
+
+    def role_prompt(self, prompt_id: int) -> Optional[str]:
+        return self._prompts_by_id.get(prompt_id)
+
+    def default_role_prompt(self) -> Optional[str]:
+        """id 最小的角色提示词，作为未指定时的默认提示词。"""
+        return self._default_prompt
+
+    def invalidate(self, broadcast: bool = True) -> None:
+        """使注册表失效，下次访问时重新加载。"""
+        with self._lock:
+            self._version += 1
+        if broadcast:
+            self._publish()
+
+    def stats(self) -> dict:
+        return {
+            "version": self._version,
+            "loaded_version": self._loaded_version,
+            "age": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+            "models": len(self._models),
+            "role_prompts": len(self._prompts_by_id),
+        }
+
+    def _publish(self) -> None:
+        # 写接口在工作线程中调用，发布交给事件循环执行，不等待结果；
+        # 通知丢失会让其他 worker 使用旧配置，因此不受 Redis 暂停期限制并退避重试
+        instance_id = self._instance_id
+        redis_pool.submit(lambda r: r.publish(INVALIDATE_CHANNEL, instance_id), attempts=PUBLISH_ATTEMPTS)
+
+    def start_listener(self) -> None:
+        """在事件循环上启动后台任务，订阅其他 worker 的失效通知。"""
+        if self._listener and not self._listener.done():
+            return
+        self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    def stop_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self) -> None:
+        # 订阅会独占连接池中的一条连接
+        while True:
+            pubsub = redis_pool.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATE_CHANNEL)
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message and message.get("data") != self._instance_id:
+                        self.invalidate(broadcast=False)
+                        logger.info("收到其他 worker 的失效通知，模型注册表已失效")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"模型注册表订阅失败，30 秒后重试: {e}")
+                # 重连期间可能错过通知，保守起见直接失效
+                self.invalidate(broadcast=False)
+                await asyncio.sleep(30)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:  # noqa: BLE001
+                    pass
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,280 @@
+"""模型路由：按健康状况与延迟为故障转移排序。
+
+为每个模型记录 EWMA 延迟、EWMA 错误率与上游限流响应头，
+连续失败的模型进入熔断（open），冷却后放行一个探测请求（half_open），
+成功即恢复（closed）。备用模型按预期延迟从低到高排序。
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Mapping, Optional
+
+from app.core.config import settings
+from app.models.user import ModelConfig
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# 没有延迟样本时假定的延迟（秒）
+DEFAULT_LATENCY = 2.0
+# 计入熔断的上游状态码（其余 4xx 视为请求本身的问题）
+FAILURE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """解析限流头中的时长：支持秒数与 "1m30s"、"250ms" 形式。"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    number = ""
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch.isdigit() or ch == ".":
+            number += ch
+        elif value.startswith("ms", i):
+            total += float(number or 0) / 1000
+            number = ""
+            i += 1
+        elif ch in "hms":
+            total += float(number or 0) * {"h": 3600, "m": 60, "s": 1}[ch]
+            number = ""
+        else:
+            return None
+        i += 1
+    return total
+
+
+@dataclass
+class ModelHealth:
+    """单个模型的健康统计。"""
+    model_id: int
+    name: str
+    ewma_ttfb: Optional[float] = None
+    ewma_latency: Optional[float] = None
+    ewma_error_rate: float = 0.0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    state: str = CIRCUIT_CLOSED
+    open_until: float = 0.0
+    probe_in_flight: bool = False
+    rate_limited_until: float = 0.0
+    ratelimit_remaining: Optional[int] = None
+    last_status: Optional[int] = None
+    ttfb_samples: deque = field(default_factory=lambda: deque(maxlen=200))
+
+    def expected_latency(self, stream: bool) -> float:
+        latency = self.ewma_ttfb if stream else self.ewma_latency
+        if latency is None:
+            latency = self.ewma_latency or self.ewma_ttfb or DEFAULT_LATENCY
+        # 错误率越高，预期代价越大（失败意味着额外一次超时或重试）
+        return latency * (1 + 4 * self.ewma_error_rate)
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            "model_id": self.model_id,
+            "name": self.name,
+            "state": self.state,
+            "ewma_ttfb": self.ewma_ttfb,
+            "ewma_latency": self.ewma_latency,
+            "ewma_error_rate": round(self.ewma_error_rate, 4),
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "open_for_seconds": round(max(0.0, self.open_until - now), 3),
+            "rate_limited_for_seconds": round(max(0.0, self.rate_limited_until - now), 3),
+            "ratelimit_remaining": self.ratelimit_remaining,
+            "last_status": self.last_status,
+        }
+
+
+class ModelRouter:
+    """按健康状况与延迟排序候选模型。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._health: dict[int, ModelHealth] = {}
+
+    def _get(self, model: ModelConfig) -> ModelHealth:
+        health = self._health.get(model.id)
+        if health is None:
+            health = self._health[model.id] = ModelHealth(model_id=model.id, name=model.name)
+        health.name = model.name
+        return health
+
+    def _available(self, health: ModelHealth, now: float) -> bool:
+        if health.rate_limited_until > now:
+            return False
+        if health.state == CIRCUIT_OPEN:
+            if now < health.open_until:
+                return False
+            health.state = CIRCUIT_HALF_OPEN
+            health.probe_in_flight = False
+        if health.state == CIRCUIT_HALF_OPEN:
+            # 半开状态只放行一个探测请求
+            return not health.probe_in_flight
+        return True
+
+    def order(self, primary: ModelConfig, fallbacks: list[ModelConfig], stream: bool = True) -> list[ModelConfig]:
+        """返回尝试顺序：可用的首选模型 → 按预期延迟排序的可用备用模型 → 不可用模型兜底。"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [primary, *fallbacks]
+            available = {m.id: self._available(self._get(m), now) for m in candidates}
+            ordered_fallbacks = sorted(
+                (m for m in fallbacks if available[m.id]),
+                key=lambda m: self._get(m).expected_latency(stream),
+            )
+            ordered = ([primary] if available[primary.id] else []) + ordered_fallbacks
+            # 全部不可用时仍按原顺序尝试，熔断不应让请求直接失败
+            ordered += [m for m in candidates if not available[m.id]]
+            for m in ordered[:1]:
+                health = self._get(m)
+                if health.state == CIRCUIT_HALF_OPEN:
+                    health.probe_in_flight = True
+        if ordered[0].id != primary.id:
+            logger.info(f"模型 {primary.name} 暂不可用，优先使用 {ordered[0].name}")
+        return ordered
+
+    def is_healthy(self, model: ModelConfig) -> bool:
+        """模型当前是否可接收请求（未熔断且未被限流），只查询不占用探测名额。"""
+        with self._lock:
+            return self._available(self._get(model), time.monotonic())
+
+    def try_acquire(self, model: ModelConfig) -> bool:
+        """模型可用时为即将发出的请求占用它：半开状态下占用唯一的探测名额。
+
+        占用后请求的结果必须通过 record_success / record_failure / record_cancelled 反馈，
+        否则半开的模型不会再放行探测。
+        """
+        with self._lock:
+            health = self._get(model)
+            if not self._available(health, time.monotonic()):
+                return False
+            if health.state == CIRCUIT_HALF_OPEN:
+                health.probe_in_flight = True
+            return True
+
+    def record_success(
+        self,
+        model: ModelConfig,
+        latency: float,
+        headers: Optional[Mapping[str, str]] = None,
+        stream: bool = False,
+    ) -> None:
+        """记录一次成功请求。流式请求的 latency 为首字节延迟，非流式为完整响应耗时。"""
+        alpha = settings.router_ewma_alpha
+        with self._lock:
+            health = self._get(model)
+            health.requests += 1
+            health.last_status = 200
+            health.consecutive_failures = 0
+            health.ewma_error_rate *= 1 - alpha
+            if stream:
+                health.ttfb_samples.append(latency)
+                health.ewma_ttfb = latency if health.ewma_ttfb is None else alpha * latency + (1 - alpha) * health.ewma_ttfb
+            else:
+                health.ewma_latency = (
+                    latency if health.ewma_latency is None else alpha * latency + (1 - alpha) * health.ewma_latency
+                )
+            if health.state != CIRCUIT_CLOSED:
+                logger.info(f"模型 {model.name} 已恢复，熔断关闭")
+            health.state = CIRCUIT_CLOSED
+            health.probe_in_flight = False
+            self._apply_rate_limit(health, headers, limited=False)
+
+    def record_failure(
+        self,
+        model: ModelConfig,
+        status: int,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        """记录一次失败请求，必要时打开熔断。"""
+        alpha = settings.router_ewma_alpha
+        with self._lock:
+            health = self._get(model)
+            health.requests += 1
+            health.last_status = status
+            health.probe_in_flight = False
+            if status not in FAILURE_STATUSES:
+                return
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.ewma_error_rate = alpha + (1 - alpha) * health.ewma_error_rate
+            self._apply_rate_limit(health, headers, limited=status == 429)
+            if (
+                health.state == CIRCUIT_HALF_OPEN
+                or health.consecutive_failures >= settings.router_failure_threshold
+            ):
+                health.state = CIRCUIT_OPEN
+                health.open_until = time.monotonic() + settings.router_open_seconds
+                logger.warning(
+                    f"模型 {model.name} 连续失败 {health.consecutive_failures} 次（最近 {status}），"
+                    f"熔断 {settings.router_open_seconds} 秒"
+                )
+
+    def record_cancelled(self, model: ModelConfig) -> None:
+        """请求被主动取消（如对冲落败），不计入成功或失败，只释放半开探测名额。"""
+        with self._lock:
+            self._get(model).probe_in_flight = False
+
+    @staticmethod
+    def _apply_rate_limit(health: ModelHealth, headers: Optional[Mapping[str, str]], limited: bool) -> None:
+        """根据 Retry-After / X-RateLimit-* 响应头计算限流结束时间。"""
+        headers = headers or {}
+        remaining = headers.get("x-ratelimit-remaining-requests") or headers.get("x-ratelimit-remaining")
+        if remaining is not None:
+            try:
+                health.ratelimit_remaining = int(float(remaining))
+            except ValueError:
+                health.ratelimit_remaining = None
+        if not limited and health.ratelimit_remaining != 0:
+            return
+        wait = _parse_duration(headers.get("retry-after"))
+        if wait is None:
+            wait = _parse_duration(headers.get("x-ratelimit-reset-requests") or headers.get("x-ratelimit-reset"))
+            # 部分上游返回的是 Unix 时间戳
+            if wait is not None and wait > 1_000_000_000:
+                wait = max(0.0, wait - time.time())
+        if wait is None:
+            wait = settings.router_open_seconds if limited else 0.0
+        health.rate_limited_until = time.monotonic() + min(wait, 3600)
+
+    def ttfb_percentile(self, model: ModelConfig, percentile: float) -> Optional[float]:
+        """最近首字节延迟的分位数，样本不足时返回 None。"""
+        with self._lock:
+            samples = sorted(self._get(model).ttfb_samples)
+        if len(samples) < 5:
+            return None
+        index = min(len(samples) - 1, int(round(percentile / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self) -> list[dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [health.to_dict(now) for health in self._health.values()]
+
+    def reset(self, model_id: Optional[int] = None) -> None:
+        """清空统计（全部或指定模型）。"""
+        with self._lock:
+            if model_id is None:
+                self._health.clear()
+            else:
+                self._health.pop(model_id, None)
+
+
+model_router = ModelRouter()
@@ -0,0 +1,225 @@
+"""相同并发请求合并（singleflight）。
+
+同一时刻多个相同的请求只向上游发出一次：
+- SingleFlight：普通协程调用，所有等待者共享同一个结果或异常；
+- StreamSingleFlight：流式调用，一个上游流被扇出给所有订阅者，
+  晚到的订阅者先回放已收到的数据块再接收后续数据。只有上游产生的数据块
+  不超过回放窗口时才能加入；超出后不再接受新订阅者，已被所有订阅者读过的
+  数据块随即释放，内存占用只取决于最慢订阅者的落后程度，而不是整个回复。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Generic, Optional, TypeVar
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 打开上游流的函数：返回 (首个数据块, 剩余数据迭代器, 关闭上游的回调)
+StreamOpener = Callable[[], Awaitable[tuple[str, AsyncIterator[str], Callable[[], Awaitable[None]]]]]
+
+
+class SingleFlight(Generic[T]):
+    """按键合并并发的协程调用。"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            metrics.incr(f"{self.name}.coalesced")
+        # shield：某个等待者被取消不影响其他等待者
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 所有等待者都已离开时，避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class StreamFanout:
+    """一个上游流及其所有订阅者。
+
+    on_sealed 在不再接受新订阅者（超出回放窗口或上游结束）时调用，可能调用多次。
+    """
+
+    def __init__(self, opener: StreamOpener, on_sealed: Callable[[], None], replay_chunks: int) -> None:
+        # 尚未被所有订阅者读过的数据块，_chunks[0] 是第 _base 个数据块
+        self._chunks: list[str] = []
+        self._base = 0
+        self.received = 0
+        self.sse_events = 0
+        self.joinable = True
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.open_error: Optional[BaseException] = None
+        self._opener = opener
+        self._on_sealed = on_sealed
+        self._replay_chunks = replay_chunks
+        self._opened = asyncio.Event()
+        self._changed = asyncio.Event()
+        self._subscriptions: set[StreamSubscription] = set()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        close: Optional[Callable[[], Awaitable[None]]] = None
+        try:
+            try:
+                first_chunk, chunks, close = await self._opener()
+            except Exception as exc:
+                self.open_error = exc
+                return
+            self._append(first_chunk)
+            self._opened.set()
+            try:
+                async for chunk in chunks:
+                    if chunk:
+                        self._append(chunk)
+            except Exception as exc:
+                self.error = exc
+                logger.warning(f"上游流式传输中断: {exc}")
+        finally:
+            self.done = True
+            self.joinable = False
+            self._opened.set()
+            self._notify()
+            self._on_sealed()
+            if close is not None:
+                await asyncio.shield(close())
+
+    def _append(self, chunk: str) -> None:
+        self._chunks.append(chunk)
+        self.received += 1
+        # SSE 数据事件数，近似为已生成的 token 数
+        self.sse_events += chunk.count("data:") - chunk.count("[DONE]")
+        if self.joinable and self.received >= self._replay_chunks:
+            self.joinable = False
+            self._on_sealed()
+        self._trim()
+        self._notify()
+
+    def _trim(self) -> None:
+        """不再接受新订阅者后，释放所有订阅者都已读过的数据块。"""
+        if self.joinable:
+            return
+        low = min((s.position for s in self._subscriptions), default=self.received)
+        if low > self._base:
+            del self._chunks[:low - self._base]
+            self._base = low
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def subscribe(self) -> StreamSubscription:
+        subscription = StreamSubscription(self)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    async def wait_open(self) -> None:
+        """等待上游流打开；打开失败时抛出对应异常。"""
+        await asyncio.shield(self._opened.wait())
+        if self.open_error is not None:
+            raise self.open_error
+
+    async def _unsubscribe(self, subscription: StreamSubscription) -> bool:
+        """移除订阅者；最后一个订阅者离开且上游未结束时中止上游，返回是否中止。"""
+        self._subscriptions.discard(subscription)
+        self._trim()
+        if self._subscriptions or self.done:
+            return False
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        return True
+
+    async def _iterate(self, subscription: StreamSubscription) -> AsyncIterator[str]:
+        while True:
+            changed = self._changed
+            while subscription.position < self.received:
+                chunk = self._chunks[subscription.position - self._base]
+                subscription.position += 1
+                self._trim()
+                yield chunk
+            if self.done:
+                return
+            await changed.wait()
+
+
+class StreamSubscription:
+    """某个订阅者对共享流的读取位置。"""
+
+    def __init__(self, fanout: StreamFanout) -> None:
+        self._fanout = fanout
+        self._closed = False
+        # 下一个要读取的数据块序号
+        self.position = 0
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        return self._fanout.error
+
+    @property
+    def sse_events(self) -> int:
+        """上游目前已产生的 SSE 数据事件数（近似 token 数）。"""
+        return self._fanout.sse_events
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._fanout._iterate(self)
+
+    async def close(self) -> bool:
+        """离开共享流，可重复调用。返回本次离开是否中止了上游流。"""
+        if self._closed:
+            return False
+        self._closed = True
+        return await self._fanout._unsubscribe(self)
+
+
+class StreamSingleFlight:
+    """按键合并并发的流式调用。"""
+
+    def __init__(self, name: str, replay_chunks: int) -> None:
+        self.name = name
+        self.replay_chunks = replay_chunks
+        self._fanouts: dict[str, StreamFanout] = {}
+
+    async def subscribe(self, key: str, opener: StreamOpener) -> StreamSubscription:
+        """订阅 key 对应的上游流，不存在或已超出回放窗口时用 opener 打开新的上游流。"""
+        fanout = self._fanouts.get(key)
+        if fanout is None:
+            fanout = StreamFanout(opener, lambda: self._finish(key, fanout), self.replay_chunks)
+            self._fanouts[key] = fanout
+        else:
+            metrics.incr(f"{self.name}.coalesced")
+        subscription = fanout.subscribe()
+        try:
+            await fanout.wait_open()
+        except BaseException:
+            await subscription.close()
+            raise
+        return subscription
+
+    def _finish(self, key: str, fanout: StreamFanout) -> None:
+        if self._fanouts.get(key) is fanout:
+            del self._fanouts[key]
+
+    def in_flight(self) -> int:
+        return len(self._fanouts)
@@ -0,0 +1,106 @@
+"""记忆检索基准：本地 NumPy 向量索引 vs powermem SQLite 向量存储。
+
+使用随机单位向量模拟嵌入，不调用嵌入服务，只比较向量检索本身的耗时。
+powermem 路径直接使用其 SQLiteVectorStore（与 POWERMEM_VECTOR_STORE_PATH 相同的实现），
+按 user_id 过滤后做余弦检索。
+
+用法（在 backend 目录下）:
+    python scripts/bench_memory_index.py
+    python scripts/bench_memory_index.py --sizes 10000 100000 --dim 1024 --queries 20
+    python scripts/bench_memory_index.py --skip-powermem
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.memory_index import UserVectorIndex  # noqa: E402
+
+USER_ID = "bench"
+BATCH = 5000
+
+
+def _percentiles(samples: list[float]) -> str:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return f"p50 {p50 * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms"
+
+
+def bench_local(workdir: str, vectors: np.ndarray, queries: np.ndarray, limit: int) -> None:
+    path = os.path.join(workdir, "local")
+    started = time.perf_counter()
+    index = UserVectorIndex(path)
+    for start in range(0, len(vectors), BATCH):
+        chunk = vectors[start:start + BATCH]
+        index.add(chunk, [{"memory": f"memory {start + i}", "metadata": {}} for i in range(len(chunk))])
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = UserVectorIndex(path)
+    load = time.perf_counter() - started
+
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, limit)
+        samples.append(time.perf_counter() - started)
+    print(f"  local     build {build:7.2f} s   load {load:6.2f} s   search {_percentiles(samples)}")
+
+
+def bench_powermem(workdir: str, vectors: np.ndarray, queries: np.ndarray, limit: int) -> None:
+    try:
+        from powermem.storage.sqlite.sqlite_vector_store import SQLiteVectorStore
+    except ImportError:
+        print("  powermem  未安装，跳过")
+        return
+
+    started = time.perf_counter()
+    store = SQLiteVectorStore(database_path=os.path.join(workdir, "powermem.db"))
+    for start in range(0, len(vectors), BATCH):
+        chunk = vectors[start:start + BATCH]
+        store.insert(
+            chunk.tolist(),
+            payloads=[{"user_id": USER_ID, "data": f"memory {start + i}"} for i in range(len(chunk))],
+        )
+    build = time.perf_counter() - started
+
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        store.search("", vectors=[query.tolist()], limit=limit, filters={"user_id": USER_ID})
+        samples.append(time.perf_counter() - started)
+    print(f"  powermem  build {build:7.2f} s                 search {_percentiles(samples)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="每个用户的记忆条数")
+    parser.add_argument("--dim", type=int, default=1024, help="嵌入维度")
+    parser.add_argument("--queries", type=int, default=20, help="检索次数")
+    parser.add_argument("--limit", type=int, default=5, help="top-k")
+    parser.add_argument("--skip-powermem", action="store_true", help="只测本地索引")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        print(f"{size} 条记忆, 维度 {args.dim}, {args.queries} 次检索:")
+        vectors = rng.standard_normal((size, args.dim), dtype=np.float32)
+        queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+        with tempfile.TemporaryDirectory() as workdir:
+            bench_local(workdir, vectors, queries, args.limit)
+            if not args.skip_powermem:
+                bench_powermem(workdir, vectors, queries, args.limit)
+
+
+if __name__ == "__main__":
+    main()
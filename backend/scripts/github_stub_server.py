@@ -0,0 +1,153 @@
+"""本地 GitHub 搜索 API 桩服务，用于测试条件请求与额度处理，不消耗真实额度。
+
+模拟 GET /search/repositories：
+- 响应带 ETag，请求的 If-None-Match 相同时返回 304；
+- 返回 X-RateLimit-Limit / Remaining / Reset 头，窗口内额度用尽后返回 403；
+- 带 Authorization 头的 304 响应不计入额度（与 GitHub 行为一致）；
+- 响应内容（含创建时间）只由启动时间与 --mutate-every 决定，数据不变时 ETag 保持不变；
+- --mutate-every N 表示每 N 秒星标数变化一次，使 ETag 失效。
+
+tests/test_github_stub.py 在进程内启动它（make_server），验证条件请求与额度处理。
+
+用法（在 backend 目录下）:
+    python scripts/github_stub_server.py --port 8765 --limit 10 --window 60
+    GITHUB_API_URL=http://127.0.0.1:8765 uvicorn app.main:app
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class RateLimiter:
+    """固定窗口额度计数。"""
+
+    def __init__(self, limit: int, window: int) -> None:
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._used = 0
+
+    def _roll(self) -> None:
+        if time.time() >= self._window_start + self.window:
+            self._window_start = time.time()
+            self._used = 0
+
+    def consume(self) -> bool:
+        with self._lock:
+            self._roll()
+            if self._used >= self.limit:
+                return False
+            self._used += 1
+            return True
+
+    def headers(self) -> dict[str, str]:
+        with self._lock:
+            self._roll()
+            return {
+                "X-RateLimit-Limit": str(self.limit),
+                "X-RateLimit-Remaining": str(max(0, self.limit - self._used)),
+                "X-RateLimit-Used": str(self._used),
+                "X-RateLimit-Reset": str(int(self._window_start + self.window)),
+                "X-RateLimit-Resource": "search",
+            }
+
+
+def build_items(count: int, version: int, created: str) -> list[dict]:
+    """生成确定性的仓库数据，version 变化时星标数随之变化。"""
+    items = []
+    for i in range(count):
+        name = f"stub-project-{i + 1}"
+        items.append({
+            "id": 100000 + i,
+            "name": name,
+            "full_name": f"stub-owner/{name}",
+            "description": f"A stub Python project number {i + 1} for local testing",
+            "stargazers_count": 5000 - i * 100 + version,
+            "forks_count": 300 - i * 5,
+            "html_url": f"https://github.com/stub-owner/{name}",
+            "owner": {"login": "stub-owner"},
+            "language": "Python",
+            "created_at": created,
+            "updated_at": created,
+        })
+    return items
+
+
+def make_handler(limiter: RateLimiter, mutate_every: int):
+    started = time.time()
+    # 创建时间固定为启动前 3 天，否则响应体与 ETag 每秒都会变化
+    created = (datetime.fromtimestamp(started) - timedelta(days=3)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: bytes = b"", headers: dict[str, str] = None) -> None:
+            self.send_response(status)
+            for key, value in {**limiter.headers(), **(headers or {})}.items():
+                self.send_header(key, value)
+            if body:
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self) -> None:  # noqa: N802
+            url = urlparse(self.path)
+            if url.path != "/search/repositories":
+                self._send(404, json.dumps({"message": "Not Found"}).encode())
+                return
+            params = parse_qs(url.query)
+            per_page = min(100, int(params.get("per_page", ["30"])[0]))
+            version = int((time.time() - started) // mutate_every) if mutate_every > 0 else 0
+            body = json.dumps({
+                "total_count": per_page,
+                "incomplete_results": False,
+                "items": build_items(per_page, version, created),
+            }).encode()
+            etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+            not_modified = self.headers.get("If-None-Match") == etag
+            authorized = bool(self.headers.get("Authorization"))
+
+            if not (not_modified and authorized) and not limiter.consume():
+                self._send(403, json.dumps({"message": "API rate limit exceeded"}).encode())
+                return
+            if not_modified:
+                self._send(304, headers={"ETag": etag})
+                return
+            self._send(200, body, {"ETag": etag})
+
+    return Handler
+
+
+def make_server(host: str, port: int, limit: int, window: int, mutate_every: int = 0) -> ThreadingHTTPServer:
+    """创建桩服务（port 为 0 时由系统分配端口）。"""
+    return ThreadingHTTPServer((host, port), make_handler(RateLimiter(limit, window), mutate_every))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地 GitHub 搜索 API 桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--limit", type=int, default=10, help="每个窗口的请求额度（匿名搜索为 10）")
+    parser.add_argument("--window", type=int, default=60, help="额度窗口（秒）")
+    parser.add_argument("--mutate-every", type=int, default=0, help="每 N 秒改变一次数据，0 表示不变")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.limit, args.window, args.mutate_every)
+    print(f"GitHub 桩服务已启动: http://{args.host}:{args.port}（额度 {args.limit} 次 / {args.window} 秒）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
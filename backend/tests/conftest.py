@@ -0,0 +1,32 @@
+"""测试公共配置：使用临时 SQLite 数据库与 fakeredis，不依赖 MySQL、Redis 等外部服务。"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+
+# 必须在导入 app 之前设置，app.db.session 在导入时创建引擎
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='manage_profile_test_')}/test.db")
+
+import fakeredis  # noqa: E402
+import pytest  # noqa: E402
+
+from app.core import cache  # noqa: E402
+from app.core.redis import redis_pool  # noqa: E402
+
+
+@pytest.fixture
+async def fake_redis():
+    """把共享 Redis 连接池替换为内存中的 fakeredis。"""
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    redis_pool._client = client
+    redis_pool._loop = asyncio.get_running_loop()
+    redis_pool._down_until = 0.0
+    # CacheManager 持有创建时的客户端
+    cache._cache_manager = None
+    yield client
+    cache._cache_manager = None
+    redis_pool._client = None
+    redis_pool._loop = None
+    await client.aclose()
@@ -0,0 +1,63 @@
+"""聊天响应缓存与请求合并键的范围。"""
+
+from __future__ import annotations
+
+from app.models.user import ModelConfig
+from app.services.chat_cache import cache_response, canonical_request_hash, get_cached_response, model_scope
+
+
+def _model(model_id: int, base_url: str, owner_id=None) -> ModelConfig:
+    return ModelConfig(
+        id=model_id, name=f"model-{model_id}", base_url=base_url, api_key="key",
+        model_name="gpt-4o-mini", owner_id=owner_id,
+    )
+
+
+REQUEST_BODY = {
+    "model": "gpt-4o-mini",
+    "messages": [{"role": "user", "content": "你好"}],
+    "max_tokens": 100,
+    "temperature": 0,
+}
+
+
+def test_hash_is_stable_for_same_scope():
+    model = _model(1, "https://a.example.com/v1")
+    reordered = dict(reversed(list(REQUEST_BODY.items())))
+    assert canonical_request_hash(REQUEST_BODY, model_scope(model)) == canonical_request_hash(
+        reordered, model_scope(model)
+    )
+
+
+def test_hash_differs_for_models_sharing_model_name():
+    first = _model(1, "https://a.example.com/v1", owner_id=1)
+    second = _model(2, "https://b.example.com/v1", owner_id=2)
+    assert canonical_request_hash(REQUEST_BODY, model_scope(first)) != canonical_request_hash(
+        REQUEST_BODY, model_scope(second)
+    )
+
+
+def test_hash_covers_fallback_chain():
+    model = _model(1, "https://a.example.com/v1")
+    fallback = _model(2, "https://b.example.com/v1")
+    other = _model(3, "https://c.example.com/v1")
+    keys = {
+        canonical_request_hash(REQUEST_BODY, model_scope(model)),
+        canonical_request_hash(REQUEST_BODY, model_scope(model, [fallback])),
+        canonical_request_hash(REQUEST_BODY, model_scope(model, [other])),
+        canonical_request_hash(REQUEST_BODY, model_scope(model, [fallback, other])),
+        canonical_request_hash(REQUEST_BODY, model_scope(model, [other, fallback])),
+    }
+    assert len(keys) == 5
+
+
+async def test_configs_sharing_model_name_do_not_share_entries(fake_redis):
+    first = _model(1, "https://a.example.com/v1", owner_id=1)
+    second = _model(2, "https://b.example.com/v1", owner_id=2)
+    answer = {"choices": [{"message": {"role": "assistant", "content": "来自用户 1 的私有模型"}}]}
+
+    await cache_response(REQUEST_BODY, model_scope(first), answer)
+
+    assert await get_cached_response(REQUEST_BODY, model_scope(first)) == answer
+    assert await get_cached_response(REQUEST_BODY, model_scope(second)) is None
+    assert await get_cached_response(REQUEST_BODY, model_scope(second, [first])) is None
@@ -0,0 +1,94 @@
+"""流式与非流式聊天使用相同的故障转移规则。"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+
+import httpx
+import pytest
+
+from app.core.http_client import http_pool
+from app.models.user import ModelConfig
+from app.services import chat_service
+from app.services.model_router import model_router
+
+PRIMARY = ModelConfig(id=1, name="primary", base_url="https://primary.example.com/v1", api_key="k", model_name="a")
+BACKUP = ModelConfig(id=2, name="backup", base_url="https://backup.example.com/v1", api_key="k", model_name="b")
+REQUEST_BODY = {"model": "a", "messages": [{"role": "user", "content": "你好"}], "max_tokens": 16}
+
+
+def _upstream(primary_status: int):
+    """首选模型返回 primary_status，备用模型正常返回。"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        stream = json.loads(request.content).get("stream")
+        if request.url.host == "primary.example.com":
+            return httpx.Response(primary_status, json={"error": {"message": f"primary {primary_status}"}})
+        if stream:
+            return httpx.Response(200, text='data: {"choices":[{"delta":{"content":"hi"}}]}\n\ndata: [DONE]\n\n')
+        return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": "hi"}}]})
+
+    return handler
+
+
+@pytest.fixture
+async def upstream(monkeypatch):
+    clients = []
+
+    def install(primary_status: int) -> None:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(_upstream(primary_status)))
+        clients.append(client)
+        monkeypatch.setattr(http_pool, "client", lambda url: client)
+
+    model_router.reset()
+    monkeypatch.setattr(chat_service, "settings", dataclasses.replace(chat_service.settings, chat_hedge_enabled=False))
+    yield install
+    model_router.reset()
+    for client in clients:
+        await client.aclose()
+
+
+def _primary_health() -> dict:
+    return next(h for h in model_router.snapshot() if h["model_id"] == PRIMARY.id)
+
+
+@pytest.mark.parametrize("status", [401, 404, 429, 503])
+async def test_non_stream_fails_over_on_any_error(upstream, status):
+    upstream(status)
+    data = await chat_service.fetch_chat_completion(PRIMARY, "", REQUEST_BODY, [BACKUP])
+    assert data["choices"][0]["message"]["content"] == "hi"
+    assert _primary_health()["last_status"] == status
+
+
+@pytest.mark.parametrize("status", [401, 404, 429, 503])
+async def test_stream_fails_over_on_any_error(upstream, status):
+    upstream(status)
+    first_chunk, chunks, close = await chat_service._open_stream_with_failover(
+        PRIMARY, [BACKUP], {**REQUEST_BODY, "stream": True}
+    )
+    await close()
+    assert "hi" in first_chunk
+    assert _primary_health()["last_status"] == status
+
+
+@pytest.mark.parametrize("status", [401, 503])
+async def test_both_paths_feed_the_router_the_same_way(upstream, status):
+    upstream(status)
+    await chat_service.fetch_chat_completion(PRIMARY, "", REQUEST_BODY, [BACKUP])
+    non_stream = _primary_health()
+    model_router.reset()
+
+    _, _, close = await chat_service._open_stream_with_failover(PRIMARY, [BACKUP], {**REQUEST_BODY, "stream": True})
+    await close()
+    stream = _primary_health()
+    for key in ("requests", "failures", "consecutive_failures", "ewma_error_rate", "last_status"):
+        assert non_stream[key] == stream[key]
+
+
+async def test_error_when_every_model_fails(upstream):
+    upstream(401)
+    with pytest.raises(chat_service.HTTPException) as exc_info:
+        await chat_service.fetch_chat_completion(PRIMARY, "", REQUEST_BODY, [])
+    assert exc_info.value.status_code == 401
+    assert exc_info.value.detail == "上游错误：primary 401"
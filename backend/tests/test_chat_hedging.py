@@ -0,0 +1,90 @@
+"""对冲请求与半开熔断的探测名额。"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+
+import httpx
+import pytest
+
+from app.core.http_client import http_pool
+from app.models.user import ModelConfig
+from app.services import chat_service
+from app.services.model_router import model_router
+
+PRIMARY = ModelConfig(id=1, name="primary", base_url="https://primary.example.com/v1", api_key="k", model_name="a")
+BACKUP = ModelConfig(id=2, name="backup", base_url="https://backup.example.com/v1", api_key="k", model_name="b")
+BODY = {"model": "a", "messages": [{"role": "user", "content": "你好"}], "stream": True}
+SSE = 'data: {"choices":[{"delta":{"content":"hi"}}]}\n\ndata: [DONE]\n\n'
+
+
+def _half_open(model: ModelConfig) -> None:
+    """连续失败打开熔断，再让熔断时间立即到期。"""
+    for _ in range(chat_service.settings.router_failure_threshold):
+        model_router.record_failure(model, 503)
+    model_router._health[model.id].open_until = 0.0
+
+
+@pytest.fixture
+async def hedging(monkeypatch):
+    """首选模型一直不返回首字，备用模型在收到请求时记录探测名额的状态。"""
+    seen = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "primary.example.com":
+            await asyncio.sleep(10)
+        # 对冲请求在途时，其他请求既不能再占用名额，也不应把备用模型视为可用
+        seen["healthy"] = model_router.is_healthy(BACKUP)
+        seen["acquired"] = model_router.try_acquire(BACKUP)
+        return httpx.Response(200, text=SSE)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http_pool, "client", lambda url: client)
+    monkeypatch.setattr(
+        chat_service,
+        "settings",
+        dataclasses.replace(chat_service.settings, chat_hedge_enabled=True, chat_hedge_default_delay=0.01),
+    )
+    model_router.reset()
+    yield seen
+    model_router.reset()
+    await client.aclose()
+
+
+def test_try_acquire_takes_the_only_half_open_probe():
+    model_router.reset()
+    _half_open(BACKUP)
+    assert model_router.is_healthy(BACKUP)
+    assert model_router.try_acquire(BACKUP)
+    assert not model_router.try_acquire(BACKUP)
+    assert not model_router.is_healthy(BACKUP)
+
+    model_router.record_cancelled(BACKUP)
+    assert model_router.try_acquire(BACKUP)
+    model_router.reset()
+
+
+async def test_hedge_to_half_open_backup_is_the_only_probe(hedging, monkeypatch):
+    monkeypatch.setattr(chat_service, "_hedge_budget", chat_service._HedgeBudget(1.0))
+    _half_open(BACKUP)
+
+    model, status, _, opened, attempts = await chat_service._open_stream_hedged(PRIMARY, BACKUP, BODY)
+    await opened[0].aclose()
+    assert (model, status, attempts) == (BACKUP, 200, 2)
+    assert hedging == {"healthy": False, "acquired": False}
+    # 探测成功后熔断关闭
+    assert model_router.is_healthy(BACKUP)
+
+
+async def test_skipped_hedge_releases_the_probe(hedging, monkeypatch):
+    monkeypatch.setattr(chat_service, "_hedge_budget", chat_service._HedgeBudget(0.0))
+    _half_open(BACKUP)
+
+    task = asyncio.create_task(chat_service._open_stream_hedged(PRIMARY, BACKUP, BODY))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert hedging == {}
+    assert model_router.try_acquire(BACKUP)
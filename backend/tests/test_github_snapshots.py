@@ -0,0 +1,51 @@
+"""GitHub 星标快照与增速计算。"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from app.services.github_snapshots import SnapshotStore, _RepoSeries
+
+
+def _series(days, stars) -> _RepoSeries:
+    return _RepoSeries(np.array(days, dtype=np.int32), np.array(stars, dtype=np.int32), np.zeros(len(days), np.int32))
+
+
+def test_velocity_from_daily_snapshots():
+    days = list(range(31))
+    assert _series(days, [10 * d for d in days]).velocity() == (10, 70, 300)
+
+
+def test_velocity_scales_older_baseline_within_tolerance():
+    # 7 天窗口允许基准早 2 天：第 0 天到第 9 天增长 90，折算为 7 天 70
+    assert _series([0, 9], [0, 90]).velocity() == (None, 70, None)
+
+
+def test_velocity_is_none_when_baseline_is_too_old():
+    assert _series([0, 25], [0, 250]).velocity() == (None, None, None)
+
+
+def test_store_keeps_last_record_of_the_day_and_reloads(tmp_path):
+    path = str(tmp_path / "snapshots.bin")
+    store = SnapshotStore(path)
+    for day in range(31):
+        store.record([(1, 10 * day, 0), (2, 5, 0)], day=day)
+    store.record([(1, 999, 0)], day=30)
+    store.record([(1, 300, 0)], day=30)
+    assert store.velocity(1) == (10, 70, 300)
+    assert store.velocity(2) == (0, 0, 0)
+    assert store.velocity(3) == (None, None, None)
+
+    reloaded = SnapshotStore(path)
+    assert reloaded.velocity(1) == (10, 70, 300)
+    assert reloaded.stats()["records"] == 64
+
+
+def test_sync_reads_records_appended_by_another_worker(tmp_path):
+    path = str(tmp_path / "snapshots.bin")
+    reader = SnapshotStore(path)
+    writer = SnapshotStore(path)
+    writer.record([(1, 0, 0)], day=0)
+    writer.record([(1, 10, 0)], day=1)
+    reader.sync()
+    assert reader.velocity(1) == (10, None, None)
@@ -0,0 +1,89 @@
+"""用本地 GitHub 桩服务验证条件请求（304）与额度处理。"""
+
+from __future__ import annotations
+
+import importlib.util
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.core.http_client import http_pool
+from app.core.metrics import metrics
+from app.services import github_service
+from app.services.github_service import GitHubRateLimitError, _fetch_from_github
+
+STUB_PATH = Path(__file__).resolve().parents[1] / "scripts" / "github_stub_server.py"
+QUERY = "language:python created:>=2024-01-01"
+
+
+def _load_stub():
+    spec = importlib.util.spec_from_file_location("github_stub_server", STUB_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+async def start_stub(monkeypatch, fake_redis):
+    """返回启动函数：按给定额度启动桩服务并把搜索请求指向它，返回读取已发请求数的函数。"""
+    stub = _load_stub()
+    servers = []
+    monkeypatch.setattr(github_service, "_rate_limit_reset_at", 0.0)
+    # 带令牌时 304 不计入额度（与 GitHub 一致）
+    monkeypatch.setattr(github_service, "_github_token", lambda: "test-token")
+
+    def start(limit: int):
+        server = stub.make_server("127.0.0.1", 0, limit=limit, window=3600)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        monkeypatch.setattr(github_service, "_search_url", lambda: url + github_service.GITHUB_SEARCH_PATH)
+        return lambda: http_pool._requests.get(http_pool.origin_of(url), 0)
+
+    yield start
+    await http_pool.aclose()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+async def test_unchanged_data_returns_304(start_stub):
+    start_stub(limit=10)
+    full = await _fetch_from_github(QUERY, 30)
+    assert len(full.items) == 30
+    assert full.etag
+
+    not_modified = metrics.get("github.fetch.not_modified")
+    conditional = await _fetch_from_github(QUERY, 30, full.etag)
+    assert conditional.items is None
+    assert conditional.etag == full.etag
+    assert metrics.get("github.fetch.not_modified") == not_modified + 1
+
+
+async def test_stops_requesting_when_budget_is_exhausted(start_stub):
+    requests = start_stub(limit=3)
+    first = await _fetch_from_github(QUERY, 30)
+    # 带令牌的 304 不消耗额度
+    assert (await _fetch_from_github(QUERY, 30, first.etag)).items is None
+    await _fetch_from_github(QUERY, 30)
+    await _fetch_from_github(QUERY, 30)
+    assert requests() == 4
+    assert await github_service._rate_limited_until() is not None
+
+    # 额度用尽后直到重置都不再发请求
+    with pytest.raises(GitHubRateLimitError):
+        await _fetch_from_github(QUERY, 30)
+    assert requests() == 4
+
+
+async def test_403_from_exhausted_budget_raises_rate_limit(start_stub, monkeypatch, fake_redis):
+    start_stub(limit=1)
+    await _fetch_from_github(QUERY, 30)
+    # 模拟另一个 worker：本进程与 Redis 都不知道额度已用尽
+    monkeypatch.setattr(github_service, "_rate_limit_reset_at", 0.0)
+    await fake_redis.flushall()
+
+    with pytest.raises(GitHubRateLimitError):
+        await _fetch_from_github(QUERY, 30)
+    assert await github_service._rate_limited_until() is not None
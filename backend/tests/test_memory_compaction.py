@@ -0,0 +1,39 @@
+"""记忆压缩的跨 worker 锁。"""
+
+from __future__ import annotations
+
+import pytest
+
+from app.services import memory_compaction
+
+
+async def test_lock_is_released_after_run(fake_redis, monkeypatch):
+    runs = []
+    monkeypatch.setattr(memory_compaction, "compact_all_users", lambda: runs.append(1) or [])
+
+    await memory_compaction.run_scheduled_compaction()
+    assert await fake_redis.get(memory_compaction.LOCK_KEY) is None
+    # 上一次完成后可以立即再次执行
+    await memory_compaction.run_scheduled_compaction()
+    assert len(runs) == 2
+
+
+async def test_lock_is_released_when_compaction_fails(fake_redis, monkeypatch):
+    def fail():
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(memory_compaction, "compact_all_users", fail)
+    with pytest.raises(RuntimeError):
+        await memory_compaction.run_scheduled_compaction()
+    assert await fake_redis.get(memory_compaction.LOCK_KEY) is None
+
+
+async def test_skips_while_another_worker_holds_lock(fake_redis, monkeypatch):
+    runs = []
+    monkeypatch.setattr(memory_compaction, "compact_all_users", lambda: runs.append(1) or [])
+    await fake_redis.set(memory_compaction.LOCK_KEY, "other-worker", ex=60)
+
+    await memory_compaction.run_scheduled_compaction()
+    assert runs == []
+    # 不会删除其他 worker 的锁
+    assert await fake_redis.get(memory_compaction.LOCK_KEY) == "other-worker"
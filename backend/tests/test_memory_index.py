@@ -0,0 +1,63 @@
+"""本地向量记忆索引：删除与日志重放。"""
+
+from __future__ import annotations
+
+import json
+import os
+
+import numpy as np
+
+from app.services.memory_index import LOG_FILE, UserVectorIndex
+
+
+def _unit(i: int, dim: int = 8) -> np.ndarray:
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
+
+
+def _best(index: UserVectorIndex, vector) -> str:
+    return index.search(vector, 1)[0][1]["memory"]
+
+
+def test_delete_moves_last_row_into_the_gap(tmp_path):
+    index = UserVectorIndex(str(tmp_path / "u1"))
+    ids = index.add(np.stack([_unit(0), _unit(1), _unit(2)]), [{"memory": m} for m in "abc"])
+    assert index.delete(ids[0])
+    assert not index.delete(ids[0])
+
+    assert index.ids == [ids[2], ids[1]]
+    assert _best(index, _unit(2)) == "c"
+    assert _best(index, _unit(1)) == "b"
+    assert ids[0] not in [hit[0] for hit in index.search(_unit(0), 5)]
+
+
+def test_reload_replays_adds_and_deletes(tmp_path):
+    path = str(tmp_path / "u1")
+    index = UserVectorIndex(path)
+    ids = index.add(np.stack([_unit(0), _unit(1), _unit(2)]), [{"memory": m} for m in "abc"])
+    index.delete(ids[0])
+    index.add(_unit(3), [{"memory": "d"}])
+
+    reloaded = UserVectorIndex(path)
+    assert reloaded.ids == index.ids
+    assert reloaded.items == index.items
+    # 重放删除时不再移动向量：文件中的矩阵已经是删除后的布局
+    for i, memory in ((1, "b"), (2, "c"), (3, "d")):
+        assert _best(reloaded, _unit(i)) == memory
+
+
+def test_reload_compacts_log_after_many_deletes(tmp_path):
+    path = str(tmp_path / "u1")
+    index = UserVectorIndex(path)
+    vectors = np.random.default_rng(0).random((200, 8), dtype=np.float32)
+    ids = index.add(vectors, [{"memory": str(i)} for i in range(200)])
+    for memory_id in ids[:190]:
+        index.delete(memory_id)
+
+    reloaded = UserVectorIndex(path)
+    assert reloaded.count == 10
+    with open(os.path.join(path, LOG_FILE), encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert [e["id"] for e in entries] == reloaded.ids
+    assert all(e["op"] == "add" for e in entries)
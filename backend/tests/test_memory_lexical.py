@@ -0,0 +1,50 @@
+"""BM25 词法记忆索引的检索。"""
+
+from __future__ import annotations
+
+from app.services.memory_lexical import LexicalMemoryIndex, tokenize
+
+
+def test_tokenize_splits_cjk_into_unigrams_and_bigrams():
+    assert tokenize("喜欢Python 3") == ["喜", "欢", "喜欢", "python", "3"]
+
+
+def test_search_ranks_by_bm25():
+    index = LexicalMemoryIndex(":memory:")
+    index.add("我喜欢喝咖啡", user_id="1")
+    index.add("我喜欢喝茶，也喜欢喝咖啡", user_id="1")
+    index.add("住在上海", user_id="1")
+
+    hits = index.search("上海", user_id="1")["results"]
+    assert [hit["memory"] for hit in hits] == ["住在上海"]
+
+    hits = index.search("咖啡", user_id="1")["results"]
+    # 词频相同时较短的文档得分更高
+    assert [hit["memory"] for hit in hits] == ["我喜欢喝咖啡", "我喜欢喝茶，也喜欢喝咖啡"]
+    assert hits[0]["score"] > hits[1]["score"]
+    assert index.search("北京", user_id="1")["results"] == []
+
+
+def test_search_is_scoped_to_the_user():
+    index = LexicalMemoryIndex(":memory:")
+    index.add("my cat is called tom", user_id="1")
+    index.add("tom likes coffee", user_id="2")
+    assert [hit["memory"] for hit in index.search("Tom", user_id="2")["results"]] == ["tom likes coffee"]
+
+
+def test_deleted_and_replaced_memories_leave_the_index(tmp_path):
+    path = str(tmp_path / "lexical.db")
+    index = LexicalMemoryIndex(path)
+    first = index.add("住在上海", user_id="1")["results"][0]["id"]
+    index.add("住在北京", user_id="1")
+    index.upsert(first, "住在杭州", user_id="1")
+    assert index.search("上海", user_id="1")["results"] == []
+
+    other = index.search("北京", user_id="1")["results"][0]["id"]
+    assert index.delete(other, user_id="2") is False
+    assert index.delete(other, user_id="1") is True
+
+    # 重新打开后从 SQLite 重建倒排索引
+    reopened = LexicalMemoryIndex(path)
+    assert [hit["memory"] for hit in reopened.search("杭州", user_id="1")["results"]] == ["住在杭州"]
+    assert reopened.search("北京", user_id="1")["results"] == []
@@ -0,0 +1,69 @@
+"""记忆列表的游标分页与 NDJSON 流式导出。"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+
+import pytest
+
+from app.api.routes import memory as memory_routes
+from app.models.user import User
+from app.services import memory_service
+
+
+class FakeBackend:
+    """按插入顺序分页的记忆后端，部分条目为空记忆。"""
+
+    def __init__(self, memories: list[str]) -> None:
+        self.rows = [{"id": f"m{i}", "memory": text, "metadata": {}} for i, text in enumerate(memories)]
+
+    def get_all(self, user_id: str, limit: int = 100, offset: int = 0, **_) -> dict:
+        return {"results": self.rows[offset:offset + limit]}
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    # 每 3 条中有 1 条空记忆，恰好落在页尾时旧实现会提前结束
+    memories = ["" if i % 3 == 2 else f"记忆 {i}" for i in range(25)]
+    fake = FakeBackend(memories)
+    monkeypatch.setattr(memory_service, "_memory_instance", fake)
+    monkeypatch.setattr(memory_service, "_memory_enabled", True)
+    return fake
+
+
+def _expected(backend: FakeBackend) -> list[str]:
+    return [row["id"] for row in backend.rows if row["memory"]]
+
+
+def test_cursor_pages_cover_all_non_empty_memories(backend):
+    user = User(id=1, name="u", password_hash="x", salt="y")
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = memory_routes.list_memories(cursor=cursor, limit=3, stream=False, user=user)
+        seen.extend(item.id for item in page.memories)
+        pages += 1
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+    assert seen == _expected(backend)
+    assert pages == 9
+
+
+def test_last_page_has_no_cursor(backend):
+    user = User(id=1, name="u", password_hash="x", salt="y")
+    page = memory_routes.list_memories(cursor=memory_routes._encode_cursor(24), limit=1, stream=False, user=user)
+    assert [item.id for item in page.memories] == ["m24"]
+    assert page.next_cursor is None
+
+
+def test_stream_is_not_cut_short_by_empty_memories(backend, monkeypatch):
+    monkeypatch.setattr(memory_routes, "settings", dataclasses.replace(memory_routes.settings, memory_list_page_size=3))
+    lines = list(memory_routes._stream_memories("1", 0))
+    assert [json.loads(line)["id"] for line in lines] == _expected(backend)
+
+
+def test_invalid_cursor_is_rejected(backend):
+    user = User(id=1, name="u", password_hash="x", salt="y")
+    with pytest.raises(memory_routes.HTTPException):
+        memory_routes.list_memories(cursor="not-a-cursor", limit=3, stream=False, user=user)
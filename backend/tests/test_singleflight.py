@@ -0,0 +1,182 @@
+"""相同并发请求合并：SingleFlight 与 StreamSingleFlight。"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight, StreamSingleFlight
+
+
+class FakeUpstream:
+    """可逐块推送数据的上游流。"""
+
+    def __init__(self) -> None:
+        self.opened = 0
+        self.closed = 0
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def open(self):
+        self.opened += 1
+
+        async def chunks():
+            while True:
+                chunk = await self.queue.get()
+                if chunk is None:
+                    return
+                yield chunk
+
+        async def close():
+            self.closed += 1
+
+        return "first", chunks(), close
+
+    def push(self, *chunks) -> None:
+        for chunk in chunks:
+            self.queue.put_nowait(chunk)
+
+
+async def _collect(subscription) -> list[str]:
+    return [chunk async for chunk in subscription]
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_single_flight_shares_one_call():
+    flight: SingleFlight[int] = SingleFlight("test")
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return 42
+
+    waiters = [asyncio.create_task(flight.do("key", fetch)) for _ in range(3)]
+    await _settle()
+    assert flight.in_flight() == 1
+    release.set()
+    assert await asyncio.gather(*waiters) == [42, 42, 42]
+    assert calls == 1
+    assert flight.in_flight() == 0
+
+
+async def test_single_flight_cancelled_waiter_does_not_cancel_others():
+    flight: SingleFlight[str] = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def fetch() -> str:
+        await release.wait()
+        return "ok"
+
+    first = asyncio.create_task(flight.do("key", fetch))
+    second = asyncio.create_task(flight.do("key", fetch))
+    await _settle()
+    first.cancel()
+    release.set()
+    assert await second == "ok"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+async def test_single_flight_propagates_errors_to_all_waiters():
+    flight: SingleFlight[None] = SingleFlight("test")
+
+    async def fail() -> None:
+        await asyncio.sleep(0)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+async def test_stream_joiners_share_upstream_and_late_joiner_replays():
+    flights = StreamSingleFlight("test", replay_chunks=10)
+    upstream = FakeUpstream()
+    first = await flights.subscribe("key", upstream.open)
+    upstream.push("a", "b")
+    await _settle()
+
+    late = await flights.subscribe("key", upstream.open)
+    upstream.push("c", None)
+    assert await _collect(first) == ["first", "a", "b", "c"]
+    assert await _collect(late) == ["first", "a", "b", "c"]
+    await _settle()
+    assert upstream.opened == 1
+    assert upstream.closed == 1
+    assert flights.in_flight() == 0
+
+
+async def test_stream_not_joinable_after_replay_window():
+    flights = StreamSingleFlight("test", replay_chunks=3)
+    first_upstream, second_upstream = FakeUpstream(), FakeUpstream()
+    first = await flights.subscribe("key", first_upstream.open)
+    first_upstream.push("a", "b")
+    await _settle()
+
+    # 已产生 3 个数据块，新请求打开自己的上游流
+    second = await flights.subscribe("key", second_upstream.open)
+    assert first_upstream.opened == 1
+    assert second_upstream.opened == 1
+
+    first_upstream.push("c", None)
+    second_upstream.push(None)
+    assert await _collect(first) == ["first", "a", "b", "c"]
+    assert await _collect(second) == ["first"]
+    await _settle()
+    assert first_upstream.closed == second_upstream.closed == 1
+
+
+async def test_stream_releases_chunks_read_by_every_subscriber():
+    flights = StreamSingleFlight("test", replay_chunks=2)
+    upstream = FakeUpstream()
+    subscription = await flights.subscribe("key", upstream.open)
+    fanout = subscription._fanout
+    reader = subscription.__aiter__()
+
+    upstream.push(*[f"chunk-{i}" for i in range(50)])
+    await _settle()
+    for _ in range(51):
+        await reader.__anext__()
+    # 只有一个订阅者且已读完，缓冲不再保留整个回复
+    assert fanout.received == 51
+    assert len(fanout._chunks) == 0
+
+    upstream.push(None)
+    await _settle()
+    await reader.aclose()
+    await subscription.close()
+
+
+async def test_stream_last_unsubscriber_cancels_upstream():
+    flights = StreamSingleFlight("test", replay_chunks=10)
+    upstream = FakeUpstream()
+    first = await flights.subscribe("key", upstream.open)
+    second = await flights.subscribe("key", upstream.open)
+
+    assert await first.close() is False
+    assert upstream.closed == 0
+    assert await second.close() is True
+    assert upstream.closed == 1
+    assert flights.in_flight() == 0
+    # 重复关闭无副作用
+    assert await second.close() is False
+
+
+async def test_stream_open_error_reaches_every_subscriber():
+    flights = StreamSingleFlight("test", replay_chunks=10)
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(
+        flights.subscribe("key", fail), flights.subscribe("key", fail), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flights.in_flight() == 0